@@ -6,17 +6,442 @@ Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
 import abc
+import hashlib
+import json
 import os
-import re
+import shlex
 import shutil
+import time
 import typing
+import warnings
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 from abacuskit.calculations.structure import Kpt, Stru
 from abacuskit.schedulers.data import Code
+from abacuskit.schedulers.execute import ExecResult, execute, submit, wait_all
+from abacuskit.utils.running import read_running_log
 from abacuskit.utils.typings import *
 
 
+def file_digest(filename: str_PathLike, chunk_size: int = 1 << 20) -> str:
+    """Return sha256 digest of file content
+
+    :params filename: path of file
+    :params chunk_size: bytes read each time. Default: 1 MB
+    """
+
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _to_builtin(value):
+    """Convert numpy types in result of calculation to json serializable types"""
+
+    if isinstance(value, dict):
+        return {key: _to_builtin(val) for key, val in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_to_builtin(val) for val in value]
+    elif isinstance(value, np.ndarray):
+        return value.tolist()
+    elif isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _signature(value, depth: int = 0):
+    """Convert settings of calculation to json serializable types in a deterministic way, existing absolute file paths are replaced by their content digest"""
+
+    if depth > 16:
+        return type(value).__name__
+    if isinstance(value, dict):
+        return [[str(key), _signature(val, depth+1)] for key, val in sorted(value.items(), key=lambda x: str(x[0]))]
+    elif isinstance(value, (list, tuple)):
+        return [_signature(val, depth+1) for val in value]
+    elif isinstance(value, (set, frozenset)):
+        return sorted(str(val) for val in value)
+    elif isinstance(value, np.ndarray):
+        return value.tolist()
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, (str, Path)):
+        if os.path.isabs(value) and os.path.isfile(value):
+            return [str(value), file_digest(value)]
+        return str(value)
+    elif value is None or isinstance(value, (bool, int, float)):
+        return value
+    elif hasattr(value, "__dict__"):
+        return [type(value).__name__, _signature({key: val for key, val in vars(value).items() if not key.startswith('_')}, depth+1)]
+    elif hasattr(value, "__slots__") and isinstance(value.__getstate__(), dict):
+        # all attributes of objects without `__dict__` are data, e.g. coordinates of `CompactStru`
+        return [type(value).__name__, _signature(value.__getstate__(), depth+1)]
+    return repr(value)
+
+
+class ResultCache:
+    """On-disk cache of calculation results, keyed on hash of input files and executable"""
+
+    _digests = {}
+
+    def __init__(self, cache_dir: str_PathLike, max_size: int = None) -> None:
+        """Set cache directory
+
+        :params cache_dir: directory where cache entries are stored
+        :params max_size: maximum size of cache in bytes, least recently used entries are evicted beyond it. Default: None, no limit
+        """
+
+        self.cache_dir = Path(cache_dir).resolve()
+        self.max_size = max_size
+
+    @classmethod
+    def executable_id(cls, command: Command) -> str:
+        """Return identity of command line, including digest of every executable file in it
+
+        :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
+        """
+
+        if isinstance(command, Code):
+            command = command.run_line()
+        ids = [command]
+        for token in shlex.split(command):
+            path = shutil.which(token) if os.sep not in token else token
+            if not path or not os.path.isfile(path) or not os.access(path, os.X_OK):
+                continue
+            stat = os.stat(path)
+            signature = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+            if signature not in cls._digests:
+                cls._digests[signature] = file_digest(path)
+            ids.append(cls._digests[signature])
+        return '\n'.join(ids)
+
+    def key(self, files: typing.Sequence[str_PathLike], command: Command) -> str:
+        """Return cache key of a calculation
+
+        :params files: input files of calculation
+        :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
+        """
+
+        sha = hashlib.sha256()
+        for filename in files:
+            sha.update(Path(filename).name.encode())
+            sha.update(file_digest(filename).encode())
+        sha.update(self.executable_id(command).encode())
+        return sha.hexdigest()
+
+    def load(self, key: str, dst: str_PathLike = ".") -> typing.Optional[dict]:
+        """Restore saved outputs of cache entry into `dst` and return its result, return None if not found
+
+        :params key: cache key
+        :params dst: directory where outputs are restored. Default: "."
+        """
+
+        entry = self.cache_dir/key
+        result_file = entry/"result.json"
+        if not result_file.exists():
+            return None
+        with open(result_file, 'r') as file:
+            text = json.load(file)
+        outputs = entry/"outputs"
+        for item in outputs.iterdir():
+            if item.is_dir():
+                shutil.copytree(item, Path(dst, item.name), dirs_exist_ok=True)
+            else:
+                shutil.copy2(item, dst)
+        os.utime(result_file)
+        return text["result"]
+
+    def store(self, key: str, res: dict, outputs: typing.Sequence[str_PathLike] = [], **meta):
+        """Store result and outputs of a calculation
+
+        :params key: cache key
+        :params res: result of calculation
+        :params outputs: output files or directories of calculation
+        :params meta: other information of calculation, e.g. name and working directory
+        """
+
+        entry = self.cache_dir/key
+        tmp = self.cache_dir/f".{key}.{os.getpid()}"
+        (tmp/"outputs").mkdir(parents=True, exist_ok=True)
+        size = 0
+        for item in outputs:
+            item = Path(item)
+            if item.is_dir():
+                shutil.copytree(item, tmp/"outputs"/item.name)
+                size += sum(f.stat().st_size for f in item.rglob("*") if f.is_file())
+            elif item.is_file():
+                shutil.copy2(item, tmp/"outputs")
+                size += item.stat().st_size
+        with open(tmp/"result.json", 'w') as file:
+            json.dump({"result": _to_builtin(res), "size": size,
+                       "created": time.time(), **meta}, file, indent=4)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # stored by another process at the same time
+            shutil.rmtree(tmp, ignore_errors=True)
+        if self.max_size:
+            self.evict(self.max_size)
+
+    def entries(self) -> typing.List[dict]:
+        """Return information of all cache entries, the least recently used first"""
+
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for entry in self.cache_dir.iterdir():
+            result_file = entry/"result.json"
+            if entry.name.startswith('.') or not result_file.exists():
+                continue
+            with open(result_file, 'r') as file:
+                text = json.load(file)
+            text.pop("result", None)
+            text["key"] = entry.name
+            text["used"] = result_file.stat().st_mtime
+            entries.append(text)
+        return sorted(entries, key=lambda x: x["used"])
+
+    def evict(self, max_size: int):
+        """Evict least recently used entries until total size is not larger than `max_size`
+
+        :params max_size: maximum size of cache in bytes
+        """
+
+        entries = self.entries()
+        total = sum(entry["size"] for entry in entries)
+        for entry in entries:
+            if total <= max_size:
+                break
+            shutil.rmtree(self.cache_dir/entry["key"], ignore_errors=True)
+            total -= entry["size"]
+
+    def invalidate(self, keys: typing.Sequence[str] = []) -> int:
+        """Remove cache entries whose key starts with one of `keys`, remove all if `keys` is empty
+
+        :params keys: list of cache keys or their prefixes
+        :return: number of removed entries
+        """
+
+        count = 0
+        for entry in self.entries():
+            if not keys or any(entry["key"].startswith(key) for key in keys):
+                shutil.rmtree(self.cache_dir/entry["key"], ignore_errors=True)
+                count += 1
+        return count
+
+
+# `ioctl` request of Linux to clone a file, supported by Btrfs, XFS, OCFS2, ...
+FICLONE = 0x40049409
+
+
+def reflink(src: str_PathLike, dst: str_PathLike):
+    """Clone `src` to `dst` which shares data blocks with `src` until one of them is modified, raise `OSError` if file system does not support it
+
+    :params src: source file
+    :params dst: destination file
+    """
+
+    if fcntl is None:
+        raise OSError("Reflink is not supported on this platform")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+    shutil.copymode(src, dst)
+
+
+class SaveStrategy:
+    """How `JobCalculation.save` saves files of working directory"""
+
+    MODES = ("copy", "hardlink", "reflink", "move")
+
+    def __init__(self, mode: str = "copy", patterns: typing.Sequence[str] = None, dedup_dir: str_PathLike = None) -> None:
+        """Set save strategy
+
+        A hard link shares data with the file in working directory, so a saved file changes if a later calculation rewrites that file in place, e.g. charge density or matrix files under `OUT.*`.
+        Use 'hardlink' only for files that are not rewritten afterwards, see `for_step`.
+
+        :params mode: 'copy', 'hardlink', 'reflink' or 'move'. Hard links and reflinks fall back to copy if file system does not support them. Moved files are not available to later calculations. Default: 'copy'
+        :params patterns: glob patterns of files relative to working directory, e.g. `["INPUT", "*.log", "OUT.*/running_*.log"]`. Default: None, all files in working directory but not in its subdirectories
+        :params dedup_dir: directory of files stored by content hash, if set, saved files with the same content, e.g. the same file of different versions, are hard links to one file in it. Default: None
+        """
+
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Save mode should be one of {self.MODES}, not `{mode}`")
+        self.mode = mode
+        self.patterns = patterns
+        self.dedup_dir = Path(dedup_dir).resolve() if dedup_dir else None
+
+    def for_step(self, last: bool) -> "SaveStrategy":
+        """Return strategy to save files of a calculation whose working directory is shared by later calculations unless `last`, which uses 'reflink' instead of 'hardlink' if not `last`
+
+        :params last: whether no later calculation runs in the working directory
+        """
+
+        if self.mode != "hardlink" or last:
+            return self
+        return SaveStrategy("reflink", self.patterns, self.dedup_dir)
+
+    def files(self, workdir: str_PathLike = ".", exclude: str_PathLike = None) -> typing.List[Path]:
+        """Return paths relative to `workdir` of files to save
+
+        :params workdir: working directory. Default: "."
+        :params exclude: directory whose files are never saved, e.g. `save_dir`. Default: None
+        """
+
+        workdir = Path(workdir)
+        if self.patterns is None:
+            files = [file for file in workdir.iterdir() if file.is_file()]
+        else:
+            files = sorted({file for pattern in self.patterns for file in workdir.glob(
+                pattern) if file.is_file()})
+        excluded = [Path(path).resolve()
+                    for path in (exclude, self.dedup_dir) if path]
+        return [file.relative_to(workdir) for file in files if not any(
+            directory in file.resolve().parents for directory in excluded)]
+
+    def transfer(self, src: str_PathLike, dst: str_PathLike, mode: str = None):
+        """Save file `src` as `dst` in the way of `mode`, in 'hardlink' mode `dst` changes with `src` if `src` is rewritten in place
+
+        :params src: file in working directory
+        :params dst: saved file
+        :params mode: one of `MODES`. Default: None, `self.mode`
+        """
+
+        mode = mode or self.mode
+        if mode == "move":
+            shutil.move(src, dst)
+            return
+        if mode == "hardlink":
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        elif mode == "reflink":
+            try:
+                reflink(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copy(src, dst)
+
+    def _store(self, src: str_PathLike) -> Path:
+        """Save file `src` into `dedup_dir` and return its path there, the file is saved only once for the same content"""
+
+        digest = file_digest(src)
+        stored = self.dedup_dir/digest[:2]/digest
+        if not stored.exists():
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            tmp = stored.parent/f".{digest}.{os.getpid()}"
+            # a stored file is shared by saved files of all versions, so it never shares data with working directory
+            self.transfer(src, tmp, "reflink" if self.mode ==
+                          "hardlink" else self.mode)
+            os.replace(tmp, stored)
+        elif self.mode == "move":
+            os.remove(src)
+        return stored
+
+    def save(self, save_dir: str_PathLike, workdir: str_PathLike = "."):
+        """Save files of `workdir` into `save_dir`, relative paths are kept
+
+        :params save_dir: directory where to save files
+        :params workdir: working directory. Default: "."
+        """
+
+        Path(save_dir).mkdir(parents=True, exist_ok=True)
+        for file in self.files(workdir, save_dir):
+            src = Path(workdir, file)
+            dst = Path(save_dir, file)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if dst.exists():
+                dst.unlink()
+            if not self.dedup_dir:
+                self.transfer(src, dst)
+                continue
+            stored = self._store(src)
+            try:
+                os.link(stored, dst)
+            except OSError:
+                shutil.copy(stored, dst)
+
+
+class Checkpoint:
+    """Status, inputs hash and result of each step of a workflow, stored in a json file shared by processes"""
+
+    def __init__(self, filename: str_PathLike) -> None:
+        """Set state file
+
+        :params filename: path of state file, e.g. `command_0/autotest_state.json`
+        """
+
+        self.filename = Path(filename).resolve()
+
+    def load(self) -> dict:
+        """Return dict of steps, key is step name, e.g. `cal_0` or `cal_0/SetDimers`"""
+
+        if not self.filename.exists():
+            return {}
+        with open(self.filename, 'r') as file:
+            return json.load(file)
+
+    def _update(self, step: str, **fields):
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.filename}.lock", 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            steps = self.load()
+            steps.setdefault(step, {}).update(_to_builtin(fields))
+            tmp = f"{self.filename}.{os.getpid()}"
+            with open(tmp, 'w') as file:
+                json.dump(steps, file, indent=4)
+            os.replace(tmp, self.filename)
+
+    def is_done(self, step: str, inputs: str) -> bool:
+        """Return whether `step` finished with the same inputs hash
+
+        :params step: step name
+        :params inputs: inputs hash returned by `JobCalculation.inputs_hash`
+        """
+
+        state = self.load().get(step, {})
+        return state.get("status") == "done" and state.get("inputs") == inputs
+
+    def result(self, step: str) -> dict:
+        """Return parsed result of a finished step"""
+
+        return self.load()[step].get("result")
+
+    def start(self, step: str, inputs: str, **meta):
+        """Record that `step` starts, a step left `running` was interrupted"""
+
+        self._update(step, status="running", inputs=inputs,
+                     start_time=time.time(), result=None, error=None, perf=None, **meta)
+
+    def done(self, step: str, res: dict, perf: dict = None):
+        """Record that `step` finished, its result and performance, see `JobCalculation.perf`"""
+
+        self._update(step, status="done", result=res,
+                     perf=perf, end_time=time.time())
+
+    def fail(self, step: str, error: str):
+        """Record that `step` failed and its error message"""
+
+        self._update(step, status="failed", error=error, end_time=time.time())
+
+
 class JobCalculation(abc.ABC):
     """Single job calculation"""
 
@@ -24,6 +449,8 @@ class JobCalculation(abc.ABC):
         """Set input parameters of single job calcultion"""
 
         self.kwargs = kwargs
+        # results of commands executed by `_run` and `_run_all`
+        self._exec_results = []
 
     def __str__(self) -> str:
         return self.__class__.__name__
@@ -38,10 +465,47 @@ class JobCalculation(abc.ABC):
         :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
         """
 
-        if isinstance(command, Code):
-            command = command.run_line()
+        self.exec_result = self._run(command)
+
+    def _check_exec(self, command: Command, result: ExecResult):
+        """Raise `TimeoutError` if command is killed for exceeding `timeout`, warn if it exits with nonzero code"""
+
+        line = command.run_line() if isinstance(command, Code) else command
+        if result.timed_out:
+            raise TimeoutError(
+                f"`{line.strip()}` exceeded timeout of {self.kwargs.get('timeout')} s.")
+        if result.returncode != 0:
+            warnings.warn(
+                f"`{line.strip()}` exited with code {result.returncode}.")
+
+    def _run(self, command: Command, cwd: str_PathLike = None, env: dict = None) -> ExecResult:
+        """Execute command and wait for it, wall-clock time is limited by `timeout` of the calculation
+
+        :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
+        :params cwd: working directory of command. Default: None, current directory
+        :params env: extra environment variables. Default: None
+        """
 
-        os.system(command)
+        result = execute(command, cwd, env, self.kwargs.get("timeout"))
+        self._exec_results.append(result)
+        self._check_exec(command, result)
+        return result
+
+    def _run_all(self, command: Command, folders: typing.Sequence[str_PathLike], env: dict = None) -> typing.List[ExecResult]:
+        """Execute the same command in many folders at the same time and wait for all of them
+
+        :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
+        :params folders: working directories, one process each
+        :params env: extra environment variables. Default: None
+        """
+
+        timeout = self.kwargs.get("timeout")
+        handles = [submit(command, folder, env, timeout) for folder in folders]
+        results = wait_all(handles)
+        self._exec_results.extend(results)
+        for result in results:
+            self._check_exec(command, result)
+        return results
 
     @abc.abstractmethod
     def _check(self, **kwargs):
@@ -57,31 +521,131 @@ class JobCalculation(abc.ABC):
         res = {}
         return res
 
-    def calculate(self, command: Command, save_dir: str_PathLike = "", **kwargs):
+    def _perf(self, **kwargs) -> dict:
+        """Return performance quantities read from outputs of a finished job, e.g. time reported by the code"""
+
+        return {}
+
+    @property
+    def perf(self) -> typing.Optional[dict]:
+        """Performance of last execution: wall time of `_execute` and CPU time in seconds, peak memory of the largest process in kilobytes and quantities of `_perf`, None if not executed"""
+
+        return getattr(self, "_perf_record", None)
+
+    def _cache_files(self, **kwargs) -> list:
+        """Return input files whose content decides result of calculation, empty list means the job is never cached"""
+
+        return []
+
+    def _cache_outputs(self, **kwargs) -> list:
+        """Return output files or directories restored on a cache hit"""
+
+        return []
+
+    def artifacts(self, workdir: str_PathLike = ".") -> typing.List[Path]:
+        """Return output files in `workdir` passed to calculations depending on this one
+
+        :params workdir: working directory of this calculation. Default: "."
+        """
+
+        return []
+
+    def outputs(self, workdir: str_PathLike = ".") -> typing.List[Path]:
+        """Return files and directories in `workdir` which later calculations may read from their working directory, they are copied into working directories of calculations depending on this one. Default: `artifacts`
+
+        :params workdir: working directory of this calculation. Default: "."
+        """
+
+        return self.artifacts(workdir)
+
+    def receive_artifacts(self, artifacts: typing.Sequence[Path]):
+        """Take output files of calculations this one depends on, called before `calculate`
+
+        :params artifacts: list of absolute paths returned by `artifacts` of dependencies
+        """
+
+    def inputs_hash(self, command: Command) -> str:
+        """Return hash of settings of calculation and command, settings are fixed the first time it is called
+
+        :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
+        """
+
+        if not hasattr(self, "_settings"):
+            self._settings = json.dumps(_signature(
+                {key: val for key, val in vars(self).items() if not key.startswith('_')}))
+        sha = hashlib.sha256()
+        sha.update(type(self).__name__.encode())
+        sha.update(self._settings.encode())
+        sha.update(ResultCache.executable_id(command).encode())
+        return sha.hexdigest()
+
+    def calculate(self, command: Command, save_dir: str_PathLike = "", cache: ResultCache = None, checkpoint: Checkpoint = None, step: str = "", resume: bool = False, save: SaveStrategy = None, **kwargs):
         """The whole process of job calculation
 
         :params command: string or `abacuskit.schedulers.data.Code` object to execute calculation
+        :params save_dir: directory where to save all input and output files. Default: ""
+        :params cache: `ResultCache` object, if set, results of calculation with identical inputs are reused. Default: None
+        :params checkpoint: `Checkpoint` object, if set, status and result of this calculation are recorded as `step`. Default: None
+        :params step: name of this calculation in `checkpoint`, e.g. `cal_0`. Default: ""
+        :params resume: return recorded result if `step` in `checkpoint` finished with the same inputs. Default: False
+        :params save: `SaveStrategy` object used to save files into `save_dir`. Default: None, copy all files
         """
 
+        if not (checkpoint and step):
+            self.resumed = False
+            return self._calculate(command, save_dir, cache, save=save, **kwargs)
+
+        # settings are fixed before any attribute is set by calculation
+        inputs = self.inputs_hash(command)
+        self.resumed = False
+        if resume and checkpoint.is_done(step, inputs):
+            print(f"Resume finished {self.__str__()} of {step}", flush=True)
+            self.resumed = True
+            return checkpoint.result(step)
+        checkpoint.start(step, inputs, calculation=str(self),
+                         workdir=str(Path.cwd()))
+        try:
+            res = self._calculate(command, save_dir, cache, save=save, checkpoint=checkpoint,
+                                  step=step, resume=resume, **kwargs)
+        except BaseException as e:
+            checkpoint.fail(step, f"{type(e).__name__}: {e}")
+            raise
+        checkpoint.done(step, res, self.perf)
+        return res
+
+    def _calculate(self, command: Command, save_dir: str_PathLike = "", cache: ResultCache = None, save: SaveStrategy = None, **kwargs):
+        """Prepare, execute, check and parse calculation, see `calculate`"""
+
         self._prepare(**kwargs)
-        self._execute(command, **kwargs)
-        self._check(**kwargs)
-        res = self._parse(**kwargs)
+        files = self._cache_files(**kwargs) if cache else []
+        key = cache.key(files, command) if files else ""
+        res = cache.load(key) if key else None
+        self._exec_results, self._perf_record = [], None
+        if res is None:
+            start = time.perf_counter()
+            self._execute(command, **kwargs)
+            wall_time = time.perf_counter()-start
+            self._check(**kwargs)
+            res = self._parse(**kwargs)
+            self._perf_record = dict(wall_time=wall_time, cpu_time=sum(i.cpu_time for i in self._exec_results),
+                                     max_rss_kb=max([i.max_rss_kb for i in self._exec_results], default=0), **self._perf(**kwargs))
+            if key:
+                cache.store(key, res, self._cache_outputs(**kwargs),
+                            calculation=str(self), workdir=str(Path.cwd()))
+        else:
+            print(f"Reuse cached result of {self.__str__()}", flush=True)
         if save_dir:
-            self.save(save_dir)
+            self.save(save_dir, save)
         return res
 
-    def save(self, save_dir: str_PathLike):
+    def save(self, save_dir: str_PathLike, save: SaveStrategy = None):
         """Save all input and out files of last calculation
 
         :params save_dir: directory where to save all input and output files
+        :params save: `SaveStrategy` object. Default: None, copy all files in working directory
         """
 
-        all_files = Path(".").iterdir()
-        Path(save_dir).mkdir(parents=True, exist_ok=False)
-        for file in all_files:
-            if Path(file).is_file():
-                shutil.copy(file, save_dir)
+        (save or SaveStrategy()).save(save_dir)
 
 
 class ABACUSCalculation(JobCalculation):
@@ -126,17 +690,54 @@ class ABACUSCalculation(JobCalculation):
         :params index: calculation index in workflow
         """
 
-        time = 0
-        with open(f"cal_{index}.log", 'r') as file:
-            for line in file:
-                if re.search("TOTAL  Time  : ", line):
-                    time = re.search(
-                        "(TOTAL  Time  : )([a-z0-9\s]+)", line).group(2)
-        if time == 0:
+        time = read_running_log(f"cal_{index}.log").total_time
+        if time is None:
             raise Exception(f"Calculation {index} may not finish.")
 
         return time
 
+    def _perf(self, index: int = 0, **kwargs) -> dict:
+        """Return `TOTAL  Time` in ABACUS log in seconds
+
+        :params index: calculation index in workflow
+        """
+
+        if not Path(f"cal_{index}.log").exists():
+            return {}
+        return {"abacus_time": read_running_log(f"cal_{index}.log").total_seconds}
+
+    def _cache_files(self, **kwargs) -> list:
+        """Return INPUT, STRU, KPT, pseudopotential and orbital files"""
+
+        files = [Path(i) for i in ["INPUT", "STRU", "KPT"] if Path(i).exists()]
+        for elem in self.stru.elements:
+            if elem in self.stru.pps:
+                files.append(Path(self.input_dict.get(
+                    "pseudo_dir", ""), self.stru.pps[elem]))
+            if elem in self.stru.orbitals:
+                files.append(Path(self.input_dict.get(
+                    "orbital_dir", ""), self.stru.orbitals[elem]))
+        missing = [str(i) for i in files if not i.is_file()]
+        if missing:
+            print(
+                f"{self.__str__()} is not cached, input files not found: {', '.join(missing)}", flush=True)
+            return []
+        return files
+
+    def _cache_outputs(self, index: int = 0, **kwargs) -> list:
+        """Return `OUT.test` and log files of ABACUS calculation
+
+        :params index: calculation index in workflow
+        """
+
+        return [i for i in ["OUT.test", f"cal_{index}.log", f"cal_{index}.err"] if Path(i).exists()]
+
+    def artifacts(self, workdir: str_PathLike = ".") -> typing.List[Path]:
+        """Return charge density and EXX Hamiltonian files in `OUT.test` of `workdir`"""
+
+        outdir = Path(workdir, "OUT.test").resolve()
+        return sorted(outdir.glob("SPIN*_CHG"))+sorted(outdir.glob("HR_exx_*"))
+
     def _get_input_line(self):
         """Return input lines in INPUT file"""
 
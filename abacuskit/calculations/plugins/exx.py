@@ -16,12 +16,13 @@ from copy import deepcopy
 from pathlib import Path
 
 import numpy as np
-from abacuskit.calculations.baseclass import ABACUSCalculation, JobCalculation
+from abacuskit.calculations.baseclass import (ABACUSCalculation, Checkpoint,
+                                              JobCalculation)
 from abacuskit.calculations.plugins.scf import SCF
 from abacuskit.calculations.structure import *
 from abacuskit.schedulers.data import Code
 from abacuskit.utils.IO import *
-from abacuskit.utils.script import set_scheduler
+from abacuskit.utils.script import get_scheduler, set_scheduler, submit_job
 from abacuskit.utils.test import profile
 from abacuskit.utils.tools import *
 from abacuskit.utils.typings import *
@@ -30,7 +31,7 @@ from abacuskit.utils.typings import *
 class SetDimers(ABACUSCalculation):
     """Set and calculate dimers for off-site Auxiliary Basis Functions(ABFs)"""
 
-    def __init__(self, input_dict: dict, stru: typing.Optional[Stru], kpt: typing.Optional[Kpt], Nu: list, dimer_num: int=5, **kwargs) -> None:
+    def __init__(self, input_dict: dict, stru: typing.Optional[Stru], kpt: typing.Optional[Kpt], Nu: list, dimer_num: int=5, opt_mode: str="kmeans", **kwargs) -> None:
         """Set input parameters of dimers calculation
 
         :params input_dict: dict of input parameters
@@ -38,6 +39,7 @@ class SetDimers(ABACUSCalculation):
         :params kpt: object of `abacuskit.calculations.structure.Kpt`
         :params Nu: size of ABFs, e.g. `[4,3,2,1]` means 4s3p2d1f
         :params dimer_num: number of dimers
+        :params opt_mode: way to select dimer distances, `"kmeans"`, `"ckmeans"` or `"linspace"`. Default: "kmeans"
         """
 
         super().__init__(input_dict, stru, kpt, **kwargs)
@@ -47,6 +49,7 @@ class SetDimers(ABACUSCalculation):
         delete_key(self.input_dict)
         self.Nu = Nu
         self.dimer_num = dimer_num
+        self.opt_mode = opt_mode
         self.folder_weight = {}
         self.orb_obj_list = []
         if len(self.stru.orbitals) != 0:
@@ -77,10 +80,9 @@ class SetDimers(ABACUSCalculation):
             elem = orb_obj.element
             nw_dict[elem] = orb_obj.total
             rcut_dict[elem] = orb_obj.rcut
-        dis = cut_dis(cal_dis(self.stru.positions_bohr,
-                      self.stru.supercell_positions(kpoints)), rcut_dict)
-        dis_decimal = round_dis(dis, 1e-6)
-        dis_opt = self.get_dis_opt(dis_decimal)
+        dis = dis_histogram(self.stru.positions_bohr,
+                            self.stru.supercell_images(kpoints, rcut_dict), rcut_dict, 1e-6)
+        dis_opt = self.get_dis_opt(dis)
         dis_weight = self.cal_dis_weight(dis_opt, dis)
         for T1, T2 in dis_weight:
             for i_dis, i_weight in dis_weight[T1, T2].items():
@@ -96,8 +98,7 @@ class SetDimers(ABACUSCalculation):
         :params nw_list: dict of total number of orbitals
         """
 
-        folder = Path(folder_name(T1, T2, i_dis))
-        folder.mkdir(parents=True, exist_ok=False)
+        folder = new_folder(folder_name(T1, T2, i_dis))
         elements = [T1, ] if T1 == T2 else [T1, T2]
 
         # Orbital
@@ -154,13 +155,14 @@ class SetDimers(ABACUSCalculation):
 
         return str(folder.resolve())
 
-    def get_dis_opt(self, dis: Dict_Tuple_Dict, opt_mode: str = "kmeans") -> Dict_Tuple_Dict:
+    def get_dis_opt(self, dis: Dict_Tuple_Dict, opt_mode: str = None) -> Dict_Tuple_Dict:
         """Select some representative point in dictionary of distance
 
         :params dis: dict, distance between two atoms. Its format is `dis[T1,T2] = {..., i_dis:num, ...}`
-        :params opt_mode: str, way to select
+        :params opt_mode: str, way to select. `"ckmeans"` is exact and deterministic weighted k-means. Default: None, `self.opt_mode`
         """
 
+        opt_mode = opt_mode or self.opt_mode
         dis_opt = dict()
         for T1, T2 in dis:
             dis_tmp = delete_zero(dis[T1, T2])
@@ -168,14 +170,20 @@ class SetDimers(ABACUSCalculation):
                 dis_opt[T1, T2] = list(dis_tmp.keys())
             else:
                 if opt_mode == "linspace":
-                    dis_opt[T1, T2] = np.linspace(
-                        min(dis_tmp), max(dis_tmp), self.dimer_num)
+                    dis_opt[T1, T2] = list(np.linspace(
+                        min(dis_tmp), max(dis_tmp), self.dimer_num))
+                elif opt_mode == "ckmeans":
+                    centers, labels = ckmeans(list(dis_tmp.keys()), self.dimer_num,
+                                              [num/i_dis**2 for i_dis, num in dis_tmp.items()])
+                    dis_opt[T1, T2] = list(centers)
                 elif opt_mode == "kmeans":
                     from sklearn.cluster import KMeans
                     kmeans = KMeans(n_clusters=self.dimer_num)
                     kmeans.fit_predict(np.array(list(dis_tmp.keys())).reshape(-1, 1),
                                        sample_weight=[num/i_dis**2 for i_dis, num in dis_tmp.items()])
                     dis_opt[T1, T2] = list(kmeans.cluster_centers_.reshape(-1))
+                else:
+                    raise ValueError(f"`opt_mode` {opt_mode} is not supported.")
             if T1 == T2:
                 dis_opt[T1, T2].append(0.0)
 
@@ -188,24 +196,64 @@ class SetDimers(ABACUSCalculation):
         dis_weight = defaultdict(dict)
         for T1, T2 in dis_opt:
             dis_opt_TT = sorted(dis_opt[T1, T2])
+            opt = np.array(dis_opt_TT, dtype=float)
+            nopt = len(opt)
+            dis = np.fromiter(dis_all[T1, T2].keys(), dtype=float)
+            num = np.fromiter(dis_all[T1, T2].values(), dtype=float)
+            # opt[left-1] < dis <= opt[left] and opt[right-1] <= dis < opt[right]
+            left = np.searchsorted(opt, dis, side="left")
+            right = np.searchsorted(opt, dis, side="right")
+
+            # distance equal to optimal distances adds its number to each of them
+            count = right-left
+            equal = np.repeat(np.arange(len(dis)), count)
+            offset = np.arange(len(equal)) - \
+                np.repeat(np.cumsum(count)-count, count)
+            equal_target = left[equal]+offset
+
+            # distance between opt[left-1] and opt[left] is shared by both of them
+            between = count == 0
+            up = np.nonzero(between & (left < nopt))[0]
+            low = np.nonzero(between & (left > 0))[0]
+            opt_left = opt[left[up]]
+            opt_low = np.where(left[up] > 0, opt[left[up]-1], -np.inf)
+            opt_right = opt[left[low]-1]
+            opt_up = np.where(left[low] < nopt, opt[np.minimum(
+                left[low], nopt-1)], np.inf)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weight_up = weight_func(
+                    opt_left-dis[up], opt_left-opt_low)*num[up]
+                weight_low = weight_func(
+                    opt_right-dis[low], opt_right-opt_up)*num[low]
+
+            source = np.concatenate([equal, up, low])
+            target = np.concatenate([equal_target, left[up], left[low]-1])
+            weight = np.concatenate([num[equal], weight_up, weight_low])
+            # add contributions in order of `dis_all`, so float sums are the same as adding them one by one
+            order = np.argsort(source, kind="stable")
+            weights = np.bincount(
+                target[order], weights=weight[order], minlength=nopt)
+            smooth = np.bincount(np.concatenate(
+                [left[up], left[low]-1]), minlength=nopt) > 0
             for index, i_dis_opt in enumerate(dis_opt_TT):
-                i_weight = 0
-                i_dis_low = dis_opt_TT[index-1] if index > 0 else -np.infty
-                i_dis_up = dis_opt_TT[index +
-                                      1] if index < len(dis_opt_TT)-1 else np.infty
-                for i_dis, num in dis_all[T1, T2].items():
-                    if i_dis_low < i_dis < i_dis_opt:
-                        i_weight += weight_func(i_dis_opt -
-                                                i_dis, i_dis_opt-i_dis_low) * num
-                    elif i_dis == i_dis_opt:
-                        i_weight += num
-                    elif i_dis_opt < i_dis < i_dis_up:
-                        i_weight += weight_func(i_dis_opt -
-                                                i_dis, i_dis_opt-i_dis_up) * num
-                dis_weight[T1, T2][i_dis_opt] = i_weight
+                dis_weight[T1, T2][i_dis_opt] = weights[index] if smooth[index] else int(
+                    weights[index])
 
         return dis_weight
 
+    def _cache_files(self, **kwargs) -> list:
+        """Dimers are calculated in their own directories, so they are never cached"""
+
+        return []
+
+    def outputs(self, workdir: str_PathLike = ".") -> typing.List[Path]:
+        """Return file `folders` and dimer folders listed in it, which are read by `OptABFs`"""
+
+        filename = Path(workdir, "folders").resolve()
+        if not filename.exists():
+            return []
+        return [filename]+[filename.parent/folder for folder in read_json(filename) if (filename.parent/folder).exists()]
+
     def _execute(self, command: Command, count: int = 1, **kwargs):
         """Execute calculation
 
@@ -220,36 +268,22 @@ class SetDimers(ABACUSCalculation):
         with open(filename, 'w') as file:
             json.dump(subfolder_weight, file, indent=4)
 
-        def set_commands(one_list, command):
-            if isinstance(command, Code):
-                command = command.run_line()
-            commands = []
-            for folder in one_list:
-                commands.append(f"(cd {folder};{command};cd ../) &")
-            newline = '\n'.join(commands)+"\nwait\n"
-            return newline
-        current_path = Path.cwd()
-        lines = []
         all_list = np.array_split(list(self.folder_weight.keys()), count)
         for one_list in all_list:
-            lines.append(set_commands(one_list, command))
-
-        os.system('\n'.join(lines))
-        os.chdir(current_path)
+            self._run_all(command, one_list)
 
         # double check
-        newcommands = []
+        newfolders = []
         for folder in self.folder_weight:
             if not glob.glob(f"{folder}/matrix_*"):
                 import warnings
                 warnings.warn(
-                    "'matrix_*' file not found in {folder}, it will execute again.")
-                newcommands.append(f"(cd {folder};{command};cd ../) &")
-        os.system('\n'.join(newcommands))
-        os.chdir(current_path)
+                    f"'matrix_*' file not found in {folder}, it will execute again.")
+                newfolders.append(folder)
+        self._run_all(command, newfolders)
 
     def batch_run(self, command: Code, scheduler: str, **kwargs):
-        """Batch execute dimer calculation
+        """Batch execute dimer calculation as one array job, each array task runs in one dimer folder, or one job per folder if `scheduler` does not support job array
 
         :params command: abacuskit.schedulers.data.Code` object to execute calculation
         :params scheduler: string of scheduler name
@@ -263,33 +297,48 @@ class SetDimers(ABACUSCalculation):
         with open(filename, 'w') as file:
             json.dump(subfolder_weight, file, indent=4)
 
-        current_path = Path.cwd()
-        codes_info = [command]
-        for folder in self.folder_weight:
-            os.chdir(folder)
-            submit_command = set_scheduler(scheduler, codes_info, **kwargs)
-            os.system(submit_command)
-            os.chdir(current_path)
+        self._submit_array(command, scheduler, list(self.folder_weight), **kwargs)
 
     def double_run(self, command: Command, scheduler: str, **kwargs):
-        """Check if job is finished and execute again
+        """Check if job is finished and execute unfinished folders again as one array job, or one job per folder if `scheduler` does not support job array
 
         :params command: abacuskit.schedulers.data.Code` object to execute calculation
         :params scheduler: string of scheduler name
         :params kwargs: other parameters of scheduler
         """
 
-        current_path = Path.cwd()
-        codes_info = [command]
+        newfolders = []
         for folder in read_json("folders"):
             if not glob.glob(f"{folder}/matrix_*"):
                 import warnings
                 warnings.warn(
                     f"'matrix_*' file not found in {folder}, it will execute again.")
+                newfolders.append(folder)
+        self._submit_array(command, scheduler, newfolders, **kwargs)
+
+    def _submit_array(self, command: Code, scheduler: str, folders: list, **kwargs):
+        """Write one submit script of array job for `folders` in current directory and submit it, or submit one job in each folder if `scheduler` does not support job array
+
+        :params command: abacuskit.schedulers.data.Code` object to execute calculation
+        :params scheduler: string of scheduler name
+        :params folders: list of dimer folders
+        :params kwargs: other parameters of scheduler
+        """
+
+        if not folders:
+            return
+        if not get_scheduler(scheduler).supports_job_array:
+            current_path = Path.cwd()
+            for folder in folders:
                 os.chdir(folder)
-                submit_command = set_scheduler(scheduler, codes_info, **kwargs)
-                os.system(submit_command)
+                submit_command = set_scheduler(scheduler, [command], **kwargs)
                 os.chdir(current_path)
+                submit_job(scheduler, submit_command, cwd=folder)
+            return
+        job_array = [str(Path(folder).resolve()) for folder in folders]
+        submit_command = set_scheduler(
+            scheduler, [command], job_array=job_array, **kwargs)
+        submit_job(scheduler, submit_command, array=len(job_array))
 
     def _check(self, **kwargs):
         """Check if job is finished"""
@@ -340,8 +389,8 @@ class OptABFs(JobCalculation):
         """Prepare input files for optimizing ABFs e.g. input.json"""
 
         self.folder_opt = Path("opt_orb_"+"-".join(list_elem2str(self.Nu)))
-        folder_opt_matrix = self.folder_opt/"matrix"
-        folder_opt_matrix.mkdir(parents=True, exist_ok=False)
+        folder_opt_matrix = new_folder(self.folder_opt)/"matrix"
+        folder_opt_matrix.mkdir()
 
         if not Path("folders").exists():
             raise FileNotFoundError(
@@ -407,11 +456,9 @@ class OptABFs(JobCalculation):
         if isinstance(command, Code):
             command = command.run_line()
 
-        current_path = Path.cwd()
-        os.chdir(self.folder_opt)
-        os.environ["MKL_THREADING_LAYER"] = "GNU"
-        os.system(command)
-        os.chdir(current_path)
+        # MKL_THREADING_LAYER=INTEL is incompatible with libgomp.so.1 library
+        self.exec_result = self._run(
+            command, self.folder_opt, {"MKL_THREADING_LAYER": "GNU"})
 
     def _check(self, **kwargs):
         """Check if job is finished"""
@@ -425,7 +472,7 @@ class OptABFs(JobCalculation):
         """Parse output of a finished job"""
 
         subdst = Path("exx_"+"-".join(list_elem2str(self.Nu)))
-        subdst.mkdir(parents=True, exist_ok=False)
+        subdst.mkdir(parents=True, exist_ok=True)
 
         # ABFs
         for elem in self.stru.elements:
@@ -470,14 +517,21 @@ class EXX(SCF):
         """Prepare input files for hybrid  e.g. input.json"""
 
         self.obj_setdimers = SetDimers(deepcopy(self.input_dict), self.stru, self.kpt,
-                                       self.Nu, self.dimer_num, **self.kwargs) if not Path("folders").exists() else None
+                                       self.Nu, self.dimer_num, **self.kwargs)
         self.obj_optabfs = OptABFs(self.input_dict["exx_opt_orb_ecut"], self.stru, self.Nu, self.dr, self.lr,
-                                   **self.kwargs) if not Path("opt_orb_"+"-".join(list_elem2str(self.Nu))).exists() else None
+                                   **self.kwargs)
 
-    def _execute(self, command: Code, external_command: Command = "", **kwargs):
-        """Execute calculation
+    def _cache_files(self, **kwargs) -> list:
+        """Hybrid functional calculation runs in its own directory, so it is never cached"""
+
+        return []
+
+    def _execute(self, command: Code, external_command: Command = "", checkpoint: Checkpoint = None, step: str = "", resume: bool = False, rerun: bool = False, **kwargs):
+        """Execute calculation, `SetDimers` and `OptABFs` are recorded as sub-steps `{step}/SetDimers` and `{step}/OptABFs` of `checkpoint`.
+        They are skipped if their output directories exist, unless `checkpoint` records them unfinished or with other inputs, see `_skip`, so `resume` is not used for them.
 
         :params command: abacuskit.schedulers.data.Code` object to execute calculation
+        :params rerun: execute `SetDimers` and `OptABFs` again even if they would be skipped, e.g. to measure performance of the whole calculation. Default: False
         """
 
         if not isinstance(command, Code):
@@ -486,19 +540,24 @@ class EXX(SCF):
 
         current_path = Path.cwd()
         # set dimer
-        if not Path("folders").exists():
-            dimer_line = Code(code_name=command.code_name,
-                              cmdline_params=['-np 1'],
-                              stdout_name=command.stdout_name,
-                              stderr_name=command.stderr_name,
-                              withmpi=command.withmpi).run_line()
-            self.obj_setdimers.calculate(dimer_line, **kwargs)
-
-        # optimize ABFs
-        if not Path("opt_orb_"+"-".join(list_elem2str(self.Nu))).exists():
-            if isinstance(external_command, Code):
-                external_command = external_command.run_line()
-            self.obj_optabfs.calculate(external_command, **kwargs)
+        dimer_line = Code(code_name=command.code_name,
+                          cmdline_params=['-np 1'],
+                          stdout_name=command.stdout_name,
+                          stderr_name=command.stderr_name,
+                          withmpi=command.withmpi).run_line()
+        dimers_skipped = not rerun and self._skip(self.obj_setdimers, dimer_line, "folders",
+                                                  checkpoint, f"{step}/SetDimers")
+        if not dimers_skipped:
+            self.obj_setdimers.calculate(dimer_line, checkpoint=checkpoint,
+                                         step=f"{step}/SetDimers", **kwargs)
+
+        # optimize ABFs, ABFs fitted to recalculated dimers are stale
+        if isinstance(external_command, Code):
+            external_command = external_command.run_line()
+        if not (dimers_skipped and self._skip(self.obj_optabfs, external_command, "opt_orb_"+"-".join(list_elem2str(self.Nu)),
+                                              checkpoint, f"{step}/OptABFs")):
+            self.obj_optabfs.calculate(external_command, checkpoint=checkpoint,
+                                       step=f"{step}/OptABFs", **kwargs)
 
         # Exx calculation
         os.chdir("exx_"+"-".join(list_elem2str(self.Nu)))
@@ -511,8 +570,26 @@ class EXX(SCF):
             self.kpt.write_kpt("KPT")
         elif self.input_dict["gamma_only"] != 1:
             raise FileNotFoundError("`gamma_only` can only be 1 or 0.")
-        os.system(command.run_line())
         os.chdir(current_path)
+        self.exec_result = self._run(
+            command, "exx_"+"-".join(list_elem2str(self.Nu)))
+
+    def _skip(self, cal: JobCalculation, command: Command, output: str_PathLike, checkpoint: Checkpoint = None, step: str = "") -> bool:
+        """Return whether sub-step `cal` is skipped: its `output` exists and `checkpoint` has no record of `step`, or records it finished with the same inputs
+
+        :params cal: `SetDimers` or `OptABFs` object
+        :params command: command of sub-step
+        :params output: output file or directory of sub-step
+        :params checkpoint: `Checkpoint` object. Default: None
+        :params step: name of sub-step in `checkpoint`. Default: ""
+        """
+
+        if not Path(output).exists():
+            return False
+        if checkpoint and step and step in checkpoint.load() and not checkpoint.is_done(step, cal.inputs_hash(command)):
+            return False
+        print(f"Skip {cal.__str__()}, `{output}` exists", flush=True)
+        return True
 
     def _check(self, index: int = 0, **kwargs) -> typing.Union[int, str]:
         """Check if job is finished"""
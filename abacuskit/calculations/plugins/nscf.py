@@ -38,6 +38,7 @@ class BAND(NSCF):
         :params input_dict: dict of input parameters
         :params stru: object of `abacuskit.calculations.structure.Stru`
         :params kpt: object of `abacuskit.calculations.structure.Kpt`
+        :params density_file: list of absolute path of density files, if not set, they are received from the calculation it depends on. Default: ""
         """
 
         super().__init__(input_dict, stru, kpt, **kwargs)
@@ -62,6 +63,25 @@ class BAND(NSCF):
             for i in self.density_file:
                 shutil.copy(i, outdir)
 
+    def receive_artifacts(self, artifacts: typing.Sequence[Path]):
+        """Use density files of the calculation it depends on if `density_file` is not set"""
+
+        if not self.density_file:
+            self.density_file = [str(i) for i in artifacts]
+
+    def _cache_files(self, **kwargs) -> list:
+        """Return input files of ABACUS calculation and density files"""
+
+        files = super()._cache_files(**kwargs)
+        if not files:
+            return []
+        missing = [str(i) for i in self.density_file if not Path(i).is_file()]
+        if missing:
+            print(
+                f"{self.__str__()} is not cached, density files not found: {', '.join(missing)}", flush=True)
+            return []
+        return files + [Path(i) for i in self.density_file]
+
     def _parse(self, **kwargs) -> dict:
         """parse output of nscf calculation
 
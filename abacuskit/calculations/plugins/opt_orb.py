@@ -13,12 +13,13 @@ import textwrap
 from pathlib import Path
 
 import numpy as np
-from abacuskit.calculations.baseclass import JobCalculation
+from abacuskit.calculations.baseclass import Checkpoint, JobCalculation
 from abacuskit.calculations.plugins.dis import distance
 from abacuskit.calculations.structure import Stru
 from abacuskit.schedulers.data import Code
 from abacuskit.utils.IO import read_json
-from abacuskit.utils.tools import folder_name, get_input_line, list_elem2str
+from abacuskit.utils.tools import (folder_name, get_input_line, list_elem2str,
+                                   new_folder)
 from abacuskit.utils.typings import *
 
 
@@ -126,8 +127,7 @@ class SetDimers(JobCalculation):
         :params i_dis: distance of dimers
         """
 
-        folder = Path(folder_name(self.element, self.rcut, i_dis))
-        folder.mkdir(parents=True, exist_ok=False)
+        folder = new_folder(folder_name(self.element, self.rcut, i_dis))
 
         # Pseudopotential
         for i in self.pps.values():
@@ -197,22 +197,9 @@ class SetDimers(JobCalculation):
         with open(filename, 'w') as file:  
             json.dump(data, file, indent=4)
 
-        def set_commands(one_list, command):
-            if isinstance(command, Code):
-                command = command.run_line()
-            commands = []
-            for folder in one_list:
-                commands.append(f"(cd {folder};{command};cd ../) &")
-            line =  '\n'.join(commands)+"\nwait\n"
-            return line
-
-        lines = []
-        current_path = Path.cwd()
         all_list = np.array_split(self.folder_list, count)
         for one_list in all_list:
-            lines.append(set_commands(one_list, command))
-        os.system('\n'.join(lines))
-        os.chdir(current_path)
+            self._run_all(command, one_list)
 
     def _check(self, **kwargs):
         """Check if job is finished"""
@@ -231,6 +218,13 @@ class SetDimers(JobCalculation):
 
         return res
 
+    def outputs(self, workdir: str_PathLike = ".") -> typing.List[Path]:
+        """Return file `folders` read by `OptLCAO`, it lists absolute paths of data files of dimers"""
+
+        filename = Path(workdir, "folders").resolve()
+        return [filename] if filename.exists() else []
+
+
 class OptLCAO(JobCalculation):
     """Optimize atomic orbitals(LCAO)"""
 
@@ -263,7 +257,7 @@ class OptLCAO(JobCalculation):
         """Prepare input files for optimizing ABFs e.g. input.json"""
 
         self.folder_opt = Path("opt_orb_"+"-".join(list_elem2str(self.Nu)))
-        self.folder_opt.mkdir(exist_ok=False)
+        new_folder(self.folder_opt)
 
         if not Path("folders").exists():
             raise FileNotFoundError("'folders' which is a out file of `SetDimers` calculations not found.")
@@ -302,16 +296,9 @@ class OptLCAO(JobCalculation):
     def _execute(self, command: Command, **kwargs):
         """Execute calculation"""
         
-        if isinstance(command, Code):
-            line = command.run_line()
-        elif isinstance(command, str):
-            line = command
-
-        current_path = Path.cwd()
-        os.chdir(self.folder_opt)
-        os.environ["MKL_THREADING_LAYER"] = "GNU"
-        os.system(line)
-        os.chdir(current_path)
+        # MKL_THREADING_LAYER=INTEL is incompatible with libgomp.so.1 library
+        self.exec_result = self._run(
+            command, self.folder_opt, {"MKL_THREADING_LAYER": "GNU"})
 
     def _check(self, **kwargs):
         """Check if job is finished"""
@@ -376,17 +363,19 @@ class LCAO(JobCalculation):
         self.obj_setdimers = SetDimers(self.element, self.ecutwfc, self.nbands, self.ref_band, self.Nu, self.rcut, self.pps, self.sigma, self.target, **self.kwargs)
         self.obj_optlcao = OptLCAO(self.element, self.ecutwfc, self.ref_band, self.Nu, self.rcut, self.target, self.cal_T, self.cal_smooth, self.dr, self.lr, **self.kwargs)
 
-    def _execute(self, command: Command, external_command: Code, **kwargs):
-        """Execute calculation
+    def _execute(self, command: Command, external_command: Code, checkpoint: Checkpoint = None, step: str = "", resume: bool = False, **kwargs):
+        """Execute calculation, `SetDimers` and `OptLCAO` are recorded as sub-steps `{step}/SetDimers` and `{step}/OptLCAO` of `checkpoint`
 
         :params command: abacuskit.schedulers.data.Code` object to execute calculation
         """
 
         # set dimer
-        self.obj_setdimers.calculate(command, **kwargs)
+        self.obj_setdimers.calculate(command, checkpoint=checkpoint,
+                                     step=f"{step}/SetDimers", resume=resume, **kwargs)
 
         # optimize LCAO
-        self.obj_optlcao.calculate(external_command, **kwargs)
+        self.obj_optlcao.calculate(external_command, checkpoint=checkpoint, step=f"{step}/OptLCAO",
+                                   resume=resume and self.obj_setdimers.resumed, **kwargs)
 
     def _check(self, **kwargs):
         """Check if job is finished"""
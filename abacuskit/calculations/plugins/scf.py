@@ -5,13 +5,15 @@ LastEditTime: 2021-05-17 09:37:31
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
-import re
 import typing
+from pathlib import Path
 
 import numpy as np
 from abacuskit.calculations.baseclass import ABACUSCalculation
 from abacuskit.calculations.structure import Kpt, Stru
 from abacuskit.utils.IO import read_stru
+from abacuskit.utils.running import read_running_log
+from abacuskit.utils.typings import *
 
 
 class SCF(ABACUSCalculation):
@@ -33,14 +35,13 @@ class SCF(ABACUSCalculation):
         """parse output of scf calculation"""
 
         res = {}
-        self.stru.set_energy(self.logfile)
+        log = read_running_log(self.logfile)
+        self.stru.set_energy(log)
         res["etot"] = self.stru.energy
-        with open(self.logfile, 'r') as file:
-            for line in file:
-                if re.search("The Ionic Phase", line):
-                    res["ionic phase"] = float(line.split()[3])
-                if re.search("Electronic Phase", line):
-                    res["electronic phase"] = float(line.split()[2])
+        if log.ionic_phase is not None:
+            res["ionic phase"] = log.ionic_phase
+        if log.electronic_phase is not None:
+            res["electronic phase"] = log.electronic_phase
 
         return res
 
@@ -65,20 +66,11 @@ class RELAX(SCF):
         """parse output of scf calculation"""
 
         res = super()._parse(**kwargs)
-        with open(self.logfile, 'r') as file:
-            for line in file:
-                if re.search(r"TOTAL ATOM NUMBER = [0-9]+", line):
-                    natom = int(re.search("[0-9]+", line).group())
-                    force = np.zeros((natom, 3))
-                if re.search("TOTAL-FORCE \(eV/Angstrom\)", line):
-                    for i in range(3):
-                        file.readline()
-                    for i in range(natom):
-                        element, fx, fy, fz = file.readline().split()
-                        force[i] = (float(fx), float(fy), float(fz))
-                    res["force_mean"] = force.mean()
-
-        obj = read_stru(self.input_dict["ntype"], "OUT.test/STRU_ION_D")
+        log = read_running_log(self.logfile)
+        if log.forces:
+            res["force_mean"] = log.force.mean()
+
+        obj = read_stru(stru_file="OUT.test/STRU_ION_D")
         plist = []
         for elem in obj.elements:
             plist = np.mean(obj.positions[elem])
@@ -87,6 +79,12 @@ class RELAX(SCF):
 
         return res
 
+    def outputs(self, workdir: str_PathLike = ".") -> typing.List[Path]:
+        """Return charge density, EXX Hamiltonian files and relaxed structure `OUT.test/STRU_ION_D`"""
+
+        stru_file = Path(workdir, "OUT.test", "STRU_ION_D").resolve()
+        return self.artifacts(workdir)+([stru_file] if stru_file.exists() else [])
+
 
 class CELL_RELAX(RELAX):
     """Cell relax calculation"""
@@ -108,15 +106,8 @@ class CELL_RELAX(RELAX):
         """parse output of cell-relax calculation"""
 
         res = super()._parse(**kwargs)
-        with open(self.logfile, 'r') as file:
-            for line in file:
-                if re.search("TOTAL-STRESS \(KBAR\)", line):
-                    stress = np.zeros((3, 3))
-                    for i in range(3):
-                        file.readline()
-                    for i in range(3):
-                        stress[i] = np.array(
-                            file.readline().split(), dtype=np.float)
-                    res["stress_mean"] = stress.mean()
+        log = read_running_log(self.logfile)
+        if log.stresses:
+            res["stress_mean"] = log.stress.mean()
 
         return res
@@ -18,6 +18,7 @@ from io import TextIOWrapper
 
 import numpy as np
 from abacuskit.utils.constants import BOHR_TO_A
+from abacuskit.utils.running import RunningLog, read_running_log
 from abacuskit.utils.tools import list_elem2str
 from abacuskit.utils.typings import *
 
@@ -109,131 +110,106 @@ def Cartesian_angstrom2Cartesian(positions: Dict_str_list) -> Dict_str_list:
     return new_positions
 
 
-class Stru:
-    """ABACUS `STRU` file information"""
+def _columns(values: typing.Sequence) -> typing.Optional[list]:
+    """Return columns of 2-D `values` as lists of Python numbers whose `str` is the same as that of elements of `values`, None if `values` can not be converted at a time
 
-    def __init__(self, lat0: float=1/BOHR_TO_A, cell: list=[], pps: Dict_str_str={}, positions: Dict_str_list = {}, scaled_positions: Dict_str_list = {}, positions_angstrom_lat0: Dict_str_list = {}, orbitals: Dict_str_str = {}, masses: Dict_str_float = {}, magmoms: Dict_str_float = {}, move: Dict_str_int = {}, abfs: Dict_str_str = {}) -> None:
-        """Initialize Stru object
+    :params values: 2-D array or list of rows
+    """
 
-        :params lat0: float, lattice constant in unit bohr.
-        :params cell: list, lattice vector in unit `lat0`.
-        :params pps: dict, dict of pseudopotential file.
-        :params positions: dict, key is element name and value is list of atomic Cartesian coordinates in unit lat0.
-        :params scaled_positions: dict, key is element name and value is list of atomic direct coordinates in unit lat0. This parameter had better not be set at the same time with `positions`.
-                                Because Cartesian coordinates will be calculated automatically based on direct coordinates and lattice vector `cell`. So self.positions still exists.
-        :params positions_angstrom_lat0: dict, key is element name and value is list of atomic Cartesian_angstrom coordinates in unit lat0. This parameter had better not be set at the same time with `positions`.
-                                Because Cartesian coordinates will be calculated automatically based on Cartesian_angstrom coordinates. So self.positions still exists.
-        :params orbitals: dict, dict of orbital file.
-        :params masses: dict, dict of atomic mass.
-        :params magmoms: dict, dict of magnetic moment.
-        :params move: dict, key is element name and value is list of 1 or 0, `1` means atom can move.
-        :params abfs: dict, dict of ABFs for hybrid functional calculation.
-        """
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return None
+    if array.ndim != 2 or not (array.dtype == np.float64 or array.dtype.kind in 'iu'):
+        return None
+    # `int` mixed with `float` in lists is converted to float, but its `str` has no decimal point
+    if array.dtype.kind == 'f' and not isinstance(values, np.ndarray) and not all(isinstance(value, float) for value in itertools.chain.from_iterable(values)):
+        return None
+    return array.T.tolist()
 
-        self.lat0 = lat0
-        self.cell = cell
-        if positions and scaled_positions and positions_angstrom_lat0:
-            raise TypeError(
-                "'positions', 'scaled_positions' and `positions_angstrom_lat0` can not be set simultaneously")
-        elif positions:
-            self._ctype = "Cartesian"
-            self.positions = positions
-            self.scaled_positions = Cartesian2Direct(positions, self.cell)
-        elif scaled_positions:
-            self._ctype = "Direct"
-            self.scaled_positions = scaled_positions
-            self.positions = Direct2Cartesian(scaled_positions, self.cell)
-        elif positions_angstrom_lat0:
-            self._ctype = "Cartesian_angstrom"
-            self.positions_angstrom_lat0 = positions_angstrom_lat0
-            self.positions = Cartesian_angstrom2Cartesian(
-                positions_angstrom_lat0)
-        else:
-            raise TypeError(
-                "One of 'positions' and 'scaled_positions' must be set")
-        self.elements = []
-        self.numbers = OrderedDict()
-        for elem in self.positions:
-            self.elements.append(elem)
-            self.numbers[elem] = len(self.positions[elem])
-        self.pps = pps
-        self.orbitals = orbitals
-        if masses:
-            self.masses = masses
-        else:
-            self.masses = {elem: 1 for elem in self.elements}
-        if magmoms:
-            self.magmoms = magmoms
-        else:
-            self.magmoms = {elem: 0 for elem in self.elements}
-        if not move:
-            move = defaultdict(list)
-            for elem in self.elements:
-                for j in range(self.numbers[elem]):
-                    move[elem].append([1, 1, 1])
-        self.move = move
-        self.abfs = abfs
 
-        self.energy = None
-        self.efermi = None
+def _atom_lines(positions: typing.Sequence, move: typing.Sequence) -> str:
+    """Return lines of atoms in `STRU` file, each of them is coordinates followed by move flags and ends with a newline
 
-    @property
-    def positions_bohr(self):
-        new_positions = deepcopy(self.positions)
-        for pos in new_positions:
-            new_positions[pos] = np.array(new_positions[pos]) * self.lat0
+    :params positions: 2-D array or list of atomic coordinates
+    :params move: 2-D array or list of move flags with the same length as `positions`
+    """
 
-        return new_positions
+    if not len(positions):
+        return ''
+    columns = _columns(positions)
+    move_columns = _columns(move) if columns else None
+    if move_columns and len(move_columns[0]) == len(columns[0]):
+        template = ' '.join(['{}']*len(columns)) + \
+            ' '+' '.join(['{}']*len(move_columns))
+        return '\n'.join(map(template.format, *columns, *move_columns))+'\n'
+    return ''.join(" ".join(list_elem2str(positions[j]))+" "+" ".join(list_elem2str(move[j]))+'\n' for j in range(len(positions)))
 
-    def get_stru(self) -> str:
-        """Return the `STRU` file as a string"""
 
-        empty_line = ''
+class BaseStru:
+    """Methods shared by `Stru` and `CompactStru`, which set `lat0`, `cell`, `pps`, `orbitals`, `masses`, `magmoms`, `abfs`, `energy`, `efermi` and dict attributes `positions`, `scaled_positions`, `positions_angstrom_lat0`, `positions_bohr`, `move` and `numbers`"""
+
+    __slots__ = ()
+
+    def _stru_chunks(self, chunk_size: int = 1 << 14) -> typing.Iterator[str]:
+        """Yield parts of the `STRU` file in order, coordinates of at most `chunk_size` atoms in each part
+
+        :params chunk_size: number of atoms formatted at a time. Default: 16384
+        """
+
         line = []
         line.append("ATOMIC_SPECIES")
         for elem in self.elements:
             line.append(f"{elem}\t{self.masses[elem]}\t{self.pps[elem]}")
-        line.append(empty_line)
+        line.append('')
 
         if self.orbitals:
             line.append("NUMERICAL_ORBITAL")
             for elem in self.elements:
                 line.append(f"{self.orbitals[elem]}")
-            line.append(empty_line)
+            line.append('')
 
         if self.abfs:
             line.append("ABFS_ORBITAL")
             for elem in self.elements:
                 line.append(f"{self.abfs[elem]}")
-            line.append(empty_line)
+            line.append('')
 
         line.append("LATTICE_CONSTANT")
         line.append(str(self.lat0))
-        line.append(empty_line)
+        line.append('')
 
         line.append("LATTICE_VECTORS")
         for i in range(3):
             line.append(" ".join(list_elem2str(self.cell[i])))
-        line.append(empty_line)
+        line.append('')
 
         line.append("ATOMIC_POSITIONS")
         line.append(self._ctype)
-        line.append(empty_line)
+        yield '\n'.join(line)+'\n'
+
+        if self._ctype == "Cartesian":
+            positions = self.positions
+        elif self._ctype == "Direct":
+            positions = self.scaled_positions
+        elif self._ctype == "Cartesian_angstrom":
+            positions = self.positions_angstrom_lat0
+        else:
+            positions = {}
+        numbers = self.numbers
+        move = self.move
+        # each element is separated from what is before it by an empty line
         for elem in self.elements:
-            line.append(f"{elem}\n{self.magmoms[elem]}\n{self.numbers[elem]}")
-            for j in range(self.numbers[elem]):
-                if self._ctype == "Cartesian":
-                    line.append(" ".join(list_elem2str(
-                        self.positions[elem][j]))+" "+" ".join(list_elem2str(self.move[elem][j])))
-                elif self._ctype == "Direct":
-                    line.append(" ".join(list_elem2str(
-                        self.scaled_positions[elem][j]))+" "+" ".join(list_elem2str(self.move[elem][j])))
-                elif self._ctype == "Cartesian_angstrom":
-                    line.append(" ".join(list_elem2str(
-                        self.positions_angstrom_lat0[elem][j]))+" "+" ".join(list_elem2str(self.move[elem][j])))
-            line.append(empty_line)
+            yield f"\n{elem}\n{self.magmoms[elem]}\n{numbers[elem]}\n"
+            if elem in positions:
+                for start in range(0, numbers[elem], chunk_size):
+                    stop = min(start+chunk_size, numbers[elem])
+                    yield _atom_lines(positions[elem][start:stop], move[elem][start:stop])
 
-        return '\n'.join(line)
+    def get_stru(self) -> str:
+        """Return the `STRU` file as a string"""
+
+        return ''.join(self._stru_chunks())
 
     def write_stru(self, filename: str = "STRU") -> None:
         """write `STRU` file
@@ -242,7 +218,7 @@ class Stru:
         """
 
         with open(filename, 'w') as file:
-            file.write(self.get_stru())
+            file.writelines(self._stru_chunks())
 
     @property
     def cellpar(self):
@@ -349,19 +325,51 @@ class Stru:
 
         lat_vec = np.array(self.cell) * self.lat0
         R = deepcopy(self.positions_bohr)
-
-        nx, ny, nz = kpt
+        translations = np.dot(np.indices(kpt).reshape(3, -1).T, lat_vec)
         for pos in R:
-            R_new = []
-            for ix in range(nx):
-                for iy in range(ny):
-                    for iz in range(nz):
-                        R_new.append(
-                            R[pos]+np.dot(np.array([ix, iy, iz]), lat_vec))
-            R[pos] = np.concatenate(R_new)
+            R[pos] = (np.asarray(R[pos])[None, :, :] +
+                      translations[:, None, :]).reshape(-1, 3)
 
         return R
 
+    def supercell_images(self, kpt: list, Rcut: Dict_str_float, chunk_size: int = 1 << 16) -> typing.Dict[str, "SupercellImages"]:
+        """Return lazy supercell atomic positions, images which can not be within cut-off radius of any atom in the cell are never generated
+
+        :params kpt: list of number of k-points in each directions
+        :params Rcut: dict, orbitals cut-off radius in unit bohr, images of element `T2` are kept within `Rcut[T2]+max(Rcut)`
+        :params chunk_size: approximate number of positions in each chunk
+        """
+
+        lat_vec = np.array(self.cell, dtype=float) * self.lat0
+        # row i is reciprocal vector b_i with a_j.b_i = delta_ij, 1/|b_i| is spacing of lattice planes
+        recip = np.linalg.inv(lat_vec).T
+        spacing = 1/np.linalg.norm(recip, axis=1)
+        R = {elem: np.asarray(pos, dtype=float).reshape(-1, 3)
+             for elem, pos in self.positions_bohr.items()}
+        R_all = np.concatenate(list(R.values()))
+        frac_all = np.dot(R_all, recip.T)
+        center_all = R_all.mean(axis=0)
+        radius_all = np.linalg.norm(R_all-center_all, axis=1).max()
+
+        images = dict()
+        for elem, pos in R.items():
+            rcut = Rcut[elem]+max(Rcut.values())
+            frac = np.dot(pos, recip.T)
+            # |ix+frac[i]-frac_all[i]|*spacing[i] < rcut along each axis, only ix >= 0 is generated
+            nmax = np.floor(rcut/spacing+frac_all.max(axis=0) -
+                            frac.min(axis=0)).astype(int)+1
+            nmax = np.clip(nmax, 0, kpt)
+            translations = np.dot(np.indices(
+                nmax).reshape(3, -1).T, lat_vec)
+            center = pos.mean(axis=0)
+            radius = np.linalg.norm(pos-center, axis=1).max()
+            near = np.linalg.norm(center+translations-center_all,
+                                  axis=1) <= rcut+radius+radius_all
+            images[elem] = SupercellImages(
+                pos, translations[near], max(1, chunk_size//len(pos)))
+
+        return images
+
     @staticmethod
     def positions_dict2list(positions:dict):
         """Convert dict of positions to list
@@ -401,19 +409,289 @@ class Stru:
 
         return energy
 
-    def set_energy(self, file: typing.Union[TextIOWrapper, str_PathLike]):
+    def set_energy(self, file: typing.Union[TextIOWrapper, str_PathLike, RunningLog]):
         """Set energy"""
 
-        self.energy = self.read_energy_from_file(file, "E_KohnSham")
+        if not isinstance(file, RunningLog):
+            file = read_running_log(file)
+        self.energy = file.energy
 
-    def set_efermi(self, file: TextIOWrapper):
+    def set_efermi(self, file: typing.Union[TextIOWrapper, str_PathLike, RunningLog]):
         """Set fermi level"""
 
-        self.efermi = self.read_energy_from_file(file, "E_Fermi")
+        if not isinstance(file, RunningLog):
+            file = read_running_log(file)
+        self.efermi = file.efermi
 
     # TODO: add set_force, set_stress
 
 
+class Stru(BaseStru):
+    """ABACUS `STRU` file information"""
+
+    def __init__(self, lat0: float=1/BOHR_TO_A, cell: list=[], pps: Dict_str_str={}, positions: Dict_str_list = {}, scaled_positions: Dict_str_list = {}, positions_angstrom_lat0: Dict_str_list = {}, orbitals: Dict_str_str = {}, masses: Dict_str_float = {}, magmoms: Dict_str_float = {}, move: Dict_str_int = {}, abfs: Dict_str_str = {}) -> None:
+        """Initialize Stru object
+
+        :params lat0: float, lattice constant in unit bohr.
+        :params cell: list, lattice vector in unit `lat0`.
+        :params pps: dict, dict of pseudopotential file.
+        :params positions: dict, key is element name and value is list of atomic Cartesian coordinates in unit lat0.
+        :params scaled_positions: dict, key is element name and value is list of atomic direct coordinates in unit lat0. This parameter had better not be set at the same time with `positions`.
+                                Because Cartesian coordinates will be calculated automatically based on direct coordinates and lattice vector `cell`. So self.positions still exists.
+        :params positions_angstrom_lat0: dict, key is element name and value is list of atomic Cartesian_angstrom coordinates in unit lat0. This parameter had better not be set at the same time with `positions`.
+                                Because Cartesian coordinates will be calculated automatically based on Cartesian_angstrom coordinates. So self.positions still exists.
+        :params orbitals: dict, dict of orbital file.
+        :params masses: dict, dict of atomic mass.
+        :params magmoms: dict, dict of magnetic moment.
+        :params move: dict, key is element name and value is list of 1 or 0, `1` means atom can move.
+        :params abfs: dict, dict of ABFs for hybrid functional calculation.
+        """
+
+        self.lat0 = lat0
+        self.cell = cell
+        if positions and scaled_positions and positions_angstrom_lat0:
+            raise TypeError(
+                "'positions', 'scaled_positions' and `positions_angstrom_lat0` can not be set simultaneously")
+        elif positions:
+            self._ctype = "Cartesian"
+            self.positions = positions
+            self.scaled_positions = Cartesian2Direct(positions, self.cell)
+        elif scaled_positions:
+            self._ctype = "Direct"
+            self.scaled_positions = scaled_positions
+            self.positions = Direct2Cartesian(scaled_positions, self.cell)
+        elif positions_angstrom_lat0:
+            self._ctype = "Cartesian_angstrom"
+            self.positions_angstrom_lat0 = positions_angstrom_lat0
+            self.positions = Cartesian_angstrom2Cartesian(
+                positions_angstrom_lat0)
+        else:
+            raise TypeError(
+                "One of 'positions' and 'scaled_positions' must be set")
+        self.elements = []
+        self.numbers = OrderedDict()
+        for elem in self.positions:
+            self.elements.append(elem)
+            self.numbers[elem] = len(self.positions[elem])
+        self.pps = pps
+        self.orbitals = orbitals
+        if masses:
+            self.masses = masses
+        else:
+            self.masses = {elem: 1 for elem in self.elements}
+        if magmoms:
+            self.magmoms = magmoms
+        else:
+            self.magmoms = {elem: 0 for elem in self.elements}
+        if not move:
+            move = defaultdict(list)
+            for elem in self.elements:
+                for j in range(self.numbers[elem]):
+                    move[elem].append([1, 1, 1])
+        self.move = move
+        self.abfs = abfs
+
+        self.energy = None
+        self.efermi = None
+
+    @property
+    def positions_bohr(self):
+        new_positions = deepcopy(self.positions)
+        for pos in new_positions:
+            new_positions[pos] = np.array(new_positions[pos]) * self.lat0
+
+        return new_positions
+
+
+class CompactStru(BaseStru):
+    """ABACUS `STRU` file information stored in arrays, for large cells
+
+    Coordinates of all atoms are kept in one (natoms, 3) array in the frame they are given, atoms are grouped by element.
+    Coordinates in other frames are computed when first accessed and cached, all cached arrays are read-only.
+    Dict attributes of `Stru`, e.g. `positions` and `move`, are dicts of views of these arrays.
+    It has no `__dict__`, all attributes are slots.
+    """
+
+    __slots__ = ("lat0", "cell", "pps", "orbitals", "masses", "magmoms", "abfs", "energy", "efermi",
+                 "_ctype", "_elements", "_coords", "_types", "_move", "_offsets", "_frames")
+
+    def __init__(self, lat0: float = 1/BOHR_TO_A, cell: list = [], pps: Dict_str_str = {}, elements: typing.List[str] = [], coords: np.ndarray = None, types: np.ndarray = None, ctype: str = "Direct", orbitals: Dict_str_str = {}, masses: Dict_str_float = {}, magmoms: Dict_str_float = {}, move: np.ndarray = None, abfs: Dict_str_str = {}) -> None:
+        """Initialize CompactStru object
+
+        :params lat0: float, lattice constant in unit bohr.
+        :params cell: list, lattice vector in unit `lat0`.
+        :params pps: dict, dict of pseudopotential file.
+        :params elements: list of element names.
+        :params coords: array with shape (natoms, 3), atomic coordinates in frame `ctype`.
+        :params types: array with shape (natoms,), index of element of each atom in `elements`.
+        :params ctype: frame of `coords`, 'Direct', 'Cartesian' or 'Cartesian_angstrom'. Default: 'Direct'
+        :params orbitals: dict, dict of orbital file.
+        :params masses: dict, dict of atomic mass.
+        :params magmoms: dict, dict of magnetic moment.
+        :params move: array with shape (natoms, 3) of 1 or 0, `1` means atom can move. Default: None, all atoms can move.
+        :params abfs: dict, dict of ABFs for hybrid functional calculation.
+        """
+
+        if ctype not in ("Direct", "Cartesian", "Cartesian_angstrom"):
+            raise TypeError(
+                "'ctype' must be 'Direct', 'Cartesian' or 'Cartesian_angstrom'")
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        types = np.asarray(types, dtype=np.intp).reshape(-1)
+        if len(types) != len(coords):
+            raise ValueError("'coords' and 'types' must have the same length")
+        move = np.ones((len(coords), 3), dtype=np.uint8) if move is None else np.asarray(
+            move, dtype=np.uint8).reshape(-1, 3)
+        order = np.argsort(types, kind="stable")
+        self.lat0 = lat0
+        self.cell = cell
+        self._ctype = ctype
+        self._elements = list(elements)
+        self._types = types[order]
+        self._coords = coords[order]
+        self._move = move[order]
+        self._offsets = np.searchsorted(
+            self._types, np.arange(len(self._elements)+1))
+        for array in (self._types, self._coords, self._move):
+            array.flags.writeable = False
+        self._frames = {ctype: self._coords}
+        self.pps = pps
+        self.orbitals = orbitals
+        if masses:
+            self.masses = masses
+        else:
+            self.masses = {elem: 1 for elem in self.elements}
+        if magmoms:
+            self.magmoms = magmoms
+        else:
+            self.magmoms = {elem: 0 for elem in self.elements}
+        self.abfs = abfs
+
+        self.energy = None
+        self.efermi = None
+
+    def __getstate__(self) -> dict:
+        """Return attributes except cached coordinates in other frames, used by pickle and `abacuskit.calculations.baseclass.JobCalculation.inputs_hash`"""
+
+        return {key: getattr(self, key) for key in self.__slots__ if key != "_frames"}
+
+    def __setstate__(self, state: dict):
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+        for array in (self._types, self._coords, self._move):
+            array.flags.writeable = False
+        self._frames = {self._ctype: self._coords}
+
+    @classmethod
+    def from_stru(cls, stru: Stru) -> "CompactStru":
+        """Return CompactStru object with the same information as `stru`"""
+
+        if stru._ctype == "Direct":
+            positions = stru.scaled_positions
+        elif stru._ctype == "Cartesian":
+            positions = stru.positions
+        else:
+            positions = stru.positions_angstrom_lat0
+        coords = [np.asarray(positions[elem], dtype=float).reshape(-1, 3)
+                  for elem in stru.elements]
+        move = [np.asarray(stru.move[elem], dtype=np.uint8).reshape(-1, 3)
+                for elem in stru.elements]
+        types = np.repeat(np.arange(len(stru.elements)), [
+                          len(pos) for pos in coords])
+
+        return cls(stru.lat0, stru.cell, stru.pps, stru.elements, np.concatenate(coords or [np.empty((0, 3))]), types, stru._ctype, orbitals=stru.orbitals, masses=stru.masses, magmoms=stru.magmoms, move=np.concatenate(move or [np.empty((0, 3))]), abfs=stru.abfs)
+
+    def _frame(self, ctype: str) -> np.ndarray:
+        """Return coordinates of all atoms in frame `ctype`, 'bohr' means Cartesian coordinates in unit bohr"""
+
+        if ctype not in self._frames:
+            if ctype == "Cartesian":
+                if self._ctype == "Direct":
+                    value = np.dot(self._coords, np.asarray(
+                        self.cell, dtype=float))
+                else:
+                    value = self._coords/BOHR_TO_A
+            elif ctype == "Direct":
+                value = np.dot(self._frame("Cartesian"), np.linalg.inv(
+                    np.asarray(self.cell, dtype=float)))
+            elif ctype == "Cartesian_angstrom":
+                value = self._frame("Cartesian")*BOHR_TO_A
+            elif ctype == "bohr":
+                value = self._frame("Cartesian")*self.lat0
+            else:
+                raise KeyError(f"Unknown frame `{ctype}`")
+            value.flags.writeable = False
+            self._frames[ctype] = value
+        return self._frames[ctype]
+
+    def _split(self, array: np.ndarray) -> OrderedDict:
+        """Return dict of views of `array`, key is element name"""
+
+        return OrderedDict((elem, array[self._offsets[i]:self._offsets[i+1]]) for i, elem in enumerate(self._elements))
+
+    @property
+    def coords(self) -> np.ndarray:
+        """Atomic coordinates in frame `ctype` with shape (natoms, 3)"""
+
+        return self._coords
+
+    @property
+    def types(self) -> np.ndarray:
+        """Index of element of each atom in `elements`"""
+
+        return self._types
+
+    @property
+    def elements(self) -> typing.List[str]:
+        return self._elements
+
+    @property
+    def numbers(self) -> OrderedDict:
+        return OrderedDict((elem, int(self._offsets[i+1]-self._offsets[i])) for i, elem in enumerate(self._elements))
+
+    @property
+    def positions(self) -> Dict_str_list:
+        return self._split(self._frame("Cartesian"))
+
+    @property
+    def scaled_positions(self) -> Dict_str_list:
+        return self._split(self._frame("Direct"))
+
+    @property
+    def positions_angstrom_lat0(self) -> Dict_str_list:
+        return self._split(self._frame("Cartesian_angstrom"))
+
+    @property
+    def positions_bohr(self) -> Dict_str_list:
+        return self._split(self._frame("bohr"))
+
+    @property
+    def move(self) -> Dict_str_list:
+        return self._split(self._move)
+
+
+class SupercellImages:
+    """Re-iterable supercell atomic positions of one element, generated in chunks of translations"""
+
+    def __init__(self, positions: np.ndarray, translations: np.ndarray, chunk_size: int) -> None:
+        """
+        :params positions: atomic positions in the cell, shape (natom, 3)
+        :params translations: lattice translations, shape (ntrans, 3)
+        :params chunk_size: number of translations in each chunk
+        """
+
+        self.positions = positions
+        self.translations = translations
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return len(self.positions)*len(self.translations)
+
+    def __iter__(self):
+        for start in range(0, len(self.translations), self.chunk_size):
+            translations = self.translations[start:start+self.chunk_size]
+            yield (self.positions[None, :, :]+translations[:, None, :]).reshape(-1, 3)
+
+
 def cal_dis(positions: dict, supercell_positions: dict) -> Dict_Tuple_Dict:
     """Calculate distance between two atoms
 
@@ -466,6 +744,128 @@ def round_dis(dis: Dict_Tuple_Dict, precision: float) -> Dict_Tuple_Dict:
     return dis_round
 
 
+def _round_half_up(dis: np.ndarray, precision: float) -> np.ndarray:
+    """Return integer index `k` of `dis` rounded to multiple of `precision`, same as `decimal.ROUND_HALF_UP`"""
+
+    scaled = dis/precision
+    k = np.floor(scaled+0.5).astype(np.int64)
+    # distances close to a half step are rounded exactly as `round_dis` does
+    tie = np.abs(scaled-np.floor(scaled)-0.5) < 1e-6
+    if tie.any():
+        quantum = decimal.Decimal(str(precision))
+        k[tie] = [int(decimal.Decimal(float(i_dis)).quantize(quantum, rounding=decimal.ROUND_HALF_UP)/quantum)
+                  for i_dis in dis[tie]]
+    return k
+
+
+def dis_histogram(positions: dict, supercell_positions: dict, Rcut: Dict_str_float, precision: float = 1e-6, max_pairs: int = 1 << 22) -> Dict_Tuple_Dict:
+    """Calculate distance between two atoms within cut-off radius and count them at a given precision, it gives the same result as `round_dis(cut_dis(cal_dis(positions, supercell_positions), Rcut), precision)`
+
+    :params positions: dict, key is element name and value is list of atomic Cartesian coordinates
+    :params supercell_positions: dict, key is element name and value is array of supercell atomic positions or iterable of arrays
+    :params Rcut: dict, orbitals cut-off radius
+    :params precision: floating point precision
+    :params max_pairs: maximum number of distances computed at a time, it bounds memory used for large supercells
+    :return dis[T1,T2] = {..., i_dis:num, ...}, sorted by distance
+    """
+
+    quantum = decimal.Decimal(str(precision))
+    dis = dict()
+    for T1, T2 in itertools.combinations_with_replacement(positions, 2):
+        Rcut_sum = Rcut[T1]+Rcut[T2]
+        pos1 = np.asarray(positions[T1], dtype=float).reshape(-1, 3)
+        chunks = supercell_positions[T2]
+        if isinstance(chunks, np.ndarray) or (isinstance(chunks, list) and chunks and np.ndim(chunks[0]) == 1):
+            chunks = [chunks]
+        counts = defaultdict(int)
+        step = max(1, max_pairs//max(1, len(pos1)))
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=float).reshape(-1, 3)
+            for start in range(0, len(chunk), step):
+                diff = pos1[:, None, :]-chunk[None, start:start+step, :]
+                i_dis = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff)).ravel()
+                i_dis = i_dis[i_dis < Rcut_sum]
+                k, num = np.unique(_round_half_up(
+                    i_dis, precision), return_counts=True)
+                for i_k, i_num in zip(k.tolist(), num.tolist()):
+                    counts[i_k] += i_num
+        dis[T1, T2] = {float(i_k*quantum): counts[i_k]
+                       for i_k in sorted(counts)}
+
+    return dis
+
+
+def ckmeans(x: typing.Sequence[float], k: int, weights: typing.Sequence[float] = None) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Exact weighted k-means clustering of one-dimensional data by dynamic programming, as Ckmeans.1d.dp
+
+    :params x: data points
+    :params k: number of clusters, it is reduced to number of data points if larger
+    :params weights: weight of each data point. Default: None, all weights are 1
+    :return: centers of clusters in ascending order, and cluster index of each data point
+    """
+
+    x = np.asarray(x, dtype=float).ravel()
+    weights = np.ones_like(x) if weights is None else np.asarray(
+        weights, dtype=float).ravel()
+    order = np.argsort(x, kind="stable")
+    xs, ws = x[order], weights[order]
+    n = len(xs)
+    k = min(k, n)
+
+    # cost(i, j) is weighted sum of squared deviations of xs[i:j]
+    zero = np.zeros(1)
+    PW = np.concatenate([zero, np.cumsum(ws)])
+    P1 = np.concatenate([zero, np.cumsum(ws*xs)])
+    P2 = np.concatenate([zero, np.cumsum(ws*xs*xs)])
+
+    def cost(i, j):
+        W = PW[j]-PW[i]
+        S1 = P1[j]-P1[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(W > 0, P2[j]-P2[i]-S1*S1/np.where(W > 0, W, 1), 0.0)
+
+    # D[m, j] is minimum cost of xs[:j] in m+1 clusters, the last cluster starts from T[m, j]
+    D = np.full((k, n+1), np.inf)
+    T = np.zeros((k, n+1), dtype=int)
+    D[0, 1:] = cost(0, np.arange(1, n+1))
+
+    for m in range(1, k):
+        # optimal start of the last cluster is monotonic in j, so divide and conquer on j is used,
+        # all nodes at the same depth are evaluated at once, their candidate ranges are almost disjoint
+        jlo, jhi = np.array([m+1]), np.array([n])
+        ilo, ihi = np.array([m]), np.array([n-1])
+        while len(jlo):
+            j = (jlo+jhi)//2
+            start = np.maximum(ilo, m)
+            count = np.minimum(ihi, j-1)-start+1
+            node = np.repeat(np.arange(len(j)), count)
+            i = start[node]+np.arange(len(node)) - \
+                np.repeat(np.cumsum(count)-count, count)
+            values = D[m-1, i]+cost(i, j[node])
+            # first of each node after sorting is its minimum, the smallest i for ties
+            first = np.lexsort((i, values, node))[np.cumsum(count)-count]
+            D[m, j] = values[first]
+            T[m, j] = i[first]
+            left = jlo <= j-1
+            right = j+1 <= jhi
+            jlo, jhi, ilo, ihi = (np.concatenate([a[left], b[right]]) for a, b in (
+                (jlo, j+1), (j-1, jhi), (ilo, T[m, j]), (T[m, j], ihi)))
+
+    labels_sorted = np.zeros(n, dtype=int)
+    centers = np.zeros(k)
+    j = n
+    for m in range(k-1, -1, -1):
+        i = T[m, j] if m > 0 else 0
+        labels_sorted[i:j] = m
+        W = PW[j]-PW[i]
+        centers[m] = (P1[j]-P1[i])/W if W > 0 else xs[i:j].mean()
+        j = i
+    labels = np.empty(n, dtype=int)
+    labels[order] = labels_sorted
+
+    return centers, labels
+
+
 def delete_zero(dis: Dict_Tuple_Dict) -> Dict_Tuple_Dict:
     """Delete zero in dict, list or set"""
 
@@ -512,12 +912,22 @@ class Kpt:
         elif self.mode == "Line":
             line.append(str(len(self.special_k)))
             line.append(self.mode)
-            for i, k in enumerate(self.special_k):
+            columns = _columns(self.special_k) if len(self.special_k) else None
+            if columns and len(self.numbers) >= len(columns[0]) and (not self.klabel or len(self.klabel) >= len(columns[0])):
+                template = ' '.join(['{}']*(len(columns)+1))
                 if self.klabel:
-                    line.append(" ".join(list_elem2str(
-                        k+[self.numbers[i]]))+'\t#'+self.klabel[i])
+                    line.extend(map((template+'\t#{}').format, *columns,
+                                    self.numbers, self.klabel))
                 else:
-                    line.append(" ".join(list_elem2str(k+[self.numbers[i]])))
+                    line.extend(map(template.format, *columns, self.numbers))
+            else:
+                for i, k in enumerate(self.special_k):
+                    if self.klabel:
+                        line.append(" ".join(list_elem2str(
+                            list(k)+[self.numbers[i]]))+'\t#'+self.klabel[i])
+                    else:
+                        line.append(" ".join(list_elem2str(
+                            list(k)+[self.numbers[i]])))
 
         return '\n'.join(line)
 
@@ -540,7 +950,7 @@ class Kpt:
             np.reshape(self.numbers, (-1, 1))
         max_num = np.max(self.numbers)
         len_num = len(self.numbers)
-        k_coor_span = np.zeros((len_num, max_num), dtype=np.float)
+        k_coor_span = np.zeros((len_num, max_num), dtype=float)
         X, Y, Z = np.split(spec_k_coor, 3, axis=1)
         i_X, i_Y, i_Z = np.split(interval, 3, axis=1)
         for i, j in enumerate(self.numbers):
@@ -548,7 +958,7 @@ class Kpt:
         X = (i_X * k_coor_span + X.repeat(max_num, axis=1)).flatten()
         Y = (i_Y * k_coor_span + Y.repeat(max_num, axis=1)).flatten()
         Z = (i_Z * k_coor_span + Z.repeat(max_num, axis=1)).flatten()
-        k_direct_coor = np.empty((3, total_k), dtype=np.float)
+        k_direct_coor = np.empty((3, total_k), dtype=float)
         k_direct_coor[0] = X[:total_k]
         k_direct_coor[1] = Y[:total_k]
         k_direct_coor[2] = Z[:total_k]
@@ -6,17 +6,32 @@ Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
 import json
+import multiprocessing
 import os
 import re
+import shutil
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from abacuskit.calculations.baseclass import (Checkpoint, ResultCache,
+                                             SaveStrategy, reflink)
 from abacuskit.calculations.structure import *
 from abacuskit.schedulers.data import Code
 from abacuskit.utils.IO import read_kpt, read_stru
+from abacuskit.utils.parallel import check_acyclic, run_with_budget
+from abacuskit.utils.perf import PerfCheck
 from abacuskit.utils.typings import *
 
 
+# state file of workflow in directory of each command
+STATE_FILE = "autotest_state.json"
+# performance comparison between commands written by `Autotest.compare`
+PERF_DIFF_FILE = "perf_diff.json"
+# directory of working directories of calculations run as a dependency graph in directory of each command
+DAG_DIR = "dag"
+
+
 def set_cal(name: str, input_dict: dict, stru: Stru, kpt: Kpt, **kwargs):
     module, cal = name.split('.')
     exec(f"""from abacuskit.calculations.plugins.{module} import {cal}""")
@@ -63,7 +78,7 @@ def configure(config_file: str_PathLike, version: list) -> Return_2:
             # STRU
             stru_file = src/cal_elem.pop("stru_file", "STRU")
             if stru_file.exists():
-                stru = read_stru(input_dict["ntype"], stru_file)
+                stru = read_stru(stru_file=stru_file)
                 for elem in stru.elements:
                     if input_dict and "pseudo_dir" not in input_dict.keys():
                         stru.pps[elem] = Path(src, stru.pps[elem])
@@ -88,6 +103,149 @@ def configure(config_file: str_PathLike, version: list) -> Return_2:
     return allcommands, workflow
 
 
+def _bind_cores(slots: multiprocessing.Queue):
+    """Initializer of compare workers, pin each worker process to its own slice of cores
+
+    :params slots: queue of core lists, each worker takes one of them
+    """
+
+    cores = slots.get()
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+def _save_step(save: SaveStrategy, index: int, workflow: list) -> SaveStrategy:
+    """Return strategy to save files of the `index`-th calculation of `workflow` sharing one working directory, see `SaveStrategy.for_step`"""
+
+    return save.for_step(index == len(workflow)-1) if save else save
+
+
+def _calculate_in(workdir: str_PathLike, cal, command: Command, index: int, external_command: Command = "", save_dir: str_PathLike = "", cache: ResultCache = None, resume: bool = False, save: SaveStrategy = None, rerun: bool = False) -> dict:
+    """Run one calculation of workflow in `workdir` of a worker process
+
+    :params workdir: absolute path of working directory of this version
+    :params cal: calculation object in workflow
+    :params command: string of command line or `abacuskit.schedulers.data.Code` object.
+    :params index: calculation index in workflow
+    :params external_command: other non-ABACUS code needed. Default: ""
+    :params save_dir: directory where to save all input and output files. Default: ""
+    :params cache: `abacuskit.calculations.baseclass.ResultCache` object. Default: None
+    :params resume: reuse result of this calculation recorded in `workdir/autotest_state.json` if it finished with the same inputs. Default: False
+    :params save: `abacuskit.calculations.baseclass.SaveStrategy` object used to save files into `save_dir`. Default: None
+    :params rerun: execute sub-steps of calculation again even if their outputs exist, see `abacuskit.calculations.plugins.exx.EXX`. Default: False
+    """
+
+    os.chdir(workdir)
+    return cal.calculate(command=command, index=index, external_command=external_command, save_dir=save_dir, cache=cache,
+                         checkpoint=Checkpoint(STATE_FILE), step=f"cal_{index}", resume=resume, save=save, rerun=rerun)
+
+
+def _copy_file(src: str_PathLike, dst: str_PathLike):
+    """Reflink or copy `src` to `dst`, never hard link, because a calculation may rewrite files in place"""
+
+    try:
+        reflink(src, dst)
+        shutil.copystat(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def forward_files(cal, src: str_PathLike, dst: str_PathLike):
+    """Copy outputs of `cal` in working directory `src` into `dst` at the same relative paths, so that a calculation in `dst` finds them as if it ran in `src`
+
+    :params cal: calculation object, see `JobCalculation.outputs`
+    :params src: working directory of `cal`
+    :params dst: working directory of a calculation depending on it
+    """
+
+    src = Path(src).resolve()
+    for path in cal.outputs(src):
+        target = Path(dst, Path(path).resolve().relative_to(src))
+        if Path(path).is_dir():
+            shutil.copytree(path, target, copy_function=_copy_file,
+                            dirs_exist_ok=True)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _copy_file(path, target)
+
+
+def _calculate_step(workdir: str_PathLike, cal, command: Command, index: int, upstream: list, external_command: Command = "", save_dir: str_PathLike = "", cache: ResultCache = None, resume: bool = False, save: SaveStrategy = None, state_file: str_PathLike = STATE_FILE, rerun: bool = False) -> dict:
+    """Run one calculation of workflow in its own `workdir` after taking outputs of calculations it depends on
+
+    Outputs of those calculations which later calculations may read are copied into `workdir` first, in order of `upstream`, e.g. charge density, `folders` of `SetDimers` or `OUT.test/STRU_ION_D` of RELAX, see `JobCalculation.outputs`.
+
+    :params workdir: absolute path of working directory of this calculation
+    :params cal: calculation object in workflow
+    :params command: string of command line or `abacuskit.schedulers.data.Code` object.
+    :params index: calculation index in workflow
+    :params upstream: list of (calculation object, working directory) of calculations it depends on
+    :params external_command: other non-ABACUS code needed. Default: ""
+    :params save_dir: absolute path of directory where to save input and output files. Default: ""
+    :params cache: `abacuskit.calculations.baseclass.ResultCache` object. Default: None
+    :params resume: reuse result of this calculation recorded in `state_file` if it finished with the same inputs. Default: False
+    :params save: `abacuskit.calculations.baseclass.SaveStrategy` object used to save files into `save_dir`. Default: None
+    :params state_file: absolute path of state file shared by calculations of this version. Default: `STATE_FILE`
+    :params rerun: execute sub-steps of calculation again even if their outputs exist, see `abacuskit.calculations.plugins.exx.EXX`. Default: False
+    """
+
+    Path(workdir).mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    for dep_cal, dep_workdir in upstream:
+        cal.receive_artifacts(dep_cal.artifacts(dep_workdir))
+    checkpoint = Checkpoint(state_file)
+    step = f"cal_{index}"
+    if not (resume and checkpoint.is_done(step, cal.inputs_hash(command))):
+        for dep_cal, dep_workdir in upstream:
+            forward_files(dep_cal, dep_workdir, workdir)
+    print(f"Begin {cal.__str__()} in {workdir}", flush=True)
+    res = cal.calculate(command=command, index=index, external_command=external_command, save_dir=save_dir, cache=cache,
+                        checkpoint=checkpoint, step=step, resume=resume, save=save, rerun=rerun)
+    print(f"End {cal.__str__()} in {workdir}", flush=True)
+    return res
+
+
+def dependencies(workflow: list) -> Dict_str_list:
+    """Return dependencies of calculations set by `depends_on` in `config.json`, a calculation can only depend on calculations before it and it depends on the previous one without `depends_on`
+
+    :params workflow: list of calculation objects
+    :return: dict, key is `cal_*` and value is list of `cal_*` it depends on
+    """
+
+    depends = OrderedDict()
+    for index, cal in enumerate(workflow):
+        deps = cal.kwargs.get("depends_on")
+        if deps is None:
+            deps = [f"cal_{index-1}"] if index else []
+        elif isinstance(deps, str):
+            deps = [deps]
+        for dep in deps:
+            if not re.fullmatch(r"cal_\d+", dep) or int(dep.split('_')[1]) >= index:
+                raise KeyError(
+                    f"`depends_on` of cal_{index} should be calculations before it, but `{dep}` is set")
+        depends[f"cal_{index}"] = list(deps)
+    check_acyclic(depends)
+    return depends
+
+
+def core_slots(workers: int, cores_per_worker: int = None) -> list:
+    """Split cores available to this process into `workers` disjoint slices
+
+    :params workers: number of worker processes
+    :params cores_per_worker: number of cores of each worker. Default: None, no binding
+    """
+
+    if not cores_per_worker:
+        return [None for i in range(workers)]
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count()))
+    if workers*cores_per_worker > len(available):
+        raise ValueError(
+            f"{workers} workers with {cores_per_worker} cores each need {workers*cores_per_worker} cores, but only {len(available)} available.")
+    return [available[i*cores_per_worker:(i+1)*cores_per_worker] for i in range(workers)]
+
+
 class Autotest:
     """Auto-test for ABACUS"""
 
@@ -99,33 +257,70 @@ class Autotest:
 
         self.workflow = workflow
 
-    def calculate(self, command: Command, external_command: Command = "", save_files: bool = False) -> dict:
+    def calculate(self, command: Command, external_command: Command = "", save_files: typing.Union[bool, SaveStrategy] = False, cache: ResultCache = None, resume: bool = False) -> dict:
         """The whole process of auto-test
 
         :params command: string of command line or `abacuskit.schedulers.data.Code` object.
         :params external_command: other non-ABACUS code needed. Default: ""
-        :params save_files: save input files of last calculation or not. Default: False
+        :params save_files: save input files of last calculation or not, files are saved in the way of it if it is a `SaveStrategy` object. Default: False
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object. Default: None
+        :params resume: skip calculations finished with the same inputs in `autotest_state.json` until one is executed again. Default: False
         """
 
+        checkpoint = Checkpoint(STATE_FILE)
+        save = save_files if isinstance(save_files, SaveStrategy) else None
         for index, cal in enumerate(self.workflow):
             if save_files:
                 save_dir = f"cal_{str(index)}"
             else:
                 save_dir = ""
             print(f"Begin {cal.__str__()}", flush=True)
-            res = cal.calculate(command=command, index=index,
-                                external_command=external_command, save_dir=save_dir)
+            res = cal.calculate(command=command, index=index, external_command=external_command, save_dir=save_dir,
+                                cache=cache, checkpoint=checkpoint, step=f"cal_{index}", resume=resume, save=_save_step(save, index, self.workflow))
+            # later calculations may use outputs of a calculation executed again
+            resume = resume and cal.resumed
             print(f"End {cal.__str__()}", flush=True)
         return res
 
-    def compare(self, commands: List_Command, external_command: Command = "", save_files: bool = False):
-        """Comparison test between different commands
+    def compare(self, commands: List_Command, external_command: Command = "", save_files: typing.Union[bool, SaveStrategy] = False, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, resume: bool = False, perf: PerfCheck = None):
+        """Comparison test between different commands, if `perf` is set, wall time, peak memory and ABACUS time of each calculation are compared in `perf_diff.json`
 
         :params commands: list of commands string or `abacuskit.schedulers.data.Code` object
         :params external_command: other non-ABACUS code needed Default: ""
-        :params save_files: save input files of last calculation or not. Default: False
+        :params save_files: save input files of last calculation or not, files are saved in the way of it if it is a `SaveStrategy` object. Default: False
+        :params workers: number of versions calculated at the same time. Default: 1
+        :params cores_per_worker: number of cores bound to each worker, if not set, workers are not bound. Default: None
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object. Default: None
+        :params resume: skip calculations recorded as finished with the same inputs in `command_*/autotest_state.json`, unless a calculation they depend on is executed again. Default: False
+        :params perf: `abacuskit.utils.perf.PerfCheck` object, number of repeated runs and how slowdowns are flagged. Default: None, run once without performance comparison
         """
 
+        if perf is None:
+            return self._compare(commands, external_command, save_files, workers, cores_per_worker, cache, resume)
+
+        samples, seen = OrderedDict(), {}
+        for run in range(perf.repeat):
+            if perf.repeat > 1:
+                print(f"Run {run+1} of {perf.repeat}", flush=True)
+            # repeated runs execute all calculations again, including sub-steps whose outputs exist, to sample the same workload
+            self._compare(commands, external_command, save_files, workers, cores_per_worker,
+                          cache if run == 0 else None, resume and run == 0, rerun=not (resume and run == 0))
+            self._collect_perf(commands, samples, seen)
+        diff = perf.diff(samples)
+        perf.write(diff, PERF_DIFF_FILE)
+        perf.report(diff)
+        return diff
+
+    def _compare(self, commands: List_Command, external_command: Command = "", save_files: typing.Union[bool, SaveStrategy] = False, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, resume: bool = False, rerun: bool = False):
+        """Run all versions once and check their results, see `compare`"""
+
+        if any(cal.kwargs.get("depends_on") is not None for cal in self.workflow):
+            return self._dag_compare(commands, external_command, save_files, workers, cores_per_worker, cache, resume, rerun)
+        if workers > 1 or cores_per_worker:
+            return self._parallel_compare(commands, external_command, save_files, workers, cores_per_worker, cache, resume, rerun)
+
+        allowed = self._resumable(commands, resume)
+        save = save_files if isinstance(save_files, SaveStrategy) else None
         res = OrderedDict()
         for index, cal in enumerate(self.workflow):
             print(f"Begin {cal.__str__()}", flush=True)
@@ -138,12 +333,147 @@ class Autotest:
                     save_dir = f"cal_{index}"
                 else:
                     save_dir = ""
-                res[f"command_{j}"] = cal.calculate(
-                    command=command, index=index, external_command=external_command, save_dir=save_dir)
+                res[f"command_{j}"] = cal.calculate(command=command, index=index, external_command=external_command, save_dir=save_dir, cache=cache,
+                                                    checkpoint=Checkpoint(STATE_FILE), step=f"cal_{index}", resume=allowed[j, index], save=_save_step(save, index, self.workflow), rerun=rerun)
                 os.chdir("../")
             print(f"End {cal.__str__()}", flush=True)
             self._check(res)
 
+    def _parallel_compare(self, commands: List_Command, external_command: Command = "", save_files: typing.Union[bool, SaveStrategy] = False, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, resume: bool = False, rerun: bool = False):
+        """Comparison test in which each version runs in its own worker process and directory
+
+        :params commands: list of commands string or `abacuskit.schedulers.data.Code` object
+        :params external_command: other non-ABACUS code needed Default: ""
+        :params save_files: save input files of last calculation or not, see `compare`. Default: False
+        :params workers: number of versions calculated at the same time. Default: 1
+        :params cores_per_worker: number of cores bound to each worker. Default: None
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object. Default: None
+        :params resume: skip calculations finished with the same inputs, see `compare`. Default: False
+        :params rerun: execute sub-steps of calculations again even if their outputs exist, see `compare`. Default: False
+        """
+
+        allowed = self._resumable(commands, resume)
+        save = save_files if isinstance(save_files, SaveStrategy) else None
+        slots = multiprocessing.Queue()
+        for cores in core_slots(workers, cores_per_worker):
+            slots.put(cores)
+
+        res = OrderedDict()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_bind_cores, initargs=(slots,)) as executor:
+            for index, cal in enumerate(self.workflow):
+                print(f"Begin {cal.__str__()}", flush=True)
+                save_dir = f"cal_{index}" if save_files else ""
+                futures = OrderedDict()
+                for j, command in enumerate(commands[index]):
+                    subdst = Path(f"command_{j}").resolve()
+                    subdst.mkdir(parents=True, exist_ok=True)
+                    futures[f"command_{j}"] = executor.submit(
+                        _calculate_in, subdst, cal, command, index, external_command, save_dir, cache, allowed[j, index], _save_step(save, index, self.workflow), rerun)
+                for key, future in futures.items():
+                    res[key] = future.result()
+                print(f"End {cal.__str__()}", flush=True)
+                self._check(res)
+
+    def _dag_compare(self, commands: List_Command, external_command: Command = "", save_files: typing.Union[bool, SaveStrategy] = False, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, resume: bool = False, rerun: bool = False):
+        """Comparison test in which calculations run as soon as those they depend on are finished
+
+        Each calculation runs in its own directory `command_*/dag/cal_*`, which starts with outputs of calculations it depends on, so all its files are kept.
+        If `save_files`, files are also saved into `command_*/cal_*` as `compare`, hard links are used for every calculation in 'hardlink' mode, because no later calculation runs in its directory.
+        The number of MPI processes of running calculations never exceeds `workers*cores_per_worker`, or the number of available cores if `cores_per_worker` not set.
+
+        :params commands: list of commands string or `abacuskit.schedulers.data.Code` object
+        :params external_command: other non-ABACUS code needed Default: ""
+        :params save_files: save input and output files of each calculation or not, see `compare`. Default: False
+        :params workers: maximum number of calculations running at the same time, no limit if 1. Default: 1
+        :params cores_per_worker: number of cores of each worker. Default: None
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object. Default: None
+        :params resume: skip calculations finished with the same inputs, see `compare`. Default: False
+        :params rerun: execute sub-steps of calculations again even if their outputs exist, see `compare`. Default: False
+        """
+
+        depends = dependencies(self.workflow)
+        allowed = self._resumable(commands, resume, depends)
+        save = save_files if isinstance(save_files, SaveStrategy) else None
+        tasks, costs, task_depends = OrderedDict(), {}, {}
+        for index, cal in enumerate(self.workflow):
+            for j, command in enumerate(commands[index]):
+                subdst = Path(f"command_{j}").resolve()
+                name = f"command_{j}/cal_{index}"
+                # later calculations overwrite files of earlier ones as in one working directory
+                upstream = [(self.workflow[int(dep.split('_')[1])], subdst/DAG_DIR/dep)
+                            for dep in sorted(depends[f"cal_{index}"], key=lambda dep: int(dep.split('_')[1]))]
+                save_dir = subdst/f"cal_{index}" if save_files else ""
+                tasks[name] = (subdst/DAG_DIR/f"cal_{index}", cal, command, index, upstream, external_command,
+                               save_dir, cache, allowed[j, index], save, subdst/STATE_FILE, rerun)
+                costs[name] = command.mpiprocs if isinstance(
+                    command, Code) else 1
+                task_depends[name] = [
+                    f"command_{j}/{dep}" for dep in depends[f"cal_{index}"]]
+
+        if cores_per_worker:
+            budget = workers*cores_per_worker
+        elif hasattr(os, "sched_getaffinity"):
+            budget = len(os.sched_getaffinity(0))
+        else:
+            budget = os.cpu_count()
+        max_workers = workers if workers > 1 else len(tasks)
+        futures = run_with_budget(
+            _calculate_step, tasks, costs, max_workers, budget, task_depends)
+
+        for index, cal in enumerate(self.workflow):
+            res = OrderedDict()
+            for j in range(len(commands[index])):
+                res[f"command_{j}"] = futures[f"command_{j}/cal_{index}"].result()
+            print(f"Compare {cal.__str__()} of cal_{index}", flush=True)
+            self._check(res)
+
+    def _collect_perf(self, commands: List_Command, samples: dict, seen: dict):
+        """Append performance of calculations executed since last call to `samples`, read from `command_*/autotest_state.json`
+
+        :params commands: list of commands string or `abacuskit.schedulers.data.Code` object
+        :params samples: dict, see `abacuskit.utils.perf.PerfCheck.diff`
+        :params seen: dict of (version, step) and end time of the run already collected
+        """
+
+        for j in range(len(commands[0]) if commands else 0):
+            version = f"command_{j}"
+            for step, state in Checkpoint(Path(version, STATE_FILE)).load().items():
+                if state.get("status") != "done" or not state.get("perf"):
+                    continue
+                # resumed calculations are collected only once
+                if seen.get((version, step)) == state.get("end_time"):
+                    continue
+                seen[version, step] = state.get("end_time")
+                value = samples.setdefault(step, OrderedDict(
+                    calculation=state.get("calculation"), versions=OrderedDict()))
+                value["versions"].setdefault(version, []).append(state["perf"])
+
+    def _resumable(self, commands: List_Command, resume: bool, depends: Dict_str_list = None) -> dict:
+        """Return whether each calculation may reuse its recorded result, that is all calculations it depends on are finished with the same inputs and reused
+
+        :params commands: list of commands string or `abacuskit.schedulers.data.Code` object
+        :params resume: whether to resume from `command_*/autotest_state.json`
+        :params depends: dependencies returned by `dependencies`. Default: None, each calculation depends on the previous one
+        :return: dict, key is tuple of command index and calculation index
+        """
+
+        if depends is None:
+            depends = {f"cal_{index}": [f"cal_{index-1}"] if index else []
+                       for index in range(len(self.workflow))}
+        allowed = {}
+        for j in range(len(commands[0]) if commands else 0):
+            steps = Checkpoint(Path(f"command_{j}", STATE_FILE)).load()
+            reused = {}
+            # dependencies always have smaller index
+            for index, cal in enumerate(self.workflow):
+                step = f"cal_{index}"
+                allowed[j, index] = resume and all(
+                    reused[dep] for dep in depends[step])
+                state = steps.get(step, {})
+                reused[step] = allowed[j, index] and state.get("status") == "done" and state.get(
+                    "inputs") == cal.inputs_hash(commands[index][j])
+        return allowed
+
     def _check(self, res: dict):
         for index, version in enumerate(res.items()):
             value_version = version[1]
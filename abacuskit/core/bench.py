@@ -0,0 +1,218 @@
+'''
+Date: 2026-10-18 13:44:20
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:44:20
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import csv
+import os
+import platform
+import time
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+
+from abacuskit.core.run import Run
+from abacuskit.utils.IO import read_json
+from abacuskit.utils.perf import compare_samples, dump_json, summarize
+from abacuskit.utils.typings import *
+
+# performance quantities of each calculation summarized by `abacuskit bench`, see `JobCalculation.perf`
+BENCH_METRICS = ("wall_time", "cpu_time", "max_rss_kb", "abacus_time")
+# columns of csv file written by `Bench.write`
+CSV_FIELDS = ["example", "version", "step", "calculation", "metric",
+              "n", "median", "q1", "q3", "iqr", "cv", "min", "max"]
+
+
+class Bench:
+    """Benchmark ABACUS versions by repeated runs of examples"""
+
+    @classmethod
+    def bench_example(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", repeat: int = 5, warmup: int = 1) -> OrderedDict:
+        """Run workflow of an example `warmup+repeat` times with each version and summarize performance of each calculation
+
+        Versions take turns in each run, so that drift of the machine affects all of them alike. Results are never taken from cache or checkpoint, and sub-steps of hybrid functional calculations are executed in every run.
+
+        :params src: path of example which has `config.json`
+        :params dst: path of working directory
+        :params version: executable file list
+        :params external_command: other non-ABACUS code needed. Default: ""
+        :params repeat: number of measured runs. Default: 5
+        :params warmup: number of runs before measurement, e.g. to fill file system cache. Default: 1
+        :return: dict, key is version and value is dict of `cal_*` and its calculation, performance of each run and statistics
+        """
+
+        print(f"Benchmark For Example {src} Begin:", flush=True)
+        dst = Path(dst).resolve()
+        dst.mkdir(parents=True, exist_ok=True)
+        commands, workflow = Run.preprocess(src, dst, version)
+        res = OrderedDict((ver, OrderedDict()) for ver in version)
+        current_path = os.getcwd()
+        try:
+            for run in range(warmup+repeat):
+                kind = "Warm-up" if run < warmup else "Run"
+                count = run+1 if run < warmup else run-warmup+1
+                print(f"{kind} {count} of {warmup if run < warmup else repeat}", flush=True)
+                for j, ver in enumerate(version):
+                    os.chdir(dst/f"command_{j}")
+                    for index, cal in enumerate(workflow):
+                        cal.calculate(command=commands[index][j], index=index,
+                                      external_command=external_command, rerun=True)
+                        if run < warmup:
+                            continue
+                        value = res[ver].setdefault(f"cal_{index}", OrderedDict(
+                            calculation=str(cal), runs=[]))
+                        value["runs"].append(cal.perf)
+        finally:
+            os.chdir(current_path)
+
+        for steps in res.values():
+            for value in steps.values():
+                value["stats"] = OrderedDict((metric, summarize([record[metric] for record in value["runs"] if record.get(metric) is not None]))
+                                             for metric in BENCH_METRICS if any(record.get(metric) is not None for record in value["runs"]))
+        print(f"Benchmark For Example {src} Finished\n", flush=True)
+        return res
+
+    @classmethod
+    def bench(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", repeat: int = 5, warmup: int = 1, batch: bool = False) -> OrderedDict:
+        """Benchmark an example or all examples of a library, failure of one example does not stop others
+
+        :params src: path of example, or path of library if `batch`
+        :params dst: path of working directory
+        :params version: executable file list
+        :params external_command: other non-ABACUS code needed. Default: ""
+        :params repeat: number of measured runs. Default: 5
+        :params warmup: number of runs before measurement. Default: 1
+        :params batch: whether `src` is a library of examples. Default: False
+        :return: dict of settings, machine and results of each example, written by `write`
+        """
+
+        if batch:
+            examples = OrderedDict((subsrc, (os.path.join(src, subsrc), os.path.join(dst, subsrc)))
+                                   for subsrc in sorted(os.listdir(src)) if os.path.isdir(os.path.join(src, subsrc)))
+        else:
+            examples = OrderedDict(
+                [(os.path.basename(os.path.normpath(src)), (src, dst))])
+
+        results = OrderedDict(repeat=repeat, warmup=warmup, host=platform.node(),
+                              date=time.strftime("%Y-%m-%d %H:%M:%S"), version=list(version), examples=OrderedDict())
+        for name, (subsrc, subdst) in examples.items():
+            try:
+                results["examples"][name] = OrderedDict(versions=cls.bench_example(
+                    subsrc, subdst, version, external_command, repeat, warmup), error=None)
+            except Exception:
+                message = traceback.format_exc().strip().split('\n')[-1]
+                print(f"Benchmark For Example {subsrc} Failed: {message}\n", flush=True)
+                results["examples"][name] = OrderedDict(
+                    versions=OrderedDict(), error=message)
+        return results
+
+    @classmethod
+    def rows(cls, results: dict) -> typing.List[OrderedDict]:
+        """Return statistics of `results` as rows with `CSV_FIELDS`"""
+
+        rows = []
+        for example, value in results["examples"].items():
+            for ver, steps in value["versions"].items():
+                for step, cal in steps.items():
+                    for metric, stats in cal["stats"].items():
+                        rows.append(OrderedDict(example=example, version=ver, step=step,
+                                                calculation=cal["calculation"], metric=metric, **stats))
+        return rows
+
+    @classmethod
+    def write(cls, results: dict, filename: str_PathLike):
+        """Write `results` to json file, or statistics only to csv file if suffix of `filename` is `.csv`
+
+        :params results: dict returned by `bench`
+        :params filename: output file
+        """
+
+        if Path(filename).suffix.lower() != ".csv":
+            return dump_json(results, filename)
+        with open(filename, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(cls.rows(results))
+
+    @classmethod
+    def report(cls, results: dict):
+        """Print median, IQR and coefficient of variation of each calculation
+
+        :params results: dict returned by `bench`
+        """
+
+        print("--------------------------Benchmark--------------------------", flush=True)
+        print(f"{'Example'.ljust(24)}{'Version'.ljust(30)}{'Step'.ljust(8)}{'Metric'.ljust(14)}{'Median'.ljust(12)}{'IQR'.ljust(12)}{'CV'.ljust(8)}", flush=True)
+        for row in cls.rows(results):
+            print(f"{row['example'].ljust(24)}{str(row['version'])[-29:].ljust(30)}{row['step'].ljust(8)}{row['metric'].ljust(14)}{row['median']:<12.4g}{row['iqr']:<12.4g}{row['cv']:<8.1%}", flush=True)
+        for example, value in results["examples"].items():
+            if value.get("error"):
+                print(f"{example.ljust(24)}FAILED: {value['error']}", flush=True)
+
+    @classmethod
+    def compare(cls, base: dict, new: dict, threshold: float = 0.05, alpha: float = 0.05) -> typing.List[OrderedDict]:
+        """Compare results of two benchmarks, e.g. of two builds, the i-th version of `new` is compared with the i-th version of `base`
+
+        :params base: dict returned by `bench` or read from its json file
+        :params new: dict returned by `bench` or read from its json file
+        :params threshold: relative increase of median regarded as slowdown. Default: 0.05
+        :params alpha: significance level of one-sided Mann-Whitney U test. Default: 0.05
+        :return: list of comparisons of each example, calculation and metric, see `abacuskit.utils.perf.compare_samples`
+        """
+
+        comparisons = []
+        for example, value in new["examples"].items():
+            if example not in base["examples"]:
+                continue
+            pairs = zip(base["examples"][example]["versions"].items(),
+                        value["versions"].items())
+            for (base_ver, base_steps), (new_ver, new_steps) in pairs:
+                for step, cal in new_steps.items():
+                    if step not in base_steps:
+                        continue
+                    for metric in BENCH_METRICS:
+                        base_values = [record[metric] for record in base_steps[step]["runs"]
+                                       if record.get(metric) is not None]
+                        new_values = [record[metric] for record in cal["runs"]
+                                      if record.get(metric) is not None]
+                        if not (base_values and new_values):
+                            continue
+                        comparisons.append(OrderedDict(example=example, step=step, calculation=cal["calculation"], metric=metric,
+                                                       base=base_ver, new=new_ver, **compare_samples(base_values, new_values, threshold, alpha)))
+        return comparisons
+
+    @classmethod
+    def report_compare(cls, comparisons: typing.List[dict], threshold: float = 0.05, alpha: float = 0.05):
+        """Print comparisons returned by `compare`, regressions are marked"""
+
+        print("--------------------------Benchmark Comparison--------------------------", flush=True)
+        print(f"{'Example'.ljust(24)}{'Versions'.ljust(30)}{'Step'.ljust(8)}{'Metric'.ljust(14)}{'Base'.ljust(12)}{'New'.ljust(12)}{'Ratio'.ljust(10)}{'p-value'.ljust(10)}", flush=True)
+        for item in comparisons:
+            mark = "SLOWER" if item["regression"] else ""
+            versions = f"{os.path.basename(str(item['base']))}->{os.path.basename(str(item['new']))}"
+            print(f"{item['example'].ljust(24)}{versions[-29:].ljust(30)}{item['step'].ljust(8)}{item['metric'].ljust(14)}{item['base_median']:<12.4g}{item['new_median']:<12.4g}{item['ratio']:<10.3f}{item['pvalue']:<10.3g}{mark}", flush=True)
+        regressions = sum(item["regression"] for item in comparisons)
+        print(f"{regressions} performance regressions beyond {threshold:.0%} (p < {alpha})", flush=True)
+
+    @classmethod
+    def bench_cmdline(cls, args):
+        if args.compare:
+            base, new = (read_json(filename) for filename in args.compare)
+            comparisons = cls.compare(base, new, args.threshold, args.alpha)
+            cls.report_compare(comparisons, args.threshold, args.alpha)
+            if args.output:
+                dump_json(comparisons, args.output)
+            return
+
+        filename = args.batch or args.single
+        if not filename:
+            return
+        text = read_json(filename)
+        output = os.path.abspath(args.output or "bench_results.json")
+        results = cls.bench(text["src"], text["dst"], text["version"], text.get("external_command", ''),
+                            args.repeat, args.warmup, batch=bool(args.batch))
+        cls.write(results, output)
+        cls.report(results)
+        print(f"Benchmark results are written to {output}", flush=True)
@@ -0,0 +1,44 @@
+'''
+Date: 2026-10-18 13:02:05
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:52:40
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import time
+
+from abacuskit.calculations.baseclass import ResultCache
+from abacuskit.utils.typings import *
+
+
+class Cache:
+    """Manage result cache of auto-test"""
+
+    @classmethod
+    def list_entries(cls, cache_dir: str_PathLike):
+        """Print all cache entries, the least recently used first
+
+        :params cache_dir: directory of result cache
+        """
+
+        entries = ResultCache(cache_dir).entries()
+        print(f"{'KEY'.ljust(20)}{'SIZE(MB)'.ljust(12)}{'LAST USED'.ljust(22)}CALCULATION", flush=True)
+        for entry in entries:
+            used = time.strftime("%Y-%m-%d %H:%M:%S",
+                                 time.localtime(entry["used"]))
+            calculation = entry.get("calculation", "")
+            print(f"{entry['key'][:16].ljust(20)}{entry['size']/1024/1024:<12.2f}{used.ljust(22)}{calculation}", flush=True)
+        total = sum(entry["size"] for entry in entries)
+        print(f"{len(entries)} entries, {total/1024/1024:.2f} MB", flush=True)
+
+    @classmethod
+    def cache_cmdline(cls, args):
+        cache = ResultCache(args.dir)
+        if args.invalidate:
+            keys = [] if "all" in args.invalidate else args.invalidate
+            count = cache.invalidate(keys)
+            print(f"{count} cache entries removed", flush=True)
+        if args.evict is not None:
+            cache.evict(int(args.evict*1024*1024))
+        if args.list:
+            cls.list_entries(args.dir)
@@ -7,9 +7,12 @@ Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 import argparse
 
 # TODO: refactor code with logging, warnings etc.
+from abacuskit.core.bench import Bench
+from abacuskit.core.cache import Cache
 from abacuskit.core.convert import Convert
 from abacuskit.core.run import Run
 from abacuskit.core.show import Show
+from abacuskit.core.status import Status
 
 
 def main():
@@ -30,8 +33,35 @@ def main():
                              default=False, help='whether to run locally. Default: False')
     other_group.add_argument('-p', '--parallel', dest='parallel', type=bool, default=False,
                              help='whether to test in parallel. Only valid when running batch test non-locally. Default: False')
+    other_group.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                             help='number of examples tested at the same time. Only valid when running batch test locally. Default: 1')
+    other_group.add_argument('-r', '--ranks', dest='ranks', type=int, default=None,
+                             help='total number of MPI processes shared by examples tested at the same time. Only valid with `--jobs`. Default: no limit')
+    other_group.add_argument('--resume', dest='resume', action='store_true',
+                             help='skip calculations finished in last run with the same inputs, which are recorded in `autotest_state.json` of each version directory.')
     parser_run.set_defaults(func=Run().run_cmdline)
 
+    # Bench
+    parser_bench = subparsers.add_parser(
+        'bench', help='benchmark ABACUS versions by repeated runs')
+    parser_bench.add_argument('-s', '--single', dest='single', type=str,
+                              default=None, help='benchmark one example set by `src` of `input.json`.')
+    parser_bench.add_argument('-b', '--batch', dest='batch', type=str,
+                              default=None, help='benchmark all examples of library set by `src` of `input.json`.')
+    parser_bench.add_argument('-n', '--repeat', dest='repeat', type=int, default=5,
+                              help='number of measured runs of each version. Default: 5')
+    parser_bench.add_argument('-w', '--warmup', dest='warmup', type=int, default=1,
+                              help='number of runs before measurement. Default: 1')
+    parser_bench.add_argument('-o', '--output', dest='output', type=str, default=None,
+                              help='json file of results, or csv file of statistics if its suffix is `.csv`. Default: bench_results.json')
+    parser_bench.add_argument('-c', '--compare', dest='compare', type=str, nargs=2, default=None,
+                              help='compare two json files of results, e.g. of two builds, instead of running.')
+    parser_bench.add_argument('--threshold', dest='threshold', type=float, default=0.05,
+                              help='relative increase of median regarded as slowdown. Only valid with `--compare`. Default: 0.05')
+    parser_bench.add_argument('--alpha', dest='alpha', type=float, default=0.05,
+                              help='significance level of one-sided Mann-Whitney U test. Only valid with `--compare`. Default: 0.05')
+    parser_bench.set_defaults(func=Bench().bench_cmdline)
+
     # Show
     parser_show = subparsers.add_parser(
         'show', help='show information of auto-test')
@@ -41,6 +71,18 @@ def main():
                              default=None, help='plot band structure and show band information.')
     parser_show.add_argument('-d', '--dos', dest='dos', type=str,
                              default=None, help='plot density of state(DOS).')
+    parser_show.add_argument('-g', '--gap', dest='gap', type=str, default=None,
+                             help='show band gaps and band edges of many band data files without plotting.')
+    parser_show.add_argument('-t', '--timing', dest='timing', type=str, nargs='+', default=None,
+                             help='show timing table of an ABACUS log, or rank routines by change of time from the first log to the second one.')
+    parser_show.add_argument('--rank', dest='rank', type=str, choices=['absolute', 'relative'], default='absolute',
+                             help='rank routines by change of time in seconds or by ratio of time. Only valid with `--timing`. Default: absolute')
+    parser_show.add_argument('--top', dest='top', type=int, default=None,
+                             help='number of routines shown. Only valid with `--timing`. Default: all')
+    parser_show.add_argument('--min-time', dest='min_time', type=float, default=0.0,
+                             help='routines shorter than this in seconds in both logs are not shown. Only valid with `--timing`. Default: 0')
+    parser_show.add_argument('-m', '--manifest', dest='manifest', type=str, default=None,
+                             help='render band and DOS plot jobs listed in a json file in parallel.')
     parser_show.set_defaults(func=Show().show_cmdline)
 
     # Convert
@@ -50,8 +92,36 @@ def main():
                                 default=None, help="convert structure file format to another.")
     parser_convert.set_defaults(func=Convert().convert_cmdline)
 
+    # Cache
+    parser_cache = subparsers.add_parser(
+        'cache', help='manage result cache of auto-test')
+    parser_cache.add_argument('-d', '--dir', dest='dir', type=str, required=True,
+                              help='directory of result cache, same as `cache_dir` in `input.json`.')
+    parser_cache.add_argument('-i', '--invalidate', dest='invalidate', type=str, nargs='+',
+                              default=None, help='remove cache entries by keys or their prefixes, `all` to remove all entries.')
+    parser_cache.add_argument('-e', '--evict', dest='evict', type=float, default=None,
+                              help='evict least recently used entries until cache is not larger than this size in MB.')
+    parser_cache.add_argument('-l', '--list', dest='list', action='store_true',
+                              help='list all cache entries.')
+    parser_cache.set_defaults(func=Cache().cache_cmdline)
+
+    # Status
+    parser_status = subparsers.add_parser(
+        'status', help='show states of submitted jobs')
+    parser_status.add_argument('-d', '--dir', dest='dir', type=str, default='.',
+                               help='directory where jobs were submitted, jobs recorded in `jobs.json` of it and its subdirectories are shown. Default: current directory')
+    parser_status.add_argument('-s', '--scheduler', dest='scheduler', type=str, default=None,
+                               help='query jobs of this scheduler directly instead of `jobs.json`, all jobs of user if `--jobs` not set.')
+    parser_status.add_argument('-j', '--jobs', dest='jobs', type=str, nargs='+',
+                               default=None, help='only show these job ids.')
+    parser_status.add_argument('-u', '--user', dest='user', type=str,
+                               default=None, help='user who submitted jobs. Default: current user')
+    parser_status.add_argument('-w', '--watch', dest='watch', type=float, default=None,
+                               help='query states every this many seconds until all jobs are done.')
+    parser_status.set_defaults(func=Status().status_cmdline)
+
     args = parser.parse_args()
     args.func(args)
 
-# TODO: add command about showing job information, kill job
+# TODO: add command about killing job
     #parser_kill = subparsers.add_parser('stop', help='stop auto-test')
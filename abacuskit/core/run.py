@@ -6,13 +6,31 @@ Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
 import os
+import time
+import traceback
 
+from abacuskit.calculations.baseclass import ResultCache, SaveStrategy
 from abacuskit.core.autotest import Autotest, configure
+from abacuskit.schedulers.data import Code
 from abacuskit.utils.IO import read_json, write_json
+from abacuskit.utils.parallel import run_with_budget
+from abacuskit.utils.perf import PerfCheck
 from abacuskit.utils.script import submit_script
 from abacuskit.utils.typings import *
 
 
+def _timed_single_run(src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", save_files: bool = True, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, resume: bool = False, perf: PerfCheck = None) -> tuple:
+    """Run `Run.single_run` in a worker process and return its status, wall time and error message"""
+
+    start = time.perf_counter()
+    try:
+        Run.single_run(src, dst, version, external_command,
+                       save_files, workers, cores_per_worker, cache, resume, perf)
+    except Exception:
+        return "FAILED", time.perf_counter()-start, traceback.format_exc().strip().split('\n')[-1]
+    return "PASSED", time.perf_counter()-start, ""
+
+
 class Run:
     """Ways to run Auto-test code"""
 
@@ -37,7 +55,7 @@ class Run:
         return commands, workflow
 
     @classmethod
-    def single_run(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", save_files: bool = True):
+    def single_run(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", save_files: bool = True, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, resume: bool = False, perf: PerfCheck = None):
         """This function tests an example individually, this example directory should have a configuration file named `config.json`.
 
         :params src: path of library
@@ -45,89 +63,255 @@ class Run:
         :params version: executable file list
         :params external_command: other non-ABACUS code needed
         :params save_files: if save input files of last calculation, or not
+        :params workers: number of versions calculated at the same time. Default: 1
+        :params cores_per_worker: number of cores bound to each worker. Default: None
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object, if set, results of calculations with identical inputs are reused. Default: None
+        :params resume: skip calculations finished in last run, which are recorded in `command_*/autotest_state.json` of `dst`. Default: False
+        :params perf: `abacuskit.utils.perf.PerfCheck` object, performance of versions is compared in `perf_diff.json` of `dst`. Default: None, run once without performance comparison
         """
 
         print(f"Test For Example {src} Begin:", flush=True)
+        src, dst = os.path.abspath(src), os.path.abspath(dst)
         if not os.path.exists(dst):
             os.makedirs(dst)
         current_path = os.getcwd()
         os.chdir(dst)
-        commands, workflow = cls.preprocess(src, dst, version)
-        job = Autotest(workflow)
-        job.compare(commands, external_command, save_files)
-        os.chdir(current_path)
+        try:
+            commands, workflow = cls.preprocess(src, dst, version)
+            job = Autotest(workflow)
+            job.compare(commands, external_command, save_files,
+                        workers, cores_per_worker, cache, resume, perf)
+        finally:
+            # a failed example must not change directory of next example run by the same process
+            os.chdir(current_path)
         print(f"Test For Example {src} Finished\n", flush=True)
 
     @classmethod
-    def batch_run(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", save_files: bool = True):
+    def batch_run(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", save_files: bool = True, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, jobs: int = 1, ranks: int = None, resume: bool = False, perf: PerfCheck = None) -> dict:
         """If there is a library of examples for test, this function can run all the test in a serial way. Each example directory
-        should have a configuration file named `config.json`.
+        should have a configuration file named `config.json`. Failure of one example does not stop others, status and wall time of each example are printed at last.
+
+        :params src: path of library
+        :params dst: path of working directory
+        :params version: executable file list
+        :params external_command: other non-ABACUS code needed
+        :params save_files: if save input files of last calculation, or not
+        :params workers: number of versions calculated at the same time. Default: 1
+        :params cores_per_worker: number of cores bound to each worker. Default: None
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object, if set, results of calculations with identical inputs are reused. Default: None
+        :params jobs: number of examples tested at the same time. Default: 1
+        :params ranks: total number of MPI processes shared by examples tested at the same time. Default: None, no limit
+        :params resume: skip calculations finished in last run. Default: False
+        :params perf: `abacuskit.utils.perf.PerfCheck` object. Default: None, run once
+        :return: dict of example name and tuple of its status, wall time and error message
+        """
+
+        if jobs > 1:
+            return cls.pool_run(src, dst, version, external_command, save_files, workers, cores_per_worker, cache, jobs, ranks, resume, perf)
+
+        summary = {}
+        for subsrc, (abs_subsrc, subdst) in cls.examples(src, dst).items():
+            summary[subsrc] = _timed_single_run(abs_subsrc, subdst, version,
+                                                external_command, save_files, workers, cores_per_worker, cache, resume, perf)
+        cls.summary(summary)
+
+        return summary
+
+    @classmethod
+    def pool_run(cls, src: str_PathLike, dst: str_PathLike, version: list, external_command: Command = "", save_files: bool = True, workers: int = 1, cores_per_worker: int = None, cache: ResultCache = None, jobs: int = 1, ranks: int = None, resume: bool = False, perf: PerfCheck = None) -> dict:
+        """Test examples of library in a process pool, then print status and wall time of each example
 
         :params src: path of library
         :params dst: path of working directory
         :params version: executable file list
         :params external_command: other non-ABACUS code needed
         :params save_files: if save input files of last calculation, or not
+        :params workers: number of versions calculated at the same time. Default: 1
+        :params cores_per_worker: number of cores bound to each worker. Default: None
+        :params cache: `abacuskit.calculations.baseclass.ResultCache` object, if set, results of calculations with identical inputs are reused. Default: None
+        :params jobs: number of examples tested at the same time. Default: 1
+        :params ranks: total number of MPI processes shared by examples tested at the same time. Default: None, no limit
+        :params resume: skip calculations finished in last run. Default: False
+        :params perf: `abacuskit.utils.perf.PerfCheck` object. Default: None, run once
+        :return: dict of example name and tuple of its status, wall time and error message
         """
 
-        for subsrc in os.listdir(src):
-            abs_subsrc = os.path.join(src, subsrc)
-            subdst = os.path.join(dst, os.path.basename(subsrc))
-            cls.single_run(abs_subsrc, subdst, version,
-                           external_command, save_files)
+        tasks = {}
+        costs = {}
+        for subsrc, (abs_subsrc, subdst) in cls.examples(src, dst).items():
+            tasks[subsrc] = (abs_subsrc, subdst, version,
+                             external_command, save_files, workers, cores_per_worker, cache, resume, perf)
+            costs[subsrc] = cls.count_ranks(abs_subsrc) * \
+                min(workers, len(version))
+
+        futures = run_with_budget(_timed_single_run, tasks, costs, jobs, ranks)
+        summary = {name: future.result() for name, future in futures.items()}
+        cls.summary(summary)
+
+        return summary
 
     @classmethod
-    def batch_with_script(cls, filename: str_PathLike, parallel: bool = False):
+    def examples(cls, src: str_PathLike, dst: str_PathLike) -> dict:
+        """Return dict of example name and absolute paths of its directory in library `src` and its working directory in `dst`
+
+        :params src: path of library
+        :params dst: path of working directory
+        """
+
+        src, dst = os.path.abspath(src), os.path.abspath(dst)
+        return {subsrc: (os.path.join(src, subsrc), os.path.join(dst, subsrc))
+                for subsrc in sorted(os.listdir(src)) if os.path.isdir(os.path.join(src, subsrc))}
+
+    @classmethod
+    def count_ranks(cls, src: str_PathLike) -> int:
+        """Return the maximum number of MPI processes among calculations of an example
+
+        :params src: path of example which has `config.json`
+        """
+
+        config_file = os.path.join(src, "config.json")
+        if not os.path.exists(config_file):
+            return 1
+        workflow = read_json(config_file).get("workflow", {})
+        nprocs = [1]
+        for cal in workflow.values():
+            code = cal.get("code", {})
+            nprocs.append(Code(cmdline_params=code.get("cmdline_params", []),
+                               withmpi=code.get("withmpi", "mpirun")).mpiprocs)
+        return max(nprocs)
+
+    @classmethod
+    def summary(cls, summary: dict):
+        """Print status and wall time of each example
+
+        :params summary: dict of example name and tuple of its status, wall time and error message
+        """
+
+        print("--------------------------Batch Test Summary--------------------------", flush=True)
+        print(f"{'Example'.ljust(30)}{'Status'.ljust(10)}{'Time(s)'.ljust(12)}{'Message'}", flush=True)
+        for name, (status, elapsed, message) in summary.items():
+            print(f"{name.ljust(30)}{status.ljust(10)}{elapsed:<12.2f}{message}", flush=True)
+        failed = [name for name, value in summary.items() if value[0] != "PASSED"]
+        print(f"{len(summary)-len(failed)} passed, {len(failed)} failed", flush=True)
+
+    @classmethod
+    def batch_with_script(cls, filename: str_PathLike, parallel: bool = False, jobs: int = 1, ranks: int = None, resume: bool = False):
         """Batch run with script
 
         :params filename: absolute path of `input.json`
         :params parallel: whether to test in parallel. Default: False
+        :params jobs: number of examples tested at the same time in one script. Default: 1
+        :params ranks: total number of MPI processes shared by examples tested at the same time. Default: None
+        :params resume: skip calculations finished in last run. Default: False
         """
 
         if parallel:
             text = read_json(filename)
             for subsrc in os.listdir(text["src"]):
                 subdst = os.path.join(text["dst"], os.path.basename(subsrc))
-                os.makedirs(subdst)
+                os.makedirs(subdst, exist_ok=True)
                 new_filename = os.path.join(subdst, os.path.basename(filename))
                 write_json(filename, new_filename, src=os.path.join(
                     text["src"], os.path.basename(subsrc)), dst=subdst)
                 os.chdir(subdst)
                 line = f"abacuskit run --single={new_filename} --local True"
+                if resume:
+                    line += " --resume"
                 submit_script(new_filename, line)
 
         else:
             line = f"abacuskit run --batch={filename} --local True"
+            if jobs > 1:
+                line += f" --jobs {jobs}"
+            if ranks:
+                line += f" --ranks {ranks}"
+            if resume:
+                line += " --resume"
             submit_script(filename, line)
 
     @classmethod
-    def single_with_script(cls, filename: str_PathLike):
+    def single_with_script(cls, filename: str_PathLike, resume: bool = False):
         """Batch run with script
 
         :params filename: absolute path of `input.json`
+        :params resume: skip calculations finished in last run. Default: False
         """
 
         line = f"abacuskit run --single={filename} --local True"
+        if resume:
+            line += " --resume"
         submit_script(filename, line)
 
+    @classmethod
+    def set_cache(cls, text: dict) -> ResultCache:
+        """Return `ResultCache` object set by `cache_dir` and `cache_max_mb` in `input.json`, None if `cache_dir` not set
+
+        :params text: dict of `input.json`
+        """
+
+        cache_dir = text.pop("cache_dir", None)
+        cache_max_mb = text.pop("cache_max_mb", None)
+        if not cache_dir:
+            return None
+        return ResultCache(cache_dir, cache_max_mb*1024*1024 if cache_max_mb else None)
+
+    @classmethod
+    def set_save(cls, text: dict) -> typing.Union[bool, SaveStrategy]:
+        """Return `save_files` in `input.json`, it is a `SaveStrategy` object if `save_mode`, `save_patterns` or `save_dedup_dir` is set
+
+        :params text: dict of `input.json`
+        """
+
+        save_files = text.pop("save_files", True)
+        mode = text.pop("save_mode", "copy")
+        patterns = text.pop("save_patterns", None)
+        dedup_dir = text.pop("save_dedup_dir", None)
+        if not save_files or (mode == "copy" and patterns is None and not dedup_dir):
+            return save_files
+        return SaveStrategy(mode, patterns, dedup_dir)
+
+    @classmethod
+    def set_perf(cls, text: dict) -> PerfCheck:
+        """Return `PerfCheck` object set by `perf_repeat`, `perf_threshold` and `perf_alpha` in `input.json`, None if performance is not compared, that is `perf_repeat` not larger than 1 and `perf_check` not true
+
+        :params text: dict of `input.json`
+        """
+
+        check = text.pop("perf_check", False)
+        repeat = text.pop("perf_repeat", 1)
+        threshold = text.pop("perf_threshold", 0.05)
+        alpha = text.pop("perf_alpha", 0.05)
+        if repeat <= 1 and not check:
+            return None
+        return PerfCheck(repeat, threshold, alpha)
+
     @classmethod
     def run_cmdline(cls, args):
         if args.batch and args.local:
             text = read_json(args.batch)
-            save_files = text.pop("save_files", True)
+            save_files = cls.set_save(text)
             external_command = text.pop("external_command", '')
+            workers = text.pop("workers", 1)
+            cores_per_worker = text.pop("cores_per_worker", None)
+            cache = cls.set_cache(text)
+            perf = cls.set_perf(text)
             cls.batch_run(text["src"], text["dst"],
-                          text["version"], external_command, save_files)
+                          text["version"], external_command, save_files, workers, cores_per_worker, cache, args.jobs, args.ranks, args.resume, perf)
 
         elif args.batch and not args.local:
-            cls.batch_with_script(args.batch, args.parallel)
+            cls.batch_with_script(args.batch, args.parallel,
+                                  args.jobs, args.ranks, args.resume)
 
         elif args.single and args.local:
             text = read_json(args.single)
-            save_files = text.pop("save_files", True)
+            save_files = cls.set_save(text)
             external_command = text.pop("external_command", '')
+            workers = text.pop("workers", 1)
+            cores_per_worker = text.pop("cores_per_worker", None)
+            cache = cls.set_cache(text)
+            perf = cls.set_perf(text)
             cls.single_run(text["src"], text["dst"],
-                           text["version"], external_command, save_files)
+                           text["version"], external_command, save_files, workers, cores_per_worker, cache, args.resume, perf)
 
         elif args.single and not args.local:
-            cls.single_with_script(args.single)
+            cls.single_with_script(args.single, args.resume)
@@ -5,6 +5,7 @@ LastEditTime: 2021-09-28 09:28:51
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+import glob
 import os
 from typing import Dict, List, Sequence, Union
 
@@ -40,7 +41,7 @@ class Show:
                 raise FileNotFoundError(f"No information to show!")
 
     @classmethod
-    def show_bandinfo(cls, datafile: Union[PathLike, Sequence[PathLike]], kptfile: PathLike, efermi: Union[float, Sequence[float]] = None, energy_range: Sequence[float] = [], shift: bool = True, label: Union[str, Sequence[str]] = None, color: Union[str, Sequence[str]] = None, outfile: PathLike = "band.png"):
+    def show_bandinfo(cls, datafile: Union[PathLike, Sequence[PathLike]], kptfile: PathLike, efermi: Union[float, Sequence[float]] = None, energy_range: Sequence[float] = [], shift: bool = True, label: Union[str, Sequence[str]] = None, color: Union[str, Sequence[str]] = None, outfile: PathLike = "band.png", cache: bool = True):
         """Show band structure information
 
         :params datafile: path of band date file 
@@ -51,16 +52,17 @@ class Show:
         :params label: band labels, its length equals to `filename`.
         :params color: band colors, its length equals to `filename`.
         :params outfile: band picture file name. Default: 'band.png'
+        :params cache: use and write `.npy` cache of band data files. Default: True
         """
 
         from abacuskit.postprocess.plot import BandPlot
 
         if isinstance(datafile, (str, PathLike)):
             BandPlot.singleplot(datafile, kptfile, efermi,
-                                energy_range, shift, label, color, outfile)
+                                energy_range, shift, label, color, outfile, cache)
         elif isinstance(datafile, (list, tuple)):
             BandPlot.multiplot(datafile, kptfile, efermi,
-                               energy_range, shift, label, color, outfile)
+                               energy_range, shift, label, color, outfile, cache)
 
     @classmethod
     def show_dosinfo(cls, tdosfile: PathLike = '', pdosfile: PathLike = '', efermi: float = 0, energy_range: Sequence[float] = [], dos_range: Sequence[float] = [], shift: bool = True, species: Union[Sequence[str], Dict[str, List[int]]] = [], tdosfig: PathLike = 'tdos.png', pdosfig: PathLike = 'pdos.png', prec: float = 0.01):
@@ -81,6 +83,100 @@ class Show:
         DosPlot().plot(tdosfile, pdosfile, efermi, energy_range,
                        dos_range, shift, species, tdosfig, pdosfig, prec)
 
+    @classmethod
+    def show_gapinfo(cls, datafile: Sequence[PathLike], efermi: Union[float, Sequence[float]] = 0.0, kptfile: PathLike = '', outfile: PathLike = '', cache: bool = True):
+        """Show band gaps and band edges of many band data files without plotting
+
+        :params datafile: list of path of band data files
+        :params efermi: Fermi level in unit eV, or list of Fermi levels of each file. Default: 0.0
+        :params kptfile: k-point file, if set, coordinates of k-points of band edges are shown. Default: ''
+        :params outfile: csv file to write the table. Default: '', not written
+        :params cache: use and write `.npy` cache of band data files. Default: True
+        """
+
+        from abacuskit.postprocess.band import band_gaps
+
+        res = band_gaps(datafile, efermi, cache)
+        kpath = None
+        if kptfile:
+            from abacuskit.utils.IO import read_kpt
+            kpath = read_kpt(kptfile).full_kpath
+
+        def location(k_index):
+            if kpath is None or k_index < 0 or k_index >= len(kpath):
+                return str(k_index)
+            return ' '.join(f"{i:.4f}" for i in kpath[k_index])
+
+        header = ["file", "gap(eV)", "type", "VBM(eV)", "CBM(eV)",
+                  "HOMO", "LUMO", "VBM k-point", "CBM k-point"]
+        rows = []
+        for filename, edge in zip(datafile, res):
+            rows.append([str(filename), f"{edge['gap']:.4f}", "Direct" if edge["direct"] else "Indirect", f"{edge['vbm']:.4f}", f"{edge['cbm']:.4f}",
+                         str(edge["homo"]), str(edge["lumo"]), location(edge["vbm_k"]), location(edge["cbm_k"])])
+
+        width = max([len(header[0])]+[len(row[0]) for row in rows])+2
+        print(f"{header[0].ljust(width)}{''.join(i.ljust(10) for i in header[1:7])}{header[7].ljust(24)}{header[8]}", flush=True)
+        for row in rows:
+            print(f"{row[0].ljust(width)}{''.join(i.ljust(10) for i in row[1:7])}{row[7].ljust(24)}{row[8]}", flush=True)
+        if outfile:
+            import csv
+            with open(outfile, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(header)
+                writer.writerows(rows)
+
+    @classmethod
+    def show_timing(cls, logs: Sequence[PathLike], rank: str = "absolute", top: int = None, min_time: float = 0.0):
+        """Show timing table at the end of ABACUS log, or rank routines by change of time between two logs
+
+        :params logs: one or two ABACUS running logs or standard output files, the first one is the base
+        :params rank: 'absolute' to rank by change of time in seconds, 'relative' by ratio of time. Default: 'absolute'
+        :params top: number of routines shown. Default: None, all
+        :params min_time: routines shorter than this in seconds in both logs are not shown. Default: 0.0
+        """
+
+        from abacuskit.utils.running import diff_timings, read_running_log
+
+        timings = [read_running_log(log).timings for log in logs]
+        for log, records in zip(logs, timings):
+            if not records:
+                raise ValueError(f"No timing table found in {log}")
+
+        print("--------------------------Timing--------------------------", flush=True)
+        if len(logs) == 1:
+            records = sorted(timings[0], key=lambda record: record.time, reverse=True)[:top]
+            print(f"{'CLASS_NAME'.ljust(24)}{'NAME'.ljust(32)}{'TIME(s)'.ljust(12)}{'CALLS'.ljust(10)}{'AVG(s)'.ljust(12)}{'PER(%)'}", flush=True)
+            for record in records:
+                print(f"{record.class_name.ljust(24)}{record.name.ljust(32)}{record.time:<12.4g}{str(record.calls).ljust(10)}{record.avg:<12.4g}{record.percent:.2f}", flush=True)
+            return
+
+        rows = diff_timings(timings[0], timings[1], rank, min_time)[:top]
+        print(f"Base: {logs[0]}\nNew:  {logs[1]}", flush=True)
+        print(f"{'CLASS_NAME'.ljust(24)}{'NAME'.ljust(32)}{'BASE(s)'.ljust(12)}{'NEW(s)'.ljust(12)}{'DELTA(s)'.ljust(12)}{'RATIO'.ljust(10)}{'CALLS'}", flush=True)
+        for row in rows:
+            calls = f"{row['base_calls']}->{row['new_calls']}" if row['base_calls'] != row['new_calls'] else str(row['new_calls'])
+            print(f"{row['class_name'].ljust(24)}{row['name'].ljust(32)}{row['base_time']:<12.4g}{row['new_time']:<12.4g}{row['delta']:<+12.4g}{row['ratio']:<10.3f}{calls}", flush=True)
+
+    @classmethod
+    def show_render(cls, jobs: List[dict], processes: int = None):
+        """Render figures of many band and DOS plot jobs in parallel
+
+        :params jobs: list of plot jobs, `type` is 'band' or 'dos', other keys are the same as json file of `-b` or `-d`
+        :params processes: number of worker processes. Default: None, number of cores
+        """
+
+        from abacuskit.postprocess.render import render
+
+        res = render(jobs, processes)
+        failed = 0
+        for index, (figures, error) in enumerate(res):
+            if error:
+                failed += 1
+                print(f"Job {index} ({jobs[index]['type']}) failed:\n{error}", flush=True)
+            else:
+                print(f"Job {index} ({jobs[index]['type']}): {', '.join(map(str, figures))}", flush=True)
+        print(f"{len(res)-failed} jobs rendered, {failed} failed", flush=True)
+
     @classmethod
     def show_cmdline(cls, args):
         if args.lib:
@@ -97,8 +193,9 @@ class Show:
             label = text.pop("label", None)
             color = text.pop("color", None)
             outfile = text.pop("outfile", "band.png")
+            cache = text.pop("cache", True)
             cls.show_bandinfo(filename, kptfile, efermi,
-                              energy_range, shift, label, color, outfile)
+                              energy_range, shift, label, color, outfile, cache)
 
         if args.dos:
             text = read_json(args.dos)
@@ -114,3 +211,25 @@ class Show:
             prec = text.pop("prec", 0.01)
             cls.show_dosinfo(tdosfile, pdosfile, efermi,
                              energy_range, dos_range, shift, species, tdosfig, pdosfig, prec)
+
+        if args.gap:
+            text = read_json(args.gap)
+            filename = text["filename"]
+            if isinstance(filename, str):
+                filename = sorted(glob.glob(filename))
+            efermi = text.pop("efermi", 0.0)
+            kptfile = text.pop("kptfile", '')
+            outfile = text.pop("outfile", '')
+            cache = text.pop("cache", True)
+            cls.show_gapinfo(filename, efermi, kptfile, outfile, cache)
+
+        if args.timing:
+            cls.show_timing(args.timing, args.rank, args.top, args.min_time)
+
+        if args.manifest:
+            text = read_json(args.manifest)
+            if isinstance(text, list):
+                text = {"jobs": text}
+            jobs = text["jobs"]
+            processes = text.pop("processes", None)
+            cls.show_render(jobs, processes)
@@ -0,0 +1,118 @@
+'''
+Date: 2026-10-18 13:13:47
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:13:47
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import time
+import warnings
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from abacuskit.schedulers.data import JobInfo, JobState
+from abacuskit.utils.script import JOB_RECORD, get_scheduler, read_job_record
+from abacuskit.utils.typings import *
+
+# state of a job with many array tasks is the first state of its tasks in this order
+_STATE_ORDER = [JobState.RUNNING, JobState.SUSPENDED, JobState.QUEUED,
+                JobState.QUEUED_HELD, JobState.UNDETERMINED, JobState.DONE]
+
+
+class Status:
+    """Show states of submitted jobs"""
+
+    @classmethod
+    def collect_jobs(cls, directory: str_PathLike) -> dict:
+        """Return submitted jobs recorded in `jobs.json` of `directory` and its subdirectories
+
+        :params directory: directory where jobs were submitted
+        """
+
+        jobs = {}
+        for record in sorted(Path(directory).rglob(JOB_RECORD)):
+            jobs.update(read_job_record(record))
+        return jobs
+
+    @classmethod
+    def poll(cls, jobs: dict, user: str = None) -> dict:
+        """Query states of jobs, one command for each scheduler
+
+        :params jobs: dict of jobs, key is job id and value contains `scheduler`
+        :params user: user name. Default: None, current user
+        :return: dict, key is job id and value is a list of `JobInfo` objects
+        """
+
+        groups = defaultdict(list)
+        for job_id, info in jobs.items():
+            groups[info["scheduler"]].append(job_id)
+
+        states = {}
+        for scheduler, job_ids in groups.items():
+            try:
+                states.update(get_scheduler(
+                    scheduler).get_jobs(job_ids, user))
+            except (RuntimeError, NotImplementedError, OSError) as e:
+                warnings.warn(f"Failed to query jobs of `{scheduler}`: {e}")
+                states.update({job_id: [JobInfo(job_id)]
+                               for job_id in job_ids})
+        return states
+
+    @classmethod
+    def job_state(cls, infos: typing.List[JobInfo]) -> JobState:
+        """Return state of a job from states of its tasks"""
+
+        job_states = {info.job_state for info in infos}
+        for state in _STATE_ORDER:
+            if state in job_states:
+                return state
+        return JobState.UNDETERMINED
+
+    @classmethod
+    def show_jobs(cls, jobs: dict, states: dict):
+        """Print states of jobs
+
+        :params jobs: dict of jobs, key is job id and value contains `scheduler` and `folder`
+        :params states: dict returned by `poll`
+        """
+
+        print(f"{'JOB ID'.ljust(20)}{'SCHEDULER'.ljust(12)}{'STATE'.ljust(14)}{'TASKS'.ljust(30)}FOLDER", flush=True)
+        summary = Counter()
+        for job_id, infos in states.items():
+            state = cls.job_state(infos)
+            summary[state.value] += 1
+            tasks = ''
+            if len(infos) > 1:
+                tasks = ', '.join(f"{number} {value}" for value, number in Counter(
+                    info.job_state.value for info in infos).items())
+            info = jobs.get(job_id, {})
+            print(f"{str(job_id).ljust(20)}{info.get('scheduler', '').ljust(12)}{state.value.ljust(14)}{tasks.ljust(30)}{info.get('folder', '')}", flush=True)
+        print(', '.join(f"{number} {value}" for value,
+              number in summary.items()) or "No jobs found", flush=True)
+
+    @classmethod
+    def status_cmdline(cls, args):
+        if args.scheduler and not args.jobs:
+            scheduler = get_scheduler(args.scheduler)
+            states = scheduler.get_jobs(None, args.user)
+            jobs = {job_id: {"scheduler": args.scheduler}
+                    for job_id in states}
+            cls.show_jobs(jobs, states)
+            return
+
+        if args.scheduler:
+            jobs = {job_id: {"scheduler": args.scheduler, "folder": ''}
+                    for job_id in args.jobs}
+        else:
+            jobs = cls.collect_jobs(args.dir)
+            if args.jobs:
+                jobs = {job_id: info for job_id,
+                        info in jobs.items() if job_id in args.jobs}
+
+        while True:
+            states = cls.poll(jobs, args.user)
+            cls.show_jobs(jobs, states)
+            if not args.watch or all(cls.job_state(infos) == JobState.DONE for infos in states.values()):
+                break
+            time.sleep(args.watch)
+            print(flush=True)
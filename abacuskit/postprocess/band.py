@@ -0,0 +1,160 @@
+'''
+Date: 2026-10-18 13:29:16
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:37:43
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import os
+import warnings
+from pathlib import Path
+
+import numpy as np
+from abacuskit.utils.typings import *
+
+
+# `np.loadtxt` is implemented in C since NumPy 1.23, before that it parses line by line in Python
+FAST_LOADTXT = tuple(int(i) for i in np.__version__.split('.')[:2]) >= (1, 23)
+
+
+def parse_band(filename: str_PathLike) -> np.ndarray:
+    """Parse band data file, e.g. `BANDS_1.dat`, and return 2-D array, each row is one k-point
+
+    :params filename: path of band data file
+    """
+
+    if FAST_LOADTXT:
+        return np.loadtxt(filename, dtype=float, ndmin=2)
+    with open(filename, 'r') as file:
+        text = file.read()
+    lines = [line for line in text.splitlines() if line.strip()]
+    if lines and '#' not in text:
+        ncols = len(lines[0].split())
+        with warnings.catch_warnings():
+            # a token which is not a number stops parsing, then size does not match
+            warnings.simplefilter("ignore", DeprecationWarning)
+            data = np.fromstring(text, dtype=float, sep=' ')
+        if ncols and data.size == ncols*len(lines):
+            return data.reshape(len(lines), ncols)
+    return np.loadtxt(filename, dtype=float, ndmin=2)
+
+
+def band_cache_file(filename: str_PathLike) -> Path:
+    """Return path of `.npy` cache of band data file, its name contains size and modification time of the file
+
+    :params filename: path of band data file
+    """
+
+    filename = Path(filename)
+    stat = filename.stat()
+    return filename.with_name(f".{filename.name}.{stat.st_size}-{stat.st_mtime_ns}.npy")
+
+
+def read_band(filename: str_PathLike, cache: bool = True) -> np.ndarray:
+    """Return 2-D array of band data file, each row is one k-point
+
+    The array is saved in a hidden `.npy` file next to the data file, it is memory-mapped in later calls until the data file changes.
+
+    :params filename: path of band data file
+    :params cache: use and write `.npy` cache. Default: True
+    """
+
+    if not cache:
+        return parse_band(filename)
+
+    cache_file = band_cache_file(filename)
+    if cache_file.exists():
+        try:
+            return np.load(cache_file, mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+
+    data = parse_band(filename)
+    for old in cache_file.parent.glob(f".{Path(filename).name}.*.npy"):
+        try:
+            old.unlink()
+        except OSError:
+            pass
+    tmp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}")
+    try:
+        with open(tmp, 'wb') as file:
+            np.save(file, data)
+        os.replace(tmp, cache_file)
+    except OSError:
+        # directory of data file may be read-only
+        if tmp.exists():
+            tmp.unlink()
+    return data
+
+
+# fields of band edges, energies are in unit eV relative to the Fermi level and indices start from 0, -1 if not found
+BAND_EDGE_FIELDS = [("vbm", float), ("cbm", float), ("gap", float), ("direct", bool),
+                    ("homo", int), ("lumo", int), ("vbm_k", int), ("cbm_k", int)]
+
+
+def band_edges(energy: np.ndarray, efermi: typing.Union[float, np.ndarray] = 0.0) -> np.ndarray:
+    """Return band gap, band edges and their k-point indices of band energies
+
+    Valence bands are below the Fermi level at all k-points, other bands are conduction bands as `BandPlot.set_vcband`.
+
+    :params energy: band energies with shape (nkpts, nbands), or a stack of them with shape (nfiles, nkpts, nbands)
+    :params efermi: Fermi level in unit eV, or array with shape (nfiles,) for a stack. Default: 0.0
+    :return: structured array with fields `BAND_EDGE_FIELDS`, its shape is () for one band structure and (nfiles,) for a stack
+    """
+
+    energy = np.asarray(energy, dtype=float)
+    single = energy.ndim == 2
+    if single:
+        energy = energy[np.newaxis]
+    efermi = np.broadcast_to(np.asarray(efermi, dtype=float), energy.shape[:1])
+
+    # only extrema of each band over k-points are compared to the Fermi level
+    emax, emin = energy.max(axis=1), energy.min(axis=1)
+    band_max, band_min = emax - \
+        efermi[:, np.newaxis], emin-efermi[:, np.newaxis]
+    valence = band_max <= 0
+    has_vb, has_cb = valence.any(axis=1), (~valence).any(axis=1)
+    vb_band = np.argmax(np.where(valence, band_max, -np.inf), axis=1)
+    cb_band = np.argmin(np.where(valence, np.inf, band_min), axis=1)
+    evbm = np.take_along_axis(emax, vb_band[:, np.newaxis], axis=1)
+    ecbm = np.take_along_axis(emin, cb_band[:, np.newaxis], axis=1)
+    vbm, cbm = evbm[:, 0]-efermi, ecbm[:, 0]-efermi
+    # k-points where band edges are
+    vbm_at = np.take_along_axis(
+        energy, vb_band[:, np.newaxis, np.newaxis], axis=2)[:, :, 0] == evbm
+    cbm_at = np.take_along_axis(
+        energy, cb_band[:, np.newaxis, np.newaxis], axis=2)[:, :, 0] == ecbm
+
+    res = np.empty(len(energy), dtype=BAND_EDGE_FIELDS)
+    res["vbm"] = np.where(has_vb, vbm, np.nan)
+    res["cbm"] = np.where(has_cb, cbm, np.nan)
+    res["gap"] = res["cbm"]-res["vbm"]
+    res["direct"] = has_vb & has_cb & (vbm_at & cbm_at).any(axis=1)
+    res["homo"] = np.where(
+        has_vb, valence.shape[1]-1-np.argmax(valence[:, ::-1], axis=1), -1)
+    res["lumo"] = np.where(has_cb, np.argmax(~valence, axis=1), -1)
+    res["vbm_k"] = np.where(has_vb, np.argmax(vbm_at, axis=1), -1)
+    res["cbm_k"] = np.where(has_cb, np.argmax(cbm_at, axis=1), -1)
+    return res[0] if single else res
+
+
+def band_gaps(filenames: typing.Sequence[str_PathLike], efermi: typing.Union[float, typing.Sequence[float]] = 0.0, cache: bool = True) -> np.ndarray:
+    """Return band edges of many band data files, files with the same number of k-points and bands are handled as one array
+
+    :params filenames: list of band data files
+    :params efermi: Fermi level in unit eV, or list of Fermi levels of each file. Default: 0.0
+    :params cache: use and write `.npy` cache of band data files. Default: True
+    :return: structured array with fields `BAND_EDGE_FIELDS` and shape (nfiles,)
+    """
+
+    efermi = np.broadcast_to(np.asarray(efermi, dtype=float), (len(filenames),))
+    energies, groups = [], {}
+    for index, filename in enumerate(filenames):
+        energies.append(read_band(filename, cache)[:, 1:])
+        groups.setdefault(energies[-1].shape, []).append(index)
+
+    res = np.empty(len(filenames), dtype=BAND_EDGE_FIELDS)
+    for index in groups.values():
+        res[index] = band_edges(
+            np.stack([energies[i] for i in index]), efermi[index])
+    return res
@@ -0,0 +1,228 @@
+'''
+Date: 2026-10-18 13:31:37
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:55:56
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import warnings
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+from abacuskit.utils.typings import *
+
+try:
+    from lxml.etree import iterparse
+    # text of `data` of large PDOS files may exceed default limit of libxml2
+    _PARSER_OPTIONS = {"huge_tree": True}
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+    _PARSER_OPTIONS = {}
+
+
+# fields of each orbital in PDOS file
+ORBITAL_FIELDS = ("index", "atom_index", "species", "l", "m", "z")
+
+
+class PDOS:
+    """Projected density of states of all orbitals"""
+
+    def __init__(self, energy: np.ndarray, dos: np.ndarray, orbitals: np.ndarray, nspin: int = 1, eunit: str = "eV") -> None:
+        """
+        :params energy: energy values with shape (nenergy,)
+        :params dos: projected DOS with shape (norbitals, nenergy, nspin)
+        :params orbitals: structured array with fields `ORBITAL_FIELDS`, one record for each orbital
+        :params nspin: `nspin` in PDOS file. Default: 1
+        :params eunit: unit of energy. Default: 'eV'
+        """
+
+        self.energy = energy
+        self.dos = dos
+        self.orbitals = orbitals
+        self.nspin = nspin
+        self.eunit = eunit
+
+    def __len__(self) -> int:
+        return len(self.orbitals)
+
+    def orbital_dicts(self) -> List[OrderedDict]:
+        """Return list of dict of each orbital as `DosPlot.read`, `data` is a view of `dos` with shape (nenergy, nspin)"""
+
+        orbitals = []
+        for i, record in enumerate(self.orbitals):
+            orb = OrderedDict((field, record[field].item())
+                              for field in ORBITAL_FIELDS)
+            orb['data'] = self.dos[i]
+            orbitals.append(orb)
+        return orbitals
+
+    def total(self) -> np.ndarray:
+        """Return total DOS summed over all orbitals with shape (nenergy, nspin)"""
+
+        return self.dos.sum(axis=0)
+
+    def group_by(self, *fields: str) -> "OrderedDict[Union[tuple, int, str], np.ndarray]":
+        """Sum DOS of orbitals with the same values of `fields`, e.g. `group_by('species', 'l')`
+
+        :params fields: fields in `ORBITAL_FIELDS`
+        :return: dict, key is value of the field(tuple of values for more than one field) and value is DOS with shape (nenergy, nspin)
+        """
+
+        keys, inverse = np.unique(self.orbitals[list(fields)], return_inverse=True)
+        dos = _reduce(self.dos, inverse.ravel(), len(keys))
+        if len(fields) == 1:
+            keys = [key[0].item() for key in keys]
+        else:
+            keys = [tuple(value.item() for value in key) for key in keys]
+        return OrderedDict(zip(keys, dos))
+
+    def select(self, selection: Dict[str, Union[int, str, Sequence]]) -> np.ndarray:
+        """Return boolean mask of orbitals matching all items of `selection`
+
+        :params selection: dict of field and its value or list of values, e.g. {'species': 'Si', 'l': [1, 2]} or {'atom_index': [1, 2, 3]}
+        """
+
+        return _match(self.orbitals, selection)
+
+    def project(self, selections: Dict[str, Dict[str, Union[int, str, Sequence]]]) -> "OrderedDict[str, np.ndarray]":
+        """Sum DOS of orbitals for all `selections` in one pass, an orbital may belong to more than one selection
+
+        :params selections: dict of label and selection used in `select`, e.g. {'Si-p': {'species': 'Si', 'l': 1}, 'surface': {'atom_index': [1, 2]}}
+        :return: dict, key is label and value is DOS with shape (nenergy, nspin)
+        """
+
+        fields = [field for field in ORBITAL_FIELDS if any(
+            field in selection for selection in selections.values())]
+        if fields:
+            # DOS is summed only once by all fields used in `selections`, then each selection sums a few of these groups
+            keys, inverse = np.unique(
+                self.orbitals[fields], return_inverse=True)
+            groups = _reduce(self.dos, inverse.ravel(), len(keys))
+        else:
+            keys, groups = self.orbitals[:1], self.total()[np.newaxis]
+        weights = np.array([_match(keys, selection) for selection in selections.values()],
+                           dtype=float).reshape(-1, len(keys))
+        dos = np.tensordot(weights, groups, axes=1)
+        return OrderedDict(zip(selections.keys(), dos))
+
+
+def _match(records: np.ndarray, selection: Dict[str, Union[int, str, Sequence]]) -> np.ndarray:
+    """Return boolean mask of `records` matching all items of `selection`
+
+    :params records: structured array with some fields of `ORBITAL_FIELDS`
+    :params selection: dict of field and its value or list of values
+    """
+
+    mask = np.ones(len(records), dtype=bool)
+    for field, value in selection.items():
+        if field not in ORBITAL_FIELDS:
+            raise KeyError(
+                f"Unknown field `{field}`, should be one of {ORBITAL_FIELDS}")
+        mask &= np.isin(records[field], np.atleast_1d(value))
+    return mask
+
+
+def _reduce(dos: np.ndarray, inverse: np.ndarray, ngroups: int) -> np.ndarray:
+    """Sum DOS of orbitals in the same group
+
+    :params dos: array with shape (norbitals, nenergy, nspin)
+    :params inverse: group of each orbital, in range [0, ngroups)
+    :params ngroups: number of groups
+    """
+
+    res = np.zeros((ngroups,)+dos.shape[1:], dtype=float)
+    if not len(dos):
+        return res
+    if not np.all(np.diff(inverse) >= 0):
+        # orbitals of each group are scattered, e.g. grouped by l or m
+        if ngroups <= dos[0].size:
+            # a few groups are summed with 0/1 matrix, which is not larger than `dos`
+            weights = np.zeros((ngroups, len(dos)), dtype=float)
+            weights[inverse, np.arange(len(dos))] = 1
+            return np.tensordot(weights, dos, axes=1)
+        # many groups, e.g. grouped by atom and l, are made contiguous by a stable sort
+        order = np.argsort(inverse, kind="stable")
+        dos, inverse = dos[order], inverse[order]
+    groups, starts = np.unique(inverse, return_index=True)
+    res[groups] = np.add.reduceat(dos, starts, axis=0)
+    return res
+
+
+def _parse_values(text: str) -> np.ndarray:
+    """Parse whitespace separated numbers in `text` to 1-D array"""
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        values = np.fromstring(text or '', dtype=float, sep=' ')
+    if values.size != len((text or '').split()):
+        raise ValueError(f"Failed to parse numbers in `{text[:50]}...`")
+    return values
+
+
+def read_pdos(filename: str_PathLike) -> PDOS:
+    """Read `PDOS` file of ABACUS in one pass, elements are released as soon as they are parsed, so memory is bounded by the result
+
+    :params filename: path of PDOS file
+    """
+
+    nspin = 1
+    norbitals = None
+    energy = None
+    eunit = ''
+    dos = None
+    meta = {field: [] for field in ORBITAL_FIELDS}
+    root = None
+    for event, elem in iterparse(str(filename), events=("start", "end"), **_PARSER_OPTIONS):
+        if root is None:
+            root = elem
+        if event == "start":
+            continue
+        if elem.tag == "nspin":
+            nspin = int(elem.text)
+        elif elem.tag == "norbitals":
+            norbitals = int(elem.text)
+        elif elem.tag == "energy_values":
+            eunit = elem.get("units", '').replace(' ', '')
+            energy = _parse_values(elem.text)
+        elif elem.tag == "orbital":
+            i = len(meta["index"])
+            for field in ORBITAL_FIELDS:
+                value = elem.get(field).replace(' ', '')
+                meta[field].append(value if field == "species" else int(value))
+            data = _parse_values(elem.find("data").text)
+            if dos is None:
+                # number of columns of data is known from the first orbital
+                dos = np.empty((norbitals, len(energy), data.size //
+                               len(energy)), dtype=float)
+            dos[i] = data.reshape(dos.shape[1:])
+            # orbitals parsed are released
+            root.clear()
+
+    if dos is None:
+        dos = np.empty((0, len(energy) if energy is not None else 0, 1))
+    orbitals = np.empty(len(meta["index"]), dtype=[(field, 'U16' if field == "species" else int)
+                                                   for field in ORBITAL_FIELDS])
+    for field in ORBITAL_FIELDS:
+        orbitals[field] = meta[field]
+
+    return PDOS(energy, dos[:len(orbitals)], orbitals, nspin, eunit)
+
+
+def project_pdos(pdosfile: str_PathLike, selections: Dict[str, dict] = {}, by: Sequence[str] = ()) -> Tuple[np.ndarray, np.ndarray, OrderedDict]:
+    """Return projections of `PDOS` file without plotting, used for batch post-processing
+
+    :params pdosfile: path of PDOS file
+    :params selections: dict of label and selection used in `PDOS.select`
+    :params by: fields to group orbitals, used in `PDOS.group_by` if `selections` not set
+    :return: energy with shape (nenergy,), total DOS and dict of projections
+    """
+
+    pdos = read_pdos(pdosfile)
+    if selections:
+        projections = pdos.project(selections)
+    elif by:
+        projections = pdos.group_by(*by)
+    else:
+        projections = OrderedDict()
+    return pdos.energy, pdos.total(), projections
@@ -5,18 +5,48 @@ LastEditTime: 2021-11-20 17:00:35
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+import os
 from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 from typing import Dict, List, Sequence, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
+from abacuskit.postprocess.band import read_band
+from abacuskit.postprocess.dos import read_pdos
 from abacuskit.utils.constants import (get_angular_momentum_label,
                                        get_angular_momentum_name)
 from abacuskit.utils.IO import read_kpt
-from abacuskit.utils.tools import list_elem2str, remove_empty
+from abacuskit.utils.tools import list_elem2str
 from abacuskit.utils.typings import *
 from matplotlib import axes
 
+# data read by plots in `shared_data`, key is reader and its arguments
+_SHARED_DATA = None
+
+
+@contextmanager
+def shared_data():
+    """Data files read by plots in this context are read only once, e.g. band data file plotted in many figures"""
+
+    global _SHARED_DATA
+    previous, _SHARED_DATA = _SHARED_DATA, {}
+    try:
+        yield
+    finally:
+        _SHARED_DATA = previous
+
+
+def _load(reader: typing.Callable, filename: str_PathLike, *args):
+    """Return `reader(filename, *args)`, which is kept in `shared_data` context"""
+
+    if _SHARED_DATA is None:
+        return reader(filename, *args)
+    key = (reader, os.path.abspath(filename))+args
+    if key not in _SHARED_DATA:
+        _SHARED_DATA[key] = reader(filename, *args)
+    return _SHARED_DATA[key]
+
 
 def energy_minus_efermi(energy: Sequence, efermi: float) -> np.ndarray:
     """Return energy after subtracting the Fermi level
@@ -59,15 +89,16 @@ class BandPlot:
         return vb, cb
 
     @classmethod
-    def read(cls, filename: str_PathLike) -> Tuple[np.ndarray, np.ndarray]:
+    def read(cls, filename: str_PathLike, cache: bool = True) -> Tuple[np.ndarray, np.ndarray]:
         """Read band data file and return k-points and energy
 
         :params filename: string of band data file
+        :params cache: use and write `.npy` cache next to band data file, see `abacuskit.postprocess.band.read_band`. Default: True
         """
 
-        data = np.loadtxt(filename)
-        X, y = np.split(data, (1, ), axis=1)
-        x = X.flatten()
+        data = _load(read_band, filename, cache)
+        x = data[:, 0]
+        y = data[:, 1:]
         return x, y
 
     @classmethod
@@ -131,10 +162,11 @@ class BandPlot:
         ax.plot(kpoints, energy, lw=0.8, color=color, label=label)
         cls._set_figure(ax, index, energy_range)
 
-        plt.savefig(outfile)
+        fig.savefig(outfile)
+        plt.close(fig)
 
     @classmethod
-    def singleplot(cls, datafile: PathLike, kptfile: str = [], efermi: float = 0, energy_range: Sequence[float] = [], shift: bool = False, label: str = None, color: str = None, outfile: PathLike = 'band.png'):
+    def singleplot(cls, datafile: PathLike, kptfile: str = [], efermi: float = 0, energy_range: Sequence[float] = [], shift: bool = False, label: str = None, color: str = None, outfile: PathLike = 'band.png', cache: bool = True):
         """Plot band structure using data file
 
         :params datafile: string of band date file
@@ -145,15 +177,16 @@ class BandPlot:
         :params label: band label. Default: ''
         :params color: band color. Default: 'black'
         :params outfile: band picture file name. Default: 'band.png'
+        :params cache: use and write `.npy` cache of band data file. Default: True
         """
 
         fig, ax = plt.subplots()
-        kpt = read_kpt(kptfile)
+        kpt = _load(read_kpt, kptfile)
 
         if not color:
             color = 'black'
 
-        kpoints, energy = cls.read(datafile)
+        kpoints, energy = cls.read(datafile, cache)
         if shift:
             vb, cb = cls.set_vcband(energy_minus_efermi(energy, efermi))
             ax.plot(kpoints, np.vstack((vb.band, cb.band)).T,
@@ -165,10 +198,11 @@ class BandPlot:
         index = kpt.label_special_k
         cls._set_figure(ax, index, energy_range)
 
-        plt.savefig(outfile)
+        fig.savefig(outfile)
+        plt.close(fig)
 
     @classmethod
-    def multiplot(cls, datafile: Sequence[PathLike], kptfile: str = '', efermi: Sequence[float] = [], energy_range: Sequence[float] = [], shift: bool = True, label: Sequence[str] = None, color: Sequence[str] = None, outfile: PathLike = 'band.png'):
+    def multiplot(cls, datafile: Sequence[PathLike], kptfile: str = '', efermi: Sequence[float] = [], energy_range: Sequence[float] = [], shift: bool = True, label: Sequence[str] = None, color: Sequence[str] = None, outfile: PathLike = 'band.png', cache: bool = True):
         """Plot more than two band structures using data file
 
         :params datafile: list of path of band date file 
@@ -179,10 +213,11 @@ class BandPlot:
         :params label: list of band labels, its length equals to `filename`
         :params color: list of band colors, its length equals to `filename`
         :params outfile: band picture file name. Default: 'band.png'
+        :params cache: use and write `.npy` cache of band data file. Default: True
         """
 
         fig, ax = plt.subplots()
-        kpt = read_kpt(kptfile)
+        kpt = _load(read_kpt, kptfile)
 
         if not efermi:
             efermi = [0.0 for i in range(len(datafile))]
@@ -194,7 +229,7 @@ class BandPlot:
         emin = -np.inf
         emax = np.inf
         for i, file in enumerate(datafile):
-            kpoints, energy = cls.read(file)
+            kpoints, energy = cls.read(file, cache)
             if shift:
                 vb, cb = cls.set_vcband(energy_minus_efermi(energy, efermi[i]))
                 energy_min = np.min(vb.band)
@@ -214,7 +249,8 @@ class BandPlot:
         index = kpt.label_special_k
         cls._set_figure(ax, index, energy_range)
 
-        plt.savefig(outfile)
+        fig.savefig(outfile)
+        plt.close(fig)
 
     @classmethod
     def bandgap(cls, vb: namedtuple, cb: namedtuple):
@@ -233,14 +269,7 @@ class BandPlot:
         """
 
         def band_type(vbm_x, cbm_x):
-            longone, shortone = (vbm_x, cbm_x) if len(
-                vbm_x) >= len(cbm_x) else (cbm_x, vbm_x)
-            for i in shortone:
-                if i in longone:
-                    btype = "Direct"
-                else:
-                    btype = "Indirect"
-            return btype
+            return "Direct" if np.intersect1d(vbm_x, cbm_x).size else "Indirect"
 
         gap = cls.bandgap(vb, cb)
         print(
@@ -331,48 +360,13 @@ class DosPlot:
         """
 
         if tdosfile:
-            dosdata = np.loadtxt(tdosfile)
+            dosdata = _load(np.loadtxt, tdosfile)
             nsplit = dosdata.shape[1]
             return np.split(dosdata, nsplit, axis=1)
 
         elif pdosfile:
-            def handle_data(data):
-                data.remove('')
-
-                def handle_elem(elem):
-                    elist = elem.split(' ')
-                    remove_empty(elist)  # `list` will be modified in function
-                    return elist
-                return list(map(handle_elem, data))
-
-            from lxml import etree
-            pdosdata = etree.parse(pdosfile)
-            root = pdosdata.getroot()
-            nspin = int(root.xpath('//nspin')[0].text.replace(' ', ''))
-            norbitals = int(root.xpath('//norbitals')[0].text.replace(' ', ''))
-            eunit = root.xpath('//energy_values/@units')[0].replace(' ', '')
-            e_list = root.xpath(
-                '//energy_values')[0].text.replace(' ', '').split('\n')
-            remove_empty(e_list)
-            orbitals = []
-            for i in range(norbitals):
-                orb = OrderedDict()
-                orb['index'] = int(root.xpath(
-                    '//orbital/@index')[i].replace(' ', ''))
-                orb['atom_index'] = int(root.xpath(
-                    '//orbital/@atom_index')[i].replace(' ', ''))
-                orb['species'] = root.xpath(
-                    '//orbital/@species')[i].replace(' ', '')
-                orb['l'] = int(root.xpath('//orbital/@l')[i].replace(' ', ''))
-                orb['m'] = int(root.xpath('//orbital/@m')[i].replace(' ', ''))
-                orb['z'] = int(root.xpath('//orbital/@z')[i].replace(' ', ''))
-                data = root.xpath('//data')[i].text.split('\n')
-                data = handle_data(data)
-                remove_empty(data)
-                orb['data'] = np.asarray(data, dtype=float)
-                orbitals.append(orb)
-
-            return np.reshape(e_list, newshape=(-1, 1)).astype(float), orbitals
+            pdos = _load(read_pdos, pdosfile)
+            return pdos.energy.reshape(-1, 1), pdos.orbital_dicts()
 
     @classmethod
     def _set_figure(cls, ax: axes.Axes, energy_range: Sequence, dos_range: Sequence):
@@ -428,12 +422,46 @@ class DosPlot:
         return ax, energy_range, dos_range
 
     @classmethod
-    def _all_sum(cls, orbitals: dict) -> Tuple[np.ndarray, int]:
-        nsplit = orbitals[0]["data"].shape[1]
-        res = np.zeros_like(orbitals[0]["data"], dtype=np.float32)
-        for orb in orbitals:
-            res = res + orb['data']
-        return res, nsplit
+    def _projections(cls, elements: Sequence[str], l: Sequence = []) -> Tuple[OrderedDict, List[List[str]]]:
+        """Return selections of each species and its angular momentum used in `PDOS.project`, and labels of each species panel
+
+        :params elements: list of atomic species
+        :params l: list of angular momentum of each species, list of l or dict of l and its m list
+        """
+
+        selections = OrderedDict()
+        panels = []
+        for i, elem in enumerate(elements):
+            selections[elem] = {"species": elem}
+            panel = []
+            if l and isinstance(l[i], dict):
+                for ang, mag in l[i].items():
+                    l_index = int(ang)
+                    for m_index in mag:
+                        label = f'{elem}-{get_angular_momentum_name(l_index, m_index)}'
+                        selections[label] = {
+                            "species": elem, "l": l_index, "m": m_index}
+                        panel.append(label)
+            elif l and isinstance(l[i], list):
+                for l_index in l[i]:
+                    label = f'{elem}-{get_angular_momentum_label(l_index)}'
+                    selections[label] = {"species": elem, "l": l_index}
+                    panel.append(label)
+            panels.append(panel)
+        return selections, panels
+
+    @classmethod
+    def _pplot(cls, ax: axes.Axes, energy: np.ndarray, dos: np.ndarray, label: str):
+        """Plot one projected DOS, spin down is plotted as negative values"""
+
+        if dos.shape[1] == 1:
+            ax.plot(energy, dos, lw=0.8, linestyle='-', label=label)
+        elif dos.shape[1] == 2:
+            dos_up, dos_dw = np.split(dos, 2, axis=1)
+            ax.plot(energy, dos_up, lw=0.8, linestyle="-",
+                    label=label+r"$\uparrow$")
+            ax.plot(energy, -dos_dw, lw=0.8, linestyle="--",
+                    label=label+r"$\downarrow$")
 
     @classmethod
     def plot(cls, tdosfile: PathLike = '', pdosfile: PathLike = '', efermi: float = 0, energy_range: Sequence[float] = [], dos_range: Sequence[float] = [], shift: bool = False, species: Union[Sequence[str], Dict[str, List[int]], Dict[str, Dict[str, List[int]]]] = [], tdosfig: PathLike = 'tdos.png', pdosfig:  PathLike = 'pdos.png', prec: float = 0.01):
@@ -449,15 +477,16 @@ class DosPlot:
         :params prec: dos below this value thought to be zero. Default: 0.01
         """
 
-        res = cls.read(tdosfile, pdosfile)
-
         if tdosfile:
+            res = cls.read(tdosfile)
             ax, energy_range, dos_range = cls._tplot(
                 res, efermi, energy_range, dos_range, shift, prec)
             cls._set_figure(ax, energy_range, dos_range)
-            plt.savefig(tdosfig)
+            ax.figure.savefig(tdosfig)
+            plt.close(ax.figure)
 
         elif pdosfile and species:
+            l = []
             if isinstance(species, (list, tuple)):
                 elements = species
             elif isinstance(species, dict):
@@ -466,10 +495,16 @@ class DosPlot:
             if not elements:
                 raise TypeError(
                     "Only when `pdosfile` and `species` are both set, it will plot PDOS.")
-            energy, orbitals = res
+            pdos = _load(read_pdos, pdosfile)
+            energy = pdos.energy.reshape(-1, 1)
+
+            # all projections are summed in one pass
+            selections, panels = cls._projections(elements, l)
+            projections = pdos.project(selections)
 
             # TDOS
-            dos, nsplit = cls._all_sum(orbitals)
+            dos = pdos.total()
+            nsplit = dos.shape[1]
             if shift:
                 vb, cb = cls.set_vcband(
                     energy_minus_efermi(energy, efermi), dos, prec)
@@ -485,71 +520,24 @@ class DosPlot:
                 ax, energy_range, dos_range = cls._tplot(
                     (energy, dos_up, dos_dw), efermi, energy_range, dos_range, shift, prec)
             for elem in elements:
-                dos = np.zeros_like(orbitals[0]["data"], dtype=np.float32)
-                for orb in orbitals:
-                    if orb["species"] == elem:
-                        dos += orb["data"]
-                if nsplit == 1:
-                    ax.plot(energy_f, dos, lw=0.8,
-                            linestyle='-', label=f'{elem}')
-                elif nsplit == 2:
-                    dos_up, dos_dw = np.split(dos, nsplit, axis=1)
-                    ax.plot(energy_f, dos_up, lw=0.8, linestyle="-",
-                            label=f"{elem}"+r"$\uparrow$")
-                    dos_dw = -dos_dw
-                    ax.plot(energy_f, dos_dw, lw=0.8, linestyle="--",
-                            label=f"{elem}"+r"$\downarrow$")
+                cls._pplot(ax, energy_f, projections[elem], elem)
 
             cls._set_figure(ax, energy_range, dos_range)
-            plt.savefig(tdosfig)
+            ax.figure.savefig(tdosfig)
+            plt.close(ax.figure)
 
             # PDOS
             if l:
                 fig, ax = plt.subplots(
                     len(elements), 1, sharex=True, sharey=True)
-                plt.xlabel(r"$E-E_{fermi}(eV)$")
                 if len(elements) == 1:
                     ax = [ax]
-                plt.subplots_adjust(hspace=0.2)
-                for i, elem in enumerate(elements):
-                    if isinstance(l[i], dict):
-                        for ang, mag in l[i].items():
-                            l_index = int(ang)
-                            for m_index in mag:
-                                dos = np.zeros_like(
-                                    orbitals[0]["data"], dtype=np.float32)
-                                for orb in orbitals:
-                                    if orb["species"] == elem and orb["l"] == l_index and orb["m"] == m_index:
-                                        dos += orb["data"]
-                                if nsplit == 1:
-                                    ax[i].plot(energy_f, dos, lw=0.8, linestyle='-',
-                                               label=f'{elem}-{get_angular_momentum_name(l_index, m_index)}')
-                                elif nsplit == 2:
-                                    dos_up, dos_dw = np.split(
-                                        dos, nsplit, axis=1)
-                                    ax[i].plot(energy_f, dos_up, lw=0.8, linestyle="-",
-                                               label=f"{elem}-{get_angular_momentum_name(l_index, m_index)}"+r"$\uparrow$")
-                                    dos_dw = -dos_dw
-                                    ax[i].plot(energy_f, dos_dw, lw=0.8, linestyle="--",
-                                               label=f"{elem}-{get_angular_momentum_name(l_index, m_index)}"+r"$\downarrow$")
-                    elif isinstance(l[i], list):
-                        for l_index in l[i]:
-                            dos = np.zeros_like(
-                                orbitals[0]["data"], dtype=np.float32)
-                            for orb in orbitals:
-                                if orb["species"] == elem and orb["l"] == l_index:
-                                    dos += orb["data"]
-                            if nsplit == 1:
-                                ax[i].plot(energy_f, dos, lw=0.8, linestyle='-',
-                                           label=f'{elem}-{get_angular_momentum_label(l_index)}')
-                            elif nsplit == 2:
-                                dos_up, dos_dw = np.split(dos, nsplit, axis=1)
-                                ax[i].plot(energy_f, dos_up, lw=0.8, linestyle="-",
-                                           label=f"{elem}-{get_angular_momentum_label(l_index)}"+r"$\uparrow$")
-                                dos_dw = -dos_dw
-                                ax[i].plot(energy_f, dos_dw, lw=0.8, linestyle="--",
-                                           label=f"{elem}-{get_angular_momentum_label(l_index)}"+r"$\downarrow$")
-
+                ax[-1].set_xlabel(r"$E-E_{fermi}(eV)$")
+                fig.subplots_adjust(hspace=0.2)
+                for i, panel in enumerate(panels):
+                    for label in panel:
+                        cls._pplot(ax[i], energy_f, projections[label], label)
                     cls._set_figure(ax[i], energy_range, dos_range)
 
-                plt.savefig(pdosfig)
+                fig.savefig(pdosfig)
+                plt.close(fig)
@@ -0,0 +1,184 @@
+'''
+Date: 2026-10-18 13:35:59
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:54:29
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence
+
+from abacuskit.utils.typings import *
+
+# data files of each type of plot job, jobs sharing one of them are rendered by the same worker
+DATA_KEYS = {"band": ["filename"], "dos": ["tdosfile", "pdosfile"]}
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def job_files(job: dict) -> List[str]:
+    """Return absolute paths of data files of a plot job
+
+    :params job: dict of plot job, `type` is 'band' or 'dos', other keys are the same as json file of `abacuskit show -b` or `abacuskit show -d`
+    """
+
+    files = []
+    for key in DATA_KEYS[job["type"]]:
+        value = job.get(key)
+        if not value:
+            continue
+        for filename in ([value] if isinstance(value, (str, PathLike)) else value):
+            files.append(os.path.abspath(filename))
+    return files
+
+
+def check_job(job: dict):
+    """Raise `KeyError` if `type` of plot job is missing or unknown
+
+    :params job: dict of plot job, see `job_files`
+    """
+
+    if not isinstance(job, dict) or job.get("type") not in DATA_KEYS:
+        kind = job.get("type") if isinstance(job, dict) else None
+        raise KeyError(
+            f"Unknown type `{kind}` of plot job, should be one of {list(DATA_KEYS)}")
+
+
+def group_jobs(jobs: Sequence[dict]) -> List[List[int]]:
+    """Split plot jobs into groups, jobs sharing data files are in the same group, invalid jobs are not grouped, see `check_job`
+
+    :params jobs: list of plot jobs
+    :return: list of indices of jobs in each group
+    """
+
+    parent = list(range(len(jobs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, job in enumerate(jobs):
+        try:
+            check_job(job)
+        except KeyError:
+            continue
+        for filename in job_files(job):
+            if filename in owner:
+                parent[find(i)] = find(owner[filename])
+            else:
+                owner[filename] = i
+
+    groups = {}
+    for i in range(len(jobs)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def render_job(job: dict) -> List[str]:
+    """Render figures of one plot job and return their file names
+
+    :params job: dict of plot job, see `job_files`
+    """
+
+    from abacuskit.postprocess.plot import BandPlot, DosPlot
+
+    check_job(job)
+    job = dict(job)
+    kind = job.pop("type")
+    if kind == "band":
+        filename = job["filename"]
+        kptfile = job["kptfile"]
+        efermi = job.pop("efermi", 0.0)
+        energy_range = job.pop("energy_range", [])
+        shift = job.pop("shift", False)
+        label = job.pop("label", None)
+        color = job.pop("color", None)
+        outfile = job.pop("outfile", "band.png")
+        cache = job.pop("cache", True)
+        if isinstance(filename, (str, PathLike)):
+            BandPlot.singleplot(filename, kptfile, efermi,
+                                energy_range, shift, label, color, outfile, cache)
+        else:
+            BandPlot.multiplot(filename, kptfile, efermi,
+                               energy_range, shift, label, color, outfile, cache)
+        return [outfile]
+    elif kind == "dos":
+        tdosfile = job.pop("tdosfile", '')
+        pdosfile = job.pop("pdosfile", '')
+        efermi = job.pop("efermi", 0.0)
+        energy_range = job.pop("energy_range", [])
+        dos_range = job.pop("dos_range", [])
+        shift = job.pop("shift", False)
+        species = job.pop("species", [])
+        tdosfig = job.pop("tdosfig", "tdos.png")
+        pdosfig = job.pop("pdosfig", "pdos.png")
+        prec = job.pop("prec", 0.01)
+        DosPlot.plot(tdosfile, pdosfile, efermi, energy_range,
+                     dos_range, shift, species, tdosfig, pdosfig, prec)
+        if tdosfile:
+            return [tdosfig]
+        elif pdosfile and species:
+            return [tdosfig, pdosfig] if isinstance(species, dict) else [tdosfig]
+        return []
+
+
+def _render_group(jobs: Sequence[dict]) -> list:
+    """Render plot jobs in one process, data files are read once and failures of one job do not stop others
+
+    :return: list of (figures, error message) of each job
+    """
+
+    import matplotlib.pyplot as plt
+    from abacuskit.postprocess.plot import shared_data
+
+    res = []
+    with shared_data():
+        for job in jobs:
+            opened = set(plt.get_fignums())
+            try:
+                res.append((render_job(job), None))
+            except Exception:
+                res.append(([], traceback.format_exc()))
+            finally:
+                # figures left by a failed job
+                for num in set(plt.get_fignums())-opened:
+                    plt.close(num)
+    return res
+
+
+def render(jobs: Sequence[dict], processes: int = None) -> list:
+    """Render figures of plot jobs in a process pool with the Agg backend
+
+    :params jobs: list of plot jobs, see `job_files`
+    :params processes: number of worker processes, render in this process if 1. Default: None, number of cores
+    :return: list of (figures, error message) of each job, error message is None if succeeded
+    """
+
+    groups = group_jobs(jobs)
+    res = [None for i in range(len(jobs))]
+    if processes == 1 or len(groups) <= 1:
+        # figures are only written to files, even if a display is available
+        _use_agg()
+        for group in groups:
+            for i, item in zip(group, _render_group([jobs[i] for i in group])):
+                res[i] = item
+        return res
+
+    processes = min(processes or os.cpu_count() or 1, len(groups))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_use_agg) as executor:
+        # large groups first, so that they do not finish last
+        groups = sorted(groups, key=len, reverse=True)
+        futures = [executor.submit(
+            _render_group, [jobs[i] for i in group]) for group in groups]
+        for group, future in zip(groups, futures):
+            for i, item in zip(group, future.result()):
+                res[i] = item
+    return res
@@ -5,7 +5,9 @@ LastEditTime: 2021-04-28 19:00:25
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
-from enum import IntEnum
+import re
+import shlex
+from enum import Enum, IntEnum
 
 
 class Code:
@@ -51,6 +53,25 @@ class Code:
 
         return output_string
 
+    def argv(self):
+        """Return argument list to execute without shell, standard streams are not included"""
+
+        args = []
+        for param in self.cmdline_params:
+            args.extend(shlex.split(param))
+        if self.withmpi:
+            args = shlex.split(self.withmpi)+args+[str(self.code_name)]
+        return args
+
+    @property
+    def mpiprocs(self):
+        """Return number of MPI processes set by `-np N` or `-n N` in `cmdline_params`, 1 if not found"""
+
+        if not self.withmpi:
+            return 1
+        match = re.search(r"(?:^|\s)--?np?[\s=]+(\d+)", ' '.join(self.cmdline_params))
+        return int(match.group(1)) if match else 1
+
 
 class CodeRunMode(IntEnum):
     """Enum to indicate the way the codes of a calculation should be run.
@@ -72,6 +93,52 @@ class CodeRunMode(IntEnum):
     PARALLEL = 1
 
 
+class JobState(Enum):
+    """Enum of job states reported by schedulers"""
+
+    UNDETERMINED = 'undetermined'
+    QUEUED = 'queued'
+    QUEUED_HELD = 'queued held'
+    RUNNING = 'running'
+    SUSPENDED = 'suspended'
+    DONE = 'done'
+
+
+class JobInfo:
+    def __init__(self,
+                 job_id,
+                 job_state=JobState.UNDETERMINED,
+                 job_owner=None,
+                 title=None,
+                 wallclock_time=None,
+                 raw_state=None
+                 ):
+        """
+        params: job_id: string of job id, array tasks are `parent_id` followed by task index, e.g. '123_4' or '123[4]'
+        params: job_state: `JobState` of the job
+        params: job_owner: (optional) user who submitted the job
+        params: title: (optional) name of the job
+        params: wallclock_time: (optional) string of elapsed wall clock time reported by scheduler
+        params: raw_state: (optional) state string reported by scheduler
+        """
+
+        self.job_id = job_id
+        self.job_state = job_state
+        self.job_owner = job_owner
+        self.title = title
+        self.wallclock_time = wallclock_time
+        self.raw_state = raw_state
+
+    def __repr__(self):
+        return f"JobInfo(job_id={self.job_id!r}, job_state={self.job_state.name})"
+
+    @property
+    def parent_id(self):
+        """Return id of the submitted job, which is different from `job_id` only for array tasks"""
+
+        return re.sub(r'_(\[[^\]]*\]|\d+)$|\[[^\]]*\]', '', self.job_id)
+
+
 class JobDefaultFields:
     def __init__(self,
                  shebang=None,
@@ -98,7 +165,8 @@ class JobDefaultFields:
                  append_text=None,
                  import_sys_environment=None,
                  codes_run_mode=None,
-                 codes_info=None
+                 codes_info=None,
+                 job_array=None
                  ):
 
         # The first line of the submission script.
@@ -151,3 +219,5 @@ class JobDefaultFields:
         self.codes_run_mode = codes_run_mode
         # sets which the (multiple) codes have to be executed.
         self.codes_info = codes_info
+        # a list of folders, if set, one array job is submitted and each array task runs the codes in one folder.
+        self.job_array = job_array
@@ -0,0 +1,181 @@
+'''
+Date: 2026-10-18 13:03:30
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:03:30
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import os
+import signal
+import subprocess
+import threading
+import time
+import typing
+from pathlib import Path
+
+from abacuskit.schedulers.data import Code
+from abacuskit.utils.typings import *
+
+
+class ExecResult:
+    """Result of an executed command"""
+
+    def __init__(self, returncode: int = None, wall_time: float = 0.0, cpu_time: float = 0.0, max_rss_kb: int = 0, timed_out: bool = False) -> None:
+        """
+        params: returncode: exit code of the command, negative value `-N` means it was killed by signal `N`
+        params: wall_time: wall-clock time in seconds
+        params: cpu_time: user and system CPU time of the command and all its waited-for descendants in seconds
+        params: max_rss_kb: maximum resident set size of the command or its largest descendant in kilobytes
+        params: timed_out: whether the command was killed because it exceeded its timeout
+        """
+
+        self.returncode = returncode
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.max_rss_kb = max_rss_kb
+        self.timed_out = timed_out
+
+    def __repr__(self) -> str:
+        return f"ExecResult(returncode={self.returncode}, wall_time={self.wall_time:.2f}, cpu_time={self.cpu_time:.2f}, max_rss_kb={self.max_rss_kb}, timed_out={self.timed_out})"
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    def to_dict(self) -> dict:
+        return {"returncode": self.returncode, "wall_time": self.wall_time, "cpu_time": self.cpu_time,
+                "max_rss_kb": self.max_rss_kb, "timed_out": self.timed_out}
+
+
+class ExecHandle:
+    """Non-blocking handle of a command running in its own process group"""
+
+    def __init__(self, command: Command, cwd: str_PathLike = None, env: dict = None, timeout: float = None, kill_after: float = 10.0) -> None:
+        """Start command
+
+        :params command: string of command line, run by shell, or `abacuskit.schedulers.data.Code` object, run without shell and its standard streams redirected to files in `cwd`
+        :params cwd: working directory of command. Default: None, current directory
+        :params env: environment variables updated on top of `os.environ`. Default: None
+        :params timeout: wall-clock time limit in seconds, process group of the command is terminated beyond it. Default: None, no limit
+        :params kill_after: seconds to wait after SIGTERM before sending SIGKILL. Default: 10
+        """
+
+        self.command = command
+        self.cwd = Path(cwd) if cwd else Path.cwd()
+        self.timeout = timeout
+        self.kill_after = kill_after
+        self.result = ExecResult()
+        self._done = threading.Event()
+        self._files = []
+
+        environ = os.environ.copy()
+        if env:
+            environ.update({key: str(value) for key, value in env.items()})
+        if isinstance(command, Code):
+            args, shell = command.argv(), False
+            stdin, stdout, stderr = self._open_streams(command)
+        else:
+            args, shell = command, True
+            stdin, stdout, stderr = None, None, None
+
+        self._start = time.monotonic()
+        try:
+            self.process = subprocess.Popen(args, shell=shell, cwd=self.cwd, env=environ, stdin=stdin,
+                                            stdout=stdout, stderr=stderr, start_new_session=True)
+        except OSError:
+            self._close_streams()
+            raise
+        self._timer = threading.Timer(
+            timeout, self._expire) if timeout else None
+        if self._timer:
+            self._timer.daemon = True
+            self._timer.start()
+        self._waiter = threading.Thread(target=self._wait4, daemon=True)
+        self._waiter.start()
+
+    def _open_streams(self, code: Code) -> tuple:
+        def open_file(name, mode):
+            file = open(self.cwd/name, mode)
+            self._files.append(file)
+            return file
+        stdin = open_file(code.stdin_name, 'rb') if code.stdin_name else None
+        stdout = open_file(code.stdout_name,
+                           'wb') if code.stdout_name else None
+        if code.join_files:
+            stderr = subprocess.STDOUT
+        else:
+            stderr = open_file(code.stderr_name,
+                               'wb') if code.stderr_name else None
+        return stdin, stdout, stderr
+
+    def _close_streams(self):
+        for file in self._files:
+            file.close()
+        self._files = []
+
+    def _wait4(self):
+        """Reap the process and collect its resource usage"""
+
+        _, status, rusage = os.wait4(self.process.pid, 0)
+        self.result.wall_time = time.monotonic()-self._start
+        self.result.returncode = os.waitstatus_to_exitcode(status)
+        self.result.cpu_time = rusage.ru_utime+rusage.ru_stime
+        self.result.max_rss_kb = rusage.ru_maxrss
+        # process is reaped here, keep `Popen` from waiting on it again
+        self.process.returncode = self.result.returncode
+        if self._timer:
+            self._timer.cancel()
+        self._close_streams()
+        self._done.set()
+
+    def _signal(self, sig: int):
+        try:
+            os.killpg(self.process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _expire(self):
+        self.result.timed_out = True
+        self.cancel()
+
+    def cancel(self):
+        """Terminate the whole process group, kill it if still alive after `kill_after` seconds"""
+
+        if self._done.is_set():
+            return
+        self._signal(signal.SIGTERM)
+        if not self._done.wait(self.kill_after):
+            self._signal(signal.SIGKILL)
+
+    def poll(self) -> typing.Optional[ExecResult]:
+        """Return `ExecResult` if command is finished, otherwise None"""
+
+        return self.result if self._done.is_set() else None
+
+    def wait(self, timeout: float = None) -> typing.Optional[ExecResult]:
+        """Wait for command to finish
+
+        :params timeout: seconds to wait, it does not stop the command. Default: None, wait until finished
+        :return: `ExecResult` if finished, otherwise None
+        """
+
+        self._done.wait(timeout)
+        return self.poll()
+
+
+def submit(command: Command, cwd: str_PathLike = None, env: dict = None, timeout: float = None) -> ExecHandle:
+    """Start command without waiting for it, see `ExecHandle`"""
+
+    return ExecHandle(command, cwd, env, timeout)
+
+
+def execute(command: Command, cwd: str_PathLike = None, env: dict = None, timeout: float = None) -> ExecResult:
+    """Execute command and wait for it, see `ExecHandle`"""
+
+    return submit(command, cwd, env, timeout).wait()
+
+
+def wait_all(handles: typing.Sequence[ExecHandle]) -> typing.List[ExecResult]:
+    """Wait for all handles and return their results in order"""
+
+    return [handle.wait() for handle in handles]
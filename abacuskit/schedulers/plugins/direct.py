@@ -5,6 +5,7 @@ LastEditTime: 2021-04-23 16:47:06
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+from abacuskit.schedulers.data import JobInfo, JobState
 from abacuskit.schedulers.datastructure import NodeNumberJobResource
 from abacuskit.schedulers.schedulers import Scheduler
 
@@ -18,6 +19,19 @@ class DirectScheduler(Scheduler):
     Support for the direct execution bypassing schedulers.
     """
 
+    # process state codes of ps
+    _map_status = {
+        'D': JobState.RUNNING,
+        'I': JobState.RUNNING,
+        'R': JobState.RUNNING,
+        'S': JobState.RUNNING,
+        'T': JobState.SUSPENDED,
+        't': JobState.SUSPENDED,
+        'W': JobState.RUNNING,
+        'X': JobState.DONE,
+        'Z': JobState.DONE,
+    }
+
     def _get_submit_script_header(self, job_tmpl):
         """
         Return the submit script header
@@ -26,6 +40,10 @@ class DirectScheduler(Scheduler):
         lines = []
         empty_line = ''
 
+        if job_tmpl.job_array:
+            raise ValueError(
+                'Job array is not supported when bypassing schedulers')
+
         if job_tmpl.sched_output_path:
             lines.append(f'exec > {job_tmpl.sched_output_path}')
 
@@ -79,3 +97,44 @@ class DirectScheduler(Scheduler):
         submit_command = f'bash -e {submit_script} > /dev/null 2>&1 & echo $!'
 
         return submit_command
+
+    def _get_joblist_command(self, jobs=None, user=None):
+        """
+        Return the ps command listing pid, state, owner, elapsed time and name of processes.
+        """
+        command = ['ps', '-o pid=,stat=,user=,etime=,comm=']
+        if jobs:
+            command.append(f"-p {','.join(str(job) for job in jobs)}")
+        else:
+            command.append(f"-U {user or '$USER'}")
+
+        return ' '.join(command)
+
+    def _parse_joblist_output(self, retval, stdout, stderr):
+        """
+        Parse the output of ps, it exits with code 1 if no process is listed.
+        """
+        if retval not in (0, 1) or stderr.strip():
+            raise RuntimeError(
+                f'ps exited with code {retval}: {stderr.strip()}')
+
+        job_infos = {}
+        for line in stdout.splitlines():
+            items = line.split(None, 4)
+            if len(items) < 4:
+                continue
+            job_id, raw_state, owner, time = items[:4]
+            job_infos[job_id] = JobInfo(job_id, self._map_status.get(raw_state[0], JobState.UNDETERMINED),
+                                        owner, items[4] if len(items) > 4 else None, time, raw_state)
+
+        return job_infos
+
+    def _parse_submit_output(self, retval, stdout, stderr):
+        """
+        Return pid of the submit script run in background.
+        """
+        if retval != 0 or not stdout.strip().isdigit():
+            raise RuntimeError(
+                f'submission exited with code {retval}: {stderr.strip()}')
+
+        return stdout.strip()
@@ -5,6 +5,9 @@ LastEditTime: 2021-04-23 16:47:25
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+import re
+
+from abacuskit.schedulers.data import JobInfo, JobState
 from abacuskit.schedulers.datastructure import JobResource
 from abacuskit.schedulers.schedulers import Scheduler
 
@@ -63,6 +66,40 @@ class LsfScheduler(Scheduler):
     'https://www-01.ibm.com/support/knowledgecenter/SSETD4_9.1.2/lsf_welcome.html'
     """
 
+    _array_index_variable = 'LSB_JOBINDEX'
+    _array_index_offset = 1
+    # job states of bjobs
+    _map_status = {
+        'PEND': JobState.QUEUED,
+        'PROV': JobState.QUEUED,
+        'PSUSP': JobState.QUEUED_HELD,
+        'USUSP': JobState.SUSPENDED,
+        'SSUSP': JobState.SUSPENDED,
+        'RUN': JobState.RUNNING,
+        'DONE': JobState.DONE,
+        'EXIT': JobState.DONE,
+        'UNKWN': JobState.UNDETERMINED,
+        'WAIT': JobState.QUEUED,
+        'ZOMBI': JobState.UNDETERMINED,
+    }
+
+    def _get_job_title(self, job_tmpl):
+        """
+        Return job name allowed by LSF.
+        """
+        import string
+
+        job_title = re.sub(r'[^a-zA-Z0-9_.-]+', '', job_tmpl.job_name or '')
+        if not job_title or (job_title[0] not in string.ascii_letters + string.digits):
+            job_title = f'j{job_title}'
+        return job_title[:128]
+
+    def _get_job_array_header(self, job_tmpl):
+        """
+        Return the header line of array job, LSF array is set by job name and its indices start from 1.
+        """
+        return f'#BSUB -J "{self._get_job_title(job_tmpl)}[1-{len(job_tmpl.job_array)}]"'
+
     def _get_submit_script_header(self, job_tmpl):
         """
         Return the submit script header. See the following manual
@@ -71,9 +108,6 @@ class LsfScheduler(Scheduler):
         the parallel environment definition (with the -m option).
         """
 
-        import re
-        import string
-
         empty_line = ''
 
         lines = []
@@ -93,12 +127,10 @@ class LsfScheduler(Scheduler):
         if job_tmpl.email_on_terminated:
             lines.append('#BSUB -N')
 
-        if job_tmpl.job_name:
-            job_title = re.sub(r'[^a-zA-Z0-9_.-]+', '', job_tmpl.job_name)
-            if not job_title or (job_title[0] not in string.ascii_letters + string.digits):
-                job_title = f'j{job_title}'
-            job_title = job_title[:128]
-            lines.append(f'#BSUB -J "{job_title}"')
+        if job_tmpl.job_array:
+            lines.append(self._get_job_array_header(job_tmpl))
+        elif job_tmpl.job_name:
+            lines.append(f'#BSUB -J "{self._get_job_title(job_tmpl)}"')
 
         if not job_tmpl.import_sys_environment:
             print('LSF scheduler cannot ignore the user environment', flush=True)
@@ -215,3 +247,48 @@ fi
         submit_command = f'bsub < {submit_script}'
 
         return submit_command
+
+    def _get_joblist_command(self, jobs=None, user=None):
+        """
+        Return the bjobs command listing id, array index, state, owner, run time and name of jobs, separated by '|'.
+        """
+        command = ['bjobs', '-noheader',
+                   "-o 'jobid jobindex stat user run_time job_name delimiter=\"|\"'"]
+        if user:
+            command.append(f'-u {user}')
+        if jobs:
+            command.extend(str(job) for job in jobs)
+
+        return ' '.join(command)
+
+    def _parse_joblist_output(self, retval, stdout, stderr):
+        """
+        Parse the output of bjobs, tasks of array job have the same id and different index.
+        Jobs cleaned from bjobs history make it print 'Job <123> is not found' and exit with nonzero code.
+        """
+        if retval != 0 and 'is not found' not in stderr:
+            raise RuntimeError(
+                f'bjobs exited with code {retval}: {stderr.strip()}')
+
+        job_infos = {}
+        for line in stdout.splitlines():
+            if '|' not in line:
+                continue
+            job_id, index, raw_state, owner, time, title = line.strip().split('|', 5)
+            if index.strip() not in ('', '0', '-'):
+                job_id = f'{job_id}[{index.strip()}]'
+            job_infos[job_id] = JobInfo(job_id, self._map_status.get(raw_state, JobState.UNDETERMINED),
+                                        owner, title, time, raw_state)
+
+        return job_infos
+
+    def _parse_submit_output(self, retval, stdout, stderr):
+        """
+        Return job id from output of bsub, 'Job <123> is submitted to queue <normal>.'.
+        """
+        match = re.search(r'Job <(\d+)> is submitted', stdout)
+        if retval != 0 or not match:
+            raise RuntimeError(
+                f'bsub exited with code {retval}: {stderr.strip() or stdout.strip()}')
+
+        return match.group(1)
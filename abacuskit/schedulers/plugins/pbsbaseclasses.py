@@ -5,6 +5,7 @@ LastEditTime: 2021-06-11 19:46:03
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+from abacuskit.schedulers.data import JobInfo, JobState
 from abacuskit.schedulers.datastructure import NodeNumberJobResource
 from abacuskit.schedulers.schedulers import Scheduler
 
@@ -51,6 +52,23 @@ class PbsBaseClass(Scheduler):
     (http://www.adaptivecomputing.com/products/open-source/torque/).
     """
 
+    # job states of qstat, 'B' is an array job with at least one subjob begun, 'C' is completed job of Torque
+    _map_status = {
+        'B': JobState.RUNNING,
+        'E': JobState.RUNNING,
+        'F': JobState.DONE,
+        'H': JobState.QUEUED_HELD,
+        'M': JobState.DONE,
+        'Q': JobState.QUEUED,
+        'R': JobState.RUNNING,
+        'S': JobState.SUSPENDED,
+        'T': JobState.QUEUED,
+        'U': JobState.SUSPENDED,
+        'W': JobState.QUEUED,
+        'X': JobState.DONE,
+        'C': JobState.DONE,
+    }
+
     def _get_resource_lines(
         self, num_machines, num_mpiprocs_per_machine, num_cores_per_machine, max_memory_kb, max_wallclock_seconds
     ):
@@ -113,6 +131,9 @@ class PbsBaseClass(Scheduler):
             job_title = job_title[:15]
             lines.append(f'#PBS -N {job_title}')
 
+        if job_tmpl.job_array:
+            lines.append(self._get_job_array_header(job_tmpl))
+
         if job_tmpl.import_sys_environment:
             lines.append('#PBS -V')
 
@@ -187,3 +208,55 @@ class PbsBaseClass(Scheduler):
         submit_command = f'qsub {submit_script}'
 
         return submit_command
+
+    def _get_joblist_command(self, jobs=None, user=None):
+        """
+        Return the qstat command listing full information of jobs.
+        """
+        command = ['qstat', '-f']
+        if user:
+            command.append(f'-u {user}')
+        if jobs:
+            command.extend(str(job) for job in jobs)
+
+        return ' '.join(command)
+
+    def _parse_joblist_output(self, retval, stdout, stderr):
+        """
+        Parse the output of `qstat -f`, which is a block of 'key = value' lines for each job.
+        Finished jobs in the job list make qstat print 'Unknown Job Id' and exit with nonzero code.
+        """
+        if retval != 0 and 'Unknown Job Id' not in stderr and 'Job has finished' not in stderr:
+            raise RuntimeError(
+                f'qstat exited with code {retval}: {stderr.strip()}')
+
+        job_infos = {}
+        info = None
+        for line in stdout.splitlines():
+            if line.startswith('Job Id:'):
+                job_id = line.split(':', 1)[1].strip()
+                info = job_infos[job_id] = JobInfo(job_id)
+            elif info is not None and '=' in line and not line.startswith('\t'):
+                key, value = (item.strip() for item in line.split('=', 1))
+                if key == 'job_state':
+                    info.raw_state = value
+                    info.job_state = self._map_status.get(
+                        value, JobState.UNDETERMINED)
+                elif key == 'Job_Owner':
+                    info.job_owner = value.split('@')[0]
+                elif key == 'Job_Name':
+                    info.title = value
+                elif key == 'resources_used.walltime':
+                    info.wallclock_time = value
+
+        return job_infos
+
+    def _parse_submit_output(self, retval, stdout, stderr):
+        """
+        Return job id from output of qsub, which is the job id itself.
+        """
+        if retval != 0 or not stdout.strip():
+            raise RuntimeError(
+                f'qsub exited with code {retval}: {stderr.strip()}')
+
+        return stdout.strip().splitlines()[0].strip()
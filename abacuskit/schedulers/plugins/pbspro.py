@@ -14,6 +14,15 @@ class PbsproScheduler(PbsBaseClass):
     (http://www.pbsworks.com/).
     """
 
+    _array_index_variable = 'PBS_ARRAY_INDEX'
+    _array_index_offset = 0
+
+    def _get_job_array_header(self, job_tmpl):
+        """
+        Return the header line of array job, task indices start from 0.
+        """
+        return f'#PBS -J 0-{len(job_tmpl.job_array)-1}'
+
     def _get_resource_lines(self, num_machines, num_mpiprocs_per_machine, num_cores_per_machine, max_memory_kb, max_wallclock_seconds):
         """
         Return the lines for machines, memory and wallclock relative to pbspro.
@@ -5,6 +5,9 @@ LastEditTime: 2021-04-23 16:47:37
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+import xml.etree.ElementTree as ET
+
+from abacuskit.schedulers.data import JobInfo, JobState
 from abacuskit.schedulers.datastructure import ParEnvJobResource
 from abacuskit.schedulers.schedulers import Scheduler
 
@@ -18,6 +21,15 @@ class SgeScheduler(Scheduler):
     Support for the Sun Grid Engine scheduler and its variants/forks (Son of Grid Engine, Oracle Grid Engine, ...)
     """
 
+    _array_index_variable = 'SGE_TASK_ID'
+    _array_index_offset = 1
+
+    def _get_job_array_header(self, job_tmpl):
+        """
+        Return the header line of array job, SGE task indices start from 1.
+        """
+        return f'#$ -t 1-{len(job_tmpl.job_array)}'
+
     def _get_submit_script_header(self, job_tmpl):
         """
         Return the submit script header
@@ -74,6 +86,9 @@ class SgeScheduler(Scheduler):
 
             lines.append(f'#$ -N {job_tmpl.job_name}')
 
+        if job_tmpl.job_array:
+            lines.append(self._get_job_array_header(job_tmpl))
+
         if job_tmpl.import_sys_environment:
             lines.append('#$ -V')
 
@@ -155,3 +170,62 @@ class SgeScheduler(Scheduler):
         submit_command = f'qsub -terse {submit_script}'
 
         return submit_command
+
+    def _get_joblist_command(self, jobs=None, user=None):
+        """
+        Return the qstat command listing jobs of `user` in XML, qstat of SGE can not list jobs by id.
+        """
+        return f"qstat -xml -u {user or '$USER'}"
+
+    def _get_job_state(self, raw_state):
+        """
+        Return `JobState` from combined state letters of SGE, e.g. 'qw', 'hqw', 'Eqw', 'dr'.
+        """
+        if 'E' in raw_state:
+            return JobState.UNDETERMINED
+        if 'd' in raw_state:
+            return JobState.DONE
+        if 'h' in raw_state:
+            return JobState.QUEUED_HELD
+        if set('sST') & set(raw_state):
+            return JobState.SUSPENDED
+        if set('rtR') & set(raw_state):
+            return JobState.RUNNING
+        if 'q' in raw_state or 'w' in raw_state:
+            return JobState.QUEUED
+        return JobState.UNDETERMINED
+
+    def _parse_joblist_output(self, retval, stdout, stderr):
+        """
+        Parse the XML output of qstat, each task of array job is an element with `tasks`.
+        """
+        if retval != 0:
+            raise RuntimeError(
+                f'qstat exited with code {retval}: {stderr.strip()}')
+
+        try:
+            root = ET.fromstring(stdout)
+        except ET.ParseError as e:
+            raise RuntimeError(f'qstat output is not valid XML: {e}')
+
+        job_infos = {}
+        for element in root.iter('job_list'):
+            job_id = element.findtext('JB_job_number', '').strip()
+            tasks = element.findtext('tasks')
+            if tasks:
+                job_id = f'{job_id}[{tasks.strip()}]'
+            raw_state = element.findtext('state', '').strip()
+            job_infos[job_id] = JobInfo(job_id, self._get_job_state(raw_state), element.findtext('JB_owner'),
+                                        element.findtext('JB_name'), element.findtext('JAT_start_time'), raw_state)
+
+        return job_infos
+
+    def _parse_submit_output(self, retval, stdout, stderr):
+        """
+        Return job id from output of `qsub -terse`, which is '123' or '123.1-10:1' for array job.
+        """
+        if retval != 0 or not stdout.strip():
+            raise RuntimeError(
+                f'qsub exited with code {retval}: {stderr.strip()}')
+
+        return stdout.strip().split('.')[0]
@@ -5,6 +5,9 @@ LastEditTime: 2021-04-23 16:47:57
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+import re
+
+from abacuskit.schedulers.data import JobInfo, JobState
 from abacuskit.schedulers.datastructure import NodeNumberJobResource
 from abacuskit.schedulers.schedulers import Scheduler
 
@@ -56,6 +59,42 @@ class SlurmScheduler(Scheduler):
     Support for the SLURM scheduler (http://slurm.schedmd.com/).
     """
 
+    _array_index_variable = 'SLURM_ARRAY_TASK_ID'
+    _array_index_offset = 0
+    # job state codes of squeue, see https://slurm.schedmd.com/squeue.html#lbAG
+    _map_status = {
+        'PD': JobState.QUEUED,
+        'CF': JobState.QUEUED,
+        'RQ': JobState.QUEUED,
+        'RF': JobState.QUEUED,
+        'RH': JobState.QUEUED_HELD,
+        'RS': JobState.QUEUED_HELD,
+        'R': JobState.RUNNING,
+        'CG': JobState.RUNNING,
+        'SO': JobState.RUNNING,
+        'SI': JobState.RUNNING,
+        'RD': JobState.QUEUED_HELD,
+        'RV': JobState.RUNNING,
+        'S': JobState.SUSPENDED,
+        'ST': JobState.SUSPENDED,
+        'CD': JobState.DONE,
+        'CA': JobState.DONE,
+        'F': JobState.DONE,
+        'TO': JobState.DONE,
+        'NF': JobState.DONE,
+        'PR': JobState.DONE,
+        'BF': JobState.DONE,
+        'DL': JobState.DONE,
+        'OOM': JobState.DONE,
+        'SE': JobState.DONE,
+    }
+
+    def _get_job_array_header(self, job_tmpl):
+        """
+        Return the header line of array job, task indices start from 0.
+        """
+        return f'#SBATCH --array=0-{len(job_tmpl.job_array)-1}'
+
     def _get_submit_script_header(self, job_tmpl):
         """
         Return the submit script header, using the parameters from the job_tmpl.
@@ -90,6 +129,9 @@ class SlurmScheduler(Scheduler):
             job_title = job_title[:128]
             lines.append(f'#SBATCH --job-name="{job_title}"')
 
+        if job_tmpl.job_array:
+            lines.append(self._get_job_array_header(job_tmpl))
+
         if job_tmpl.import_sys_environment:
             lines.append('#SBATCH --get-user-env')
 
@@ -211,3 +253,48 @@ class SlurmScheduler(Scheduler):
         submit_command = f'sbatch {submit_script}'
 
         return submit_command
+
+    def _get_joblist_command(self, jobs=None, user=None):
+        """
+        Return the squeue command listing id, state, owner, elapsed time and name of jobs, separated by '|'.
+        """
+        command = ["squeue", "--noheader", "-o '%i|%t|%u|%M|%j'"]
+        if jobs:
+            command.append(f"--jobs={','.join(str(job) for job in jobs)}")
+        if user:
+            command.append(f"-u {user}")
+        elif not jobs:
+            command.append("-u $USER")
+
+        return ' '.join(command)
+
+    def _parse_joblist_output(self, retval, stdout, stderr):
+        """
+        Parse the output of squeue, a job list with only finished jobs makes squeue fail with 'Invalid job id specified'.
+        """
+        if retval != 0:
+            if 'Invalid job id specified' in stderr:
+                return {}
+            raise RuntimeError(
+                f'squeue exited with code {retval}: {stderr.strip()}')
+
+        job_infos = {}
+        for line in stdout.splitlines():
+            if not line.strip():
+                continue
+            job_id, raw_state, owner, time, title = line.strip().split('|', 4)
+            job_infos[job_id] = JobInfo(job_id, self._map_status.get(raw_state, JobState.UNDETERMINED),
+                                        owner, title, time, raw_state)
+
+        return job_infos
+
+    def _parse_submit_output(self, retval, stdout, stderr):
+        """
+        Return job id from output of sbatch, 'Submitted batch job 123'.
+        """
+        match = re.search(r'Submitted batch job\s+(\d+)', stdout)
+        if retval != 0 or not match:
+            raise RuntimeError(
+                f'sbatch exited with code {retval}: {stderr.strip() or stdout.strip()}')
+
+        return match.group(1)
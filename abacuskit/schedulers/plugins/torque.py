@@ -12,6 +12,15 @@ class TorqueScheduler(PbsBaseClass):
     Subclass to support the Torque scheduler..
     """
 
+    _array_index_variable = 'PBS_ARRAYID'
+    _array_index_offset = 0
+
+    def _get_job_array_header(self, job_tmpl):
+        """
+        Return the header line of array job, task indices start from 0.
+        """
+        return f'#PBS -t 0-{len(job_tmpl.job_array)-1}'
+
     def _get_resource_lines(
         self, num_machines, num_mpiprocs_per_machine, num_cores_per_machine, max_memory_kb, max_wallclock_seconds
     ):
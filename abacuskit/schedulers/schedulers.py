@@ -6,15 +6,29 @@ Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
 import abc
+import subprocess
+from collections import defaultdict
 
-from abacuskit.schedulers.data import CodeRunMode, JobDefaultFields
+from abacuskit.schedulers.data import (CodeRunMode, JobDefaultFields, JobInfo,
+                                       JobState)
 
 
 class Scheduler(abc.ABC):
 
+    # environment variable of array task index and index of the first task
+    _array_index_variable = None
+    _array_index_offset = 0
+    # map from job state strings of scheduler to `JobState`
+    _map_status = {}
+
     def __str__(self):
         return self.__class__.__name__
 
+    @property
+    def supports_job_array(self):
+        """Whether `JobDefaultFields.job_array` can be submitted as one array job"""
+        return self._array_index_variable is not None
+
     def get_submit_script(self, job_tmpl):
         """Return the submit script as a string"""
 
@@ -34,6 +48,10 @@ class Scheduler(abc.ABC):
         script_lines.append(self._get_submit_script_header(job_tmpl))
         script_lines.append(empty_line)
 
+        if job_tmpl.job_array:
+            script_lines.append(self._get_job_array_lines(job_tmpl))
+            script_lines.append(empty_line)
+
         if job_tmpl.prepend_text:
             script_lines.append(job_tmpl.prepend_text)
             script_lines.append(empty_line)
@@ -57,6 +75,33 @@ class Scheduler(abc.ABC):
     def _get_submit_script_header(self, job_tmpl):
         """Return the submit script header"""
 
+    def _get_job_array_header(self, job_tmpl):
+        """Return the header line to submit `job_tmpl.job_array` as one array job"""
+
+        raise NotImplementedError(f'{self} does not support job array')
+
+    def _get_job_array_lines(self, job_tmpl):
+        """Return lines changing into the folder of the current array task, its stdout and stderr are written in that folder
+
+        :param job_tmpl: `JobDefaultFields` object, the i-th array task runs in the i-th folder of `job_tmpl.job_array`
+        """
+
+        lines = ['folders=(']
+        for folder in job_tmpl.job_array:
+            lines.append(f'    "{folder}"')
+        lines.append(')')
+        lines.append(
+            f'cd "${{folders[$(( ${self._array_index_variable} - {self._array_index_offset} ))]}}"')
+        # all array tasks share the output files set in header, so each task has its own files in its folder
+        if job_tmpl.sched_output_path:
+            lines.append(f'exec > {job_tmpl.sched_output_path}')
+        if job_tmpl.sched_join_files:
+            lines.append('exec 2>&1')
+        elif job_tmpl.sched_error_path:
+            lines.append(f'exec 2> {job_tmpl.sched_error_path}')
+
+        return '\n'.join(lines)
+
     def _get_submit_script_footer(self, job_tmpl):
         """Return the submit script final part"""
         return None
@@ -87,3 +132,75 @@ class Scheduler(abc.ABC):
         :param submit_script: the path of the submit script relative to the working directory.
         :return: the string to execute to submit a given script.
         """
+
+    def _get_joblist_command(self, jobs=None, user=None):
+        """Return the command to list states of many jobs at once.
+
+        :param jobs: list of job ids. Default: None, all jobs of `user`
+        :param user: user name. Default: None, current user
+        :return: the string of command
+        """
+
+        raise NotImplementedError(f'{self} does not support job list')
+
+    def _parse_joblist_output(self, retval, stdout, stderr):
+        """Parse output of the command returned by `_get_joblist_command`.
+
+        :param retval: exit code of the command
+        :param stdout: string of standard output
+        :param stderr: string of standard error
+        :return: dict, key is job id and value is `JobInfo` object
+        :raises RuntimeError: if the command failed
+        """
+
+        raise NotImplementedError(f'{self} does not support job list')
+
+    def _parse_submit_output(self, retval, stdout, stderr):
+        """Parse output of the command returned by `_get_submit_command`.
+
+        :param retval: exit code of the command
+        :param stdout: string of standard output
+        :param stderr: string of standard error
+        :return: string of job id
+        :raises RuntimeError: if the submission failed
+        """
+
+        raise NotImplementedError(f'{self} does not support parsing submit output')
+
+    def submit(self, submit_command, cwd=None):
+        """Execute the submit command and return the job id.
+
+        :param submit_command: the string returned by `_get_submit_command`
+        :param cwd: working directory of submission. Default: None, current directory
+        """
+
+        process = subprocess.run(
+            submit_command, shell=True, cwd=cwd, capture_output=True, text=True)
+        return self._parse_submit_output(process.returncode, process.stdout, process.stderr)
+
+    def get_jobs(self, jobs=None, user=None):
+        """Return states of jobs by one call of the job list command.
+
+        :param jobs: list of job ids. Default: None, all jobs of `user`
+        :param user: user name. Default: None, current user
+        :return: dict, key is job id and value is a list of `JobInfo` objects, one for each task of array job.
+                 Jobs in `jobs` but not listed by scheduler are finished and marked `JobState.DONE`
+        """
+
+        process = subprocess.run(self._get_joblist_command(
+            jobs, user), shell=True, capture_output=True, text=True)
+        job_infos = self._parse_joblist_output(
+            process.returncode, process.stdout, process.stderr)
+
+        tasks = defaultdict(list)
+        for info in job_infos.values():
+            tasks[info.parent_id].append(info)
+        if jobs is None:
+            return dict(tasks)
+
+        result = {}
+        for job_id in jobs:
+            parent_id = JobInfo(str(job_id)).parent_id
+            result[job_id] = tasks.get(parent_id) or [
+                JobInfo(str(job_id), JobState.DONE)]
+        return result
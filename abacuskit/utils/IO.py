@@ -11,7 +11,8 @@ from collections import defaultdict
 from typing import List
 
 import numpy as np
-from abacuskit.calculations.structure import Kpt, Orb, Stru, conventional_cell
+from abacuskit.calculations.structure import (CompactStru, Kpt, Orb, Stru,
+                                              conventional_cell)
 from abacuskit.postprocess.symmetry import Spacegroup
 from abacuskit.utils.constants import BOHR_TO_A, Hall2Number, HM2Hall
 from abacuskit.utils.tools import (get_input_line,
@@ -121,77 +122,128 @@ def write_input(input_dict: dict, filename: str_PathLike = "INPUT"):
         file.write(get_input_line(input_dict))
 
 
-def read_stru(ntype: int, stru_file: str_PathLike) -> Stru:
+# section keywords of `STRU` file, `ABFS_ORBITALL` is accepted for files written with the old misspelling
+STRU_KEYWORDS = {"ATOMIC_SPECIES": "ATOMIC_SPECIES",
+                 "NUMERICAL_ORBITAL": "NUMERICAL_ORBITAL",
+                 "ABFS_ORBITAL": "ABFS_ORBITAL",
+                 "ABFS_ORBITALL": "ABFS_ORBITAL",
+                 "LATTICE_CONSTANT": "LATTICE_CONSTANT",
+                 "LATTICE_VECTORS": "LATTICE_VECTORS",
+                 "ATOMIC_POSITIONS": "ATOMIC_POSITIONS"}
+
+
+def _stru_blocks(stru_file: str_PathLike) -> Dict_str_list:
+    """Read `STRU` file once and split its lines into blocks, comments and empty lines are removed
+
+    :params stru_file: absolute path of `STRU` file
+    :return: dict, key is section keyword and value is list of lines after it
+    """
+
+    blocks = {}
+    lines = None
+    with open(stru_file, "r") as file:
+        for line in file:
+            line = skip_notes(line)
+            if not line:
+                continue
+            if line in STRU_KEYWORDS:
+                lines = blocks.setdefault(STRU_KEYWORDS[line], [])
+            elif lines is not None:
+                lines.append(line)
+    return blocks
+
+
+def _read_atoms(lines: typing.List[str]) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Return coordinates and move flags of atoms of one element as arrays with shape (na, 3)
+
+    :params lines: lines of atoms, each line is coordinates followed by optional move flags
+    """
+
+    tokens = [line.split() for line in lines]
+    widths = set(map(len, tokens))
+    if len(widths) == 1 and widths <= {3, 6, 7}:
+        width = widths.pop()
+        if width == 7:
+            tokens = [token[:3]+token[4:] for token in tokens]
+        try:
+            values = np.array(tokens, dtype=float)
+        except ValueError:
+            pass
+        else:
+            if width == 3:
+                return values, np.ones((len(tokens), 3), dtype=int)
+            return values[:, :3], values[:, 3:].astype(int)
+
+    positions = []
+    move = []
+    for token in tokens:
+        positions.append(list_elem_2float(token[:3]))
+        if len(token[3:]) == 3:
+            move.append(list_elem_2int(token[3:]))
+        elif len(token[3:]) == 4:
+            move.append(list_elem_2int(token[4:]))
+        else:
+            move.append([1, 1, 1])
+    return np.array(positions, dtype=float).reshape(-1, 3), np.array(move, dtype=int).reshape(-1, 3)
+
+
+def read_stru(ntype: int = None, stru_file: str_PathLike = "STRU", compact: bool = False) -> Stru:
     """
     Read `STRU` file
 
+    :params ntype: number of elements, only the first `ntype` ones in ATOMIC_SPECIES are read. Default: None, all of them
     :params stru_file: absolute path of `STRU` file
+    :params compact: return `CompactStru` object, which stores coordinates in arrays, for large cells. Default: False
     """
 
+    blocks = _stru_blocks(stru_file)
     elements = []
     masses = {}
     pps = {}
-    orbitals = {}
-    cell = []
+    for line in blocks.get("ATOMIC_SPECIES", [])[:ntype]:
+        elem, mass, pseudo = line.split()[:3]
+        elements.append(elem)
+        masses[elem] = float(mass)
+        pps[elem] = pseudo
+    orbitals = dict(zip(elements, blocks.get("NUMERICAL_ORBITAL", [])))
+    abfs = dict(zip(elements, blocks.get("ABFS_ORBITAL", [])))
+    lat0 = float(blocks["LATTICE_CONSTANT"][0].split()[0])
+    cell = [list_elem_2float(line.split())
+            for line in blocks.get("LATTICE_VECTORS", [])[:3]]
+
     magmoms = {}
-    numbers = {}
     positions = defaultdict(list)
     scaled_positions = defaultdict(list)
     positions_angstrom_lat0 = defaultdict(list)
     move = defaultdict(list)
-    abfs = {}
-    with open(stru_file, "r") as file:
-        if search_sentence(file, "ATOMIC_SPECIES"):
-            for it in range(ntype):
-                line = skip_notes(file.readline())
-                elem, mass, pseudo = line.split()
-                elements.append(elem)
-                masses[elem] = float(mass)
-                pps[elem] = pseudo
-
-        if search_sentence(file, "NUMERICAL_ORBITAL"):
-            for elem in elements:
-                orbitals[elem] = skip_notes(file.readline())
-
-        if search_sentence(file, "ABFS_ORBITALL"):
-            for elem in elements:
-                abfs[elem] = skip_notes(file.readline())
-
-        if search_sentence(file, "LATTICE_CONSTANT"):
-            lat0 = float(skip_notes(file.readline()).split()[0])
-
-        if search_sentence(file, "LATTICE_VECTORS"):
-            for i in range(3):
-                cell.append(list_elem_2float(
-                    skip_notes(file.readline()).split()))
-
-        if search_sentence(file, "ATOMIC_POSITIONS"):
-            ctype = skip_notes(file.readline())
-
-        for elem in elements:
-            if search_sentence(file, elem):
-                magmoms[elem] = float(skip_notes(file.readline()).split()[0])
-                na = int(skip_notes(file.readline()).split()[0])
-                numbers[elem] = na
-                R_tmp = []
-                move_tmp = []
-                for i in range(na):
-                    line = skip_notes(file.readline())
-                    R_tmp.append(list_elem_2float(line.split()[:3]))
-                    if len(line.split()[3:]) == 3:
-                        move_tmp.append(list_elem_2int(line.split()[3:]))
-                    elif len(line.split()[3:]) == 4:
-                        move_tmp.append(list_elem_2int(line.split()[4:]))
-                    else:
-                        move_tmp.append([1, 1, 1])
-                if ctype == "Direct":
-                    scaled_positions[elem] = R_tmp
-                elif ctype == "Cartesian":
-                    positions[elem] = R_tmp
-                elif ctype == "Cartesian_angstrom":
-                    positions_angstrom_lat0[elem] = R_tmp
-                move[elem] = move_tmp
-
+    lines = blocks.get("ATOMIC_POSITIONS", [])
+    ctype = lines[0] if lines else ""
+    i = 1
+    # each element is its name, magnetic moment, number of atoms and lines of atoms
+    while i+2 < len(lines):
+        elem, magmom, na = lines[i], lines[i+1], int(lines[i+2].split()[0])
+        atoms = lines[i+3:i+3+na]
+        i += 3+na
+        if elem not in masses:
+            continue
+        magmoms[elem] = float(magmom.split()[0])
+        R_tmp, move[elem] = _read_atoms(atoms)
+        if ctype == "Direct":
+            scaled_positions[elem] = R_tmp
+        elif ctype == "Cartesian":
+            positions[elem] = R_tmp
+        elif ctype == "Cartesian_angstrom":
+            positions_angstrom_lat0[elem] = R_tmp
+
+    if compact:
+        coords = positions or scaled_positions or positions_angstrom_lat0
+        counts = [len(coords[elem]) for elem in coords]
+        return CompactStru(lat0, cell, pps, list(coords), np.concatenate(list(coords.values()) or [np.empty((0, 3))]), np.repeat(np.arange(len(counts)), counts), ctype,
+                           orbitals=orbitals, masses=masses, magmoms=magmoms, move=np.concatenate(list(move.values()) or [np.empty((0, 3))]), abfs=abfs)
+    # `Stru` keeps coordinates and move flags of each element as lists of lists
+    for values in (positions, scaled_positions, positions_angstrom_lat0, move):
+        for elem in values:
+            values[elem] = values[elem].tolist()
     return Stru(lat0, cell, pps, positions=positions, scaled_positions=scaled_positions, positions_angstrom_lat0=positions_angstrom_lat0, orbitals=orbitals, masses=masses, magmoms=magmoms, move=move, abfs=abfs)
 
 
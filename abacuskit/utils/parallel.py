@@ -0,0 +1,113 @@
+'''
+Date: 2026-10-18 12:59:42
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:58:54
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+from collections import OrderedDict
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                wait)
+from typing import Callable, Dict
+
+
+def check_acyclic(depends: Dict[str, list]):
+    """Raise `ValueError` naming a cycle if tasks in `depends` depend on each other circularly
+
+    :params depends: dict, key is task name and value is list of task names it depends on
+    """
+
+    state = {}
+    for root in depends:
+        if state.get(root):
+            continue
+        # iterative depth-first search, 1 means on current path and 2 means checked
+        path, stack = [root], [iter(depends.get(root, []))]
+        state[root] = 1
+        while stack:
+            dep = next(stack[-1], None)
+            if dep is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif state.get(dep) == 1:
+                cycle = path[path.index(dep):]+[dep]
+                raise ValueError(
+                    f"Circular dependencies among tasks: {' -> '.join(cycle)}")
+            elif not state.get(dep):
+                state[dep] = 1
+                path.append(dep)
+                stack.append(iter(depends.get(dep, [])))
+
+
+def run_with_budget(func: Callable, tasks: Dict[str, tuple], costs: Dict[str, int] = {}, max_workers: int = 1, budget: int = None, depends: Dict[str, list] = {}) -> OrderedDict:
+    """Run `func(*tasks[name])` for every task in a process pool, the sum of costs of running tasks never exceeds `budget`
+
+    :params func: picklable function executed by worker processes
+    :params tasks: dict, key is task name and value is tuple of arguments of `func`
+    :params costs: dict, key is task name and value is resource it takes, e.g. number of MPI processes. Default: 1 for each task
+    :params max_workers: maximum number of tasks running at the same time. Default: 1
+    :params budget: total resource shared by running tasks. Default: None, no limit
+    :params depends: dict, key is task name and value is list of task names which must finish successfully before it starts. Default: no dependency
+    :return: dict of task name and `concurrent.futures.Future` object, in order of `tasks`. Tasks whose dependencies failed are not run and their futures raise `RuntimeError`
+    """
+
+    for name, deps in depends.items():
+        for dep in deps:
+            if dep not in tasks:
+                raise KeyError(f"Task `{name}` depends on unknown task `{dep}`")
+    check_acyclic(depends)
+
+    pending = list(tasks.keys())
+    futures = OrderedDict((name, None) for name in pending)
+    running = {}
+    used = 0
+
+    def cost(name):
+        value = costs.get(name, 1)
+        # a task larger than the whole budget runs alone
+        return min(value, budget) if budget else value
+
+    def finished(name):
+        future = futures[name]
+        return future is not None and future.done()
+
+    def failed(name):
+        future = futures[name]
+        return finished(name) and (future.cancelled() or future.exception() is not None)
+
+    def skip_failed():
+        for name in list(pending):
+            failed_deps = [dep for dep in depends.get(name, []) if failed(dep)]
+            if failed_deps:
+                pending.remove(name)
+                future = Future()
+                future.set_exception(RuntimeError(
+                    f"Task `{name}` is not run because `{failed_deps[0]}` failed"))
+                futures[name] = future
+                # dependents of a skipped task are skipped in the next pass
+                return True
+        return False
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            while skip_failed():
+                pass
+            while pending and len(running) < max_workers:
+                ready = [name for name in pending if all(
+                    finished(dep) for dep in depends.get(name, []))]
+                fit = [name for name in ready if not running or not budget or used+cost(name) <= budget]
+                if not fit:
+                    break
+                name = fit[0]
+                pending.remove(name)
+                future = executor.submit(func, *tasks[name])
+                futures[name] = future
+                running[future] = name
+                used += cost(name)
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                used -= cost(running.pop(future))
+
+    return futures
@@ -0,0 +1,129 @@
+'''
+Date: 2026-10-18 13:40:26
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:44:20
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import json
+import math
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+from abacuskit.utils.typings import *
+from scipy.stats import mannwhitneyu
+
+# performance quantities recorded for each calculation, larger is worse
+PERF_METRICS = ("wall_time", "abacus_time", "max_rss_kb")
+
+
+def compare_samples(base: typing.Sequence[float], new: typing.Sequence[float], threshold: float = 0.05, alpha: float = 0.05) -> dict:
+    """Compare two samples of a performance quantity, `new` is a regression if its median exceeds that of `base` by more than `threshold` and one-sided Mann-Whitney U test is significant
+
+    :params base: values of base version, e.g. wall time of repeated runs
+    :params new: values of new version
+    :params threshold: relative increase of median regarded as slowdown. Default: 0.05
+    :params alpha: significance level of the test. Default: 0.05
+    """
+
+    base, new = np.asarray(base, dtype=float), np.asarray(new, dtype=float)
+    base_median, new_median = float(np.median(base)), float(np.median(new))
+    ratio = new_median/base_median if base_median > 0 else math.nan
+    pvalue = math.nan
+    if len(base) and len(new):
+        with warnings.catch_warnings():
+            # all values tied
+            warnings.simplefilter("ignore", RuntimeWarning)
+            pvalue = float(mannwhitneyu(
+                new, base, alternative="greater").pvalue)
+    regression = bool(ratio > 1+threshold and pvalue < alpha)
+    return OrderedDict(base_median=base_median, new_median=new_median, ratio=ratio, pvalue=pvalue,
+                       n_base=len(base), n_new=len(new), regression=regression)
+
+
+def summarize(values: typing.Sequence[float]) -> dict:
+    """Return robust statistics of repeated measurements: median, quartiles, interquartile range(IQR) and coefficient of variation(CV, sample standard deviation over mean)
+
+    :params values: values of a performance quantity, e.g. wall time of repeated runs
+    """
+
+    values = np.asarray(values, dtype=float)
+    if not values.size:
+        return OrderedDict(n=0, median=math.nan, q1=math.nan, q3=math.nan, iqr=math.nan, cv=math.nan, min=math.nan, max=math.nan)
+    q1, median, q3 = (float(i) for i in np.percentile(values, [25, 50, 75]))
+    mean = float(values.mean())
+    cv = float(values.std(ddof=1))/mean if values.size > 1 and mean > 0 else math.nan
+    return OrderedDict(n=int(values.size), median=median, q1=q1, q3=q3, iqr=q3-q1, cv=cv,
+                       min=float(values.min()), max=float(values.max()))
+
+
+def dump_json(obj, filename: str_PathLike):
+    """Write `obj` to json file, NaN is written as null"""
+
+    def clean(obj):
+        if isinstance(obj, float) and math.isnan(obj):
+            return None
+        if isinstance(obj, dict):
+            return OrderedDict((key, clean(value)) for key, value in obj.items())
+        if isinstance(obj, (list, tuple)):
+            return [clean(value) for value in obj]
+        return obj
+
+    with open(filename, 'w') as file:
+        json.dump(clean(obj), file, indent=4)
+
+
+class PerfCheck:
+    """Performance comparison between versions over repeated runs"""
+
+    def __init__(self, repeat: int = 1, threshold: float = 0.05, alpha: float = 0.05) -> None:
+        """Set how performance is compared
+
+        :params repeat: number of runs of each version, at least 4 runs are needed for a significance level of 0.05. Default: 1
+        :params threshold: relative increase of median regarded as slowdown. Default: 0.05
+        :params alpha: significance level of one-sided Mann-Whitney U test. Default: 0.05
+        """
+
+        self.repeat = max(int(repeat), 1)
+        self.threshold = threshold
+        self.alpha = alpha
+
+    def diff(self, samples: dict) -> dict:
+        """Compare performance of each version with the previous one as `Autotest._check`
+
+        :params samples: dict, key is step name, e.g. `cal_0`, value is dict with `calculation` and `versions`, a dict of version name and list of performance records of its runs
+        :return: dict written to `perf_diff.json`
+        """
+
+        comparisons = []
+        for step, value in samples.items():
+            versions = list(value["versions"].items())
+            for (base, base_records), (new, new_records) in zip(versions, versions[1:]):
+                for metric in PERF_METRICS:
+                    base_values = [record[metric] for record in base_records if record.get(
+                        metric) is not None]
+                    new_values = [record[metric] for record in new_records if record.get(
+                        metric) is not None]
+                    if not (base_values and new_values):
+                        continue
+                    comparisons.append(OrderedDict(step=step, calculation=value.get("calculation"), metric=metric, base=base, new=new,
+                                                   **compare_samples(base_values, new_values, self.threshold, self.alpha)))
+        return OrderedDict(repeat=self.repeat, threshold=self.threshold, alpha=self.alpha,
+                           regressions=sum(item["regression"] for item in comparisons), comparisons=comparisons, samples=samples)
+
+    def report(self, diff: dict):
+        """Print comparisons of `diff`, regressions are marked"""
+
+        print("--------------------------Performance--------------------------", flush=True)
+        print(f"{'Step'.ljust(24)}{'Metric'.ljust(14)}{'Versions'.ljust(24)}{'Base'.ljust(12)}{'New'.ljust(12)}{'Ratio'.ljust(10)}{'p-value'.ljust(10)}", flush=True)
+        for item in diff["comparisons"]:
+            versions = f"{item['base']}->{item['new']}"
+            mark = "SLOWER" if item["regression"] else ""
+            print(f"{item['step'].ljust(24)}{item['metric'].ljust(14)}{versions.ljust(24)}{item['base_median']:<12.4g}{item['new_median']:<12.4g}{item['ratio']:<10.3f}{item['pvalue']:<10.3g}{mark}", flush=True)
+        print(f"{diff['regressions']} performance regressions beyond {self.threshold:.0%} (p < {self.alpha})", flush=True)
+
+    def write(self, diff: dict, filename: str_PathLike):
+        """Write `diff` to json file, NaN is written as null"""
+
+        dump_json(diff, filename)
@@ -0,0 +1,209 @@
+'''
+Date: 2026-10-18 13:04:23
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:52:37
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import os
+import re
+import typing
+from collections import OrderedDict, namedtuple
+from io import TextIOBase
+
+import numpy as np
+from abacuskit.utils.typings import *
+
+# one alternation is searched per line, the matched key decides what to read
+_PATTERN = re.compile(
+    r"(?P<energy>E_KohnSham)|(?P<efermi>E_Fermi)|(?P<ionic>The Ionic Phase)|(?P<electronic>Electronic Phase)"
+    r"|(?P<natom>TOTAL ATOM NUMBER = (?P<number>[0-9]+))|(?P<force>TOTAL-FORCE \(eV/Angstrom\))"
+    r"|(?P<stress>TOTAL-STRESS \(KBAR\))|(?P<time>TOTAL  Time  : (?P<total>[a-z0-9\s]+))|(?P<timing>CLASS_NAME.*TIME)")
+
+# one row of timing table at the end of ABACUS log, `time` and `avg` are in seconds
+TimingRecord = namedtuple(
+    'TimingRecord', ['class_name', 'name', 'time', 'calls', 'avg', 'percent'])
+
+# parsed logs, key is real path of log file and value is (mtime_ns, size, RunningLog)
+_LOGS = OrderedDict()
+_MAX_LOGS = 8
+
+
+class RunningLog:
+    """Quantities read from ABACUS running log or standard output"""
+
+    def __init__(self) -> None:
+        self.energies = []
+        self.efermis = []
+        self.ionic_phase = None
+        self.electronic_phase = None
+        self.natom = 0
+        self.forces = []
+        self.stresses = []
+        self.total_time = None
+        self.timings = []
+
+    @property
+    def total_seconds(self) -> typing.Optional[float]:
+        """`TOTAL  Time` in seconds, e.g. '0 h 1 mins 5 secs'"""
+
+        if self.total_time is None:
+            return None
+        units = {'h': 3600, 'm': 60, 's': 1}
+        return float(sum(int(value)*units[unit] for value, unit in re.findall(r"(\d+)\s*([hms])", self.total_time)))
+
+    @property
+    def energy(self) -> typing.Optional[float]:
+        """Last Kohn-Sham energy in eV"""
+
+        return self.energies[-1] if self.energies else None
+
+    @property
+    def efermi(self) -> typing.Optional[float]:
+        """Last Fermi level in eV"""
+
+        return self.efermis[-1] if self.efermis else None
+
+    @property
+    def force(self) -> typing.Optional[np.ndarray]:
+        """Forces of last ionic step in eV/Angstrom, shape (natom, 3)"""
+
+        return self.forces[-1] if self.forces else None
+
+    @property
+    def stress(self) -> typing.Optional[np.ndarray]:
+        """Stress of last ionic step in KBAR, shape (3, 3)"""
+
+        return self.stresses[-1] if self.stresses else None
+
+
+def _read_block(file: typing.TextIO, skip: int, nrows: int, usecols: slice) -> np.ndarray:
+    for i in range(skip):
+        file.readline()
+    rows = [file.readline().split()[usecols] for i in range(nrows)]
+    return np.array(rows, dtype=float)
+
+
+def _read_timings(file: typing.TextIO) -> typing.List[TimingRecord]:
+    """Read rows of timing table after its header, e.g. `CLASS_NAME  NAME  TIME/s  CALLS  AVG/s  PER/%`"""
+
+    records = []
+    for line in file:
+        words = line.replace('|', ' ').split()
+        if not words or not line.strip().strip('-'):
+            # separator lines around rows
+            if records:
+                break
+            continue
+        words[-1] = words[-1].rstrip('%')
+        if not words[-1]:
+            words.pop()
+        try:
+            time, calls, avg, percent = (float(i) for i in words[-4:])
+        except ValueError:
+            break
+        names = words[:-4]
+        if len(names) not in (1, 2):
+            break
+        class_name, name = names if len(names) == 2 else ('', names[0])
+        records.append(TimingRecord(class_name, name,
+                       time, int(calls), avg, percent))
+    return records
+
+
+def parse_running_log(file: typing.TextIO) -> RunningLog:
+    """Read ABACUS running log or standard output in one pass
+
+    :params file: opened log file
+    """
+
+    log = RunningLog()
+    for line in file:
+        match = _PATTERN.search(line)
+        if not match:
+            continue
+        key = match.lastgroup
+        if key == "energy":
+            log.energies.append(float(line.split()[2]))
+        elif key == "efermi":
+            log.efermis.append(float(line.split()[2]))
+        elif key == "ionic":
+            log.ionic_phase = float(line.split()[3])
+        elif key == "electronic":
+            log.electronic_phase = float(line.split()[2])
+        elif key == "natom":
+            log.natom = int(match.group("number"))
+        elif key == "force":
+            log.forces.append(_read_block(file, 3, log.natom, slice(1, 4)))
+        elif key == "stress":
+            log.stresses.append(_read_block(file, 3, 3, slice(0, 3)))
+        elif key == "time":
+            log.total_time = match.group("total")
+        elif key == "timing":
+            # the table of memory has a similar header, e.g. `CLASS_NAME---|NAME---|MEMORY(MB)`
+            log.timings = _read_timings(file) or log.timings
+
+    return log
+
+
+def read_running_log(file: typing.Union[typing.TextIO, str_PathLike]) -> RunningLog:
+    """Read ABACUS running log or standard output, parsed files are reused until they are modified
+
+    :params file: opened log file or path of log file
+    """
+
+    if isinstance(file, TextIOBase):
+        return parse_running_log(file)
+
+    path = os.path.realpath(file)
+    stat = os.stat(path)
+    cached = _LOGS.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        _LOGS.move_to_end(path)
+        return cached[2]
+    with open(path, 'r') as f:
+        log = parse_running_log(f)
+    _LOGS[path] = (stat.st_mtime_ns, stat.st_size, log)
+    _LOGS.move_to_end(path)
+    while len(_LOGS) > _MAX_LOGS:
+        _LOGS.popitem(last=False)
+    return log
+
+
+def diff_timings(base: typing.Sequence[TimingRecord], new: typing.Sequence[TimingRecord], rank: str = "absolute", min_time: float = 0.0) -> typing.List[OrderedDict]:
+    """Compare timing tables of two versions or runs, routines are ranked by change of time
+
+    :params base: timing records of base version, e.g. `RunningLog.timings`
+    :params new: timing records of new version
+    :params rank: 'absolute' to rank by change of time in seconds, 'relative' by ratio of time. Default: 'absolute'
+    :params min_time: routines shorter than this in both versions are skipped, which keeps tiny routines from the top of relative ranking. Default: 0.0
+    :return: list of dict with `class_name`, `name`, `base_time`, `new_time`, `delta`, `ratio`, `base_calls` and `new_calls`, the slowest first
+    """
+
+    if rank not in ("absolute", "relative"):
+        raise ValueError(f"`rank` should be 'absolute' or 'relative', but `{rank}` is set")
+
+    def sum_up(records):
+        res = OrderedDict()
+        for record in records:
+            time, calls = res.get((record.class_name, record.name), (0.0, 0))
+            res[record.class_name, record.name] = (
+                time+record.time, calls+record.calls)
+        return res
+
+    base, new = sum_up(base), sum_up(new)
+    rows = []
+    for key in list(base)+[key for key in new if key not in base]:
+        base_time, base_calls = base.get(key, (0.0, 0))
+        new_time, new_calls = new.get(key, (0.0, 0))
+        if max(base_time, new_time) < min_time:
+            continue
+        if base_time > 0:
+            ratio = new_time/base_time
+        else:
+            ratio = np.inf if new_time > 0 else 1.0
+        rows.append(OrderedDict(class_name=key[0], name=key[1], base_time=base_time, new_time=new_time, delta=new_time-base_time,
+                                ratio=ratio, base_calls=base_calls, new_calls=new_calls))
+    rows.sort(key=lambda row: row["delta"] if rank ==
+              "absolute" else row["ratio"], reverse=True)
+    return rows
@@ -5,11 +5,47 @@ LastEditTime: 2021-04-28 18:06:07
 Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
+import importlib
 import json
 import os
+import threading
+import time
 
 from abacuskit.schedulers.data import Code, CodeRunMode, JobDefaultFields
 
+# name of file recording submitted jobs in submission directory
+JOB_RECORD = 'jobs.json'
+_record_lock = threading.Lock()
+
+_MACHINE_PARAMS = ("num_machines", "num_mpiprocs_per_machine",
+                   "num_cores_per_machine", "num_cores_per_mpiproc")
+_MPIPROCS_PARAMS = ("parallel_env", "tot_num_mpiprocs")
+# scheduler name: scheduler class, job resource class and parameters of `set_scheduler` passed to job resource, classes are in `abacuskit.schedulers.plugins`
+SCHEDULERS = {
+    'pbspro': ("pbspro.PbsproScheduler", "pbsbaseclasses.PbsJobResource", _MACHINE_PARAMS),
+    'torque': ("torque.TorqueScheduler", "pbsbaseclasses.PbsJobResource", _MACHINE_PARAMS),
+    'slurm': ("slurm.SlurmScheduler", "slurm.SlurmJobResource", _MACHINE_PARAMS),
+    'lsf': ("lsf.LsfScheduler", "lsf.LsfJobResource", _MPIPROCS_PARAMS),
+    'sge': ("sge.SgeScheduler", "sge.SgeJobResource", _MPIPROCS_PARAMS),
+    'direct': ("direct.DirectScheduler", "direct.DirectJobResource", ("num_machines", "num_mpiprocs_per_machine", "tot_num_mpiprocs")),
+}
+
+
+def _scheduler_plugin(scheduler):
+    """Return scheduler class, job resource class and its parameters of scheduler, plugin is imported only when used
+
+    :params scheduler: string of scheduler name, one of `SCHEDULERS`
+    """
+
+    if scheduler not in SCHEDULERS:
+        raise KeyError(f"It does not support scheduler `{scheduler}`")
+    classes = []
+    for path in SCHEDULERS[scheduler][:2]:
+        module, name = path.rsplit('.', 1)
+        classes.append(getattr(importlib.import_module(
+            f"abacuskit.schedulers.plugins.{module}"), name))
+    return classes[0], classes[1], SCHEDULERS[scheduler][2]
+
 
 def set_scheduler(
     scheduler,
@@ -43,7 +79,8 @@ def set_scheduler(
     append_text=None,
     import_sys_environment=True,
     run_mode='s',
-    submit_script='sub.sh'
+    submit_script='sub.sh',
+    job_array=None
 ):
     """ 
     Write the subnit script as a file.
@@ -101,6 +138,7 @@ def set_scheduler(
     append_text: a (possibly multi-line) string to be inserted in the scheduler script after the main execution line. Default: None
     import_sys_environment: import the system environment variables. Default: True
     run_mode: it contains the information necessary to run a single code. 's': serial, 'p': parallel. Default: 'p'
+    job_array: a list of folders, if set, codes run in each folder as tasks of one array job. Default: None
     """
 
     if run_mode == 'p':
@@ -108,48 +146,12 @@ def set_scheduler(
     elif run_mode == 's':
         codes_run_mode = CodeRunMode.SERIAL
 
-    if scheduler == 'pbspro':
-        from abacuskit.schedulers.plugins.pbsbaseclasses import PbsJobResource
-        from abacuskit.schedulers.plugins.pbspro import PbsproScheduler
-        job_resource = PbsJobResource(num_machines=num_machines, num_mpiprocs_per_machine=num_mpiprocs_per_machine,
-                                      num_cores_per_machine=num_cores_per_machine, num_cores_per_mpiproc=num_cores_per_mpiproc).resources
-        sche = PbsproScheduler()
-
-    elif scheduler == 'torque':
-        from abacuskit.schedulers.plugins.pbsbaseclasses import PbsJobResource
-        from abacuskit.schedulers.plugins.torque import TorqueScheduler
-        job_resource = PbsJobResource(num_machines=num_machines, num_mpiprocs_per_machine=num_mpiprocs_per_machine,
-                                      num_cores_per_machine=num_cores_per_machine, num_cores_per_mpiproc=num_cores_per_mpiproc).resources
-        sche = TorqueScheduler()
-
-    elif scheduler == 'slurm':
-        from abacuskit.schedulers.plugins.slurm import (SlurmJobResource,
-                                                        SlurmScheduler)
-        job_resource = SlurmJobResource(num_machines=num_machines, num_mpiprocs_per_machine=num_mpiprocs_per_machine,
-                                        num_cores_per_machine=num_cores_per_machine, num_cores_per_mpiproc=num_cores_per_mpiproc).resources
-        sche = SlurmScheduler()
-
-    elif scheduler == 'lsf':
-        from abacuskit.schedulers.plugins.lsf import LsfJobResource, LsfScheduler
-        job_resource = LsfJobResource(
-            parallel_env=parallel_env, tot_num_mpiprocs=tot_num_mpiprocs).resources
-        sche = LsfScheduler()
-
-    elif scheduler == 'sge':
-        from abacuskit.schedulers.plugins.sge import SgeJobResource, SgeScheduler
-        job_resource = SgeJobResource(
-            parallel_env=parallel_env, tot_num_mpiprocs=tot_num_mpiprocs).resources
-        sche = SgeScheduler()
-
-    elif scheduler == 'direct':
-        from abacuskit.schedulers.plugins.direct import (DirectJobResource,
-                                                         DirectScheduler)
-        job_resource = DirectJobResource(
-            num_machines=num_machines, num_mpiprocs_per_machine=num_mpiprocs_per_machine, tot_num_mpiprocs=tot_num_mpiprocs).resources
-        sche = DirectScheduler()
-
-    else:
-        raise KeyError(f"It does not support scheduler `{scheduler}`")
+    scheduler_class, resource_class, params = _scheduler_plugin(scheduler)
+    resources = dict(num_machines=num_machines, num_mpiprocs_per_machine=num_mpiprocs_per_machine, num_cores_per_machine=num_cores_per_machine,
+                     num_cores_per_mpiproc=num_cores_per_mpiproc, parallel_env=parallel_env, tot_num_mpiprocs=tot_num_mpiprocs)
+    job_resource = resource_class(
+        **{key: resources[key] for key in params}).resources
+    sche = scheduler_class()
 
     job_tml = JobDefaultFields(
         shebang=shebang,
@@ -176,7 +178,8 @@ def set_scheduler(
         append_text=append_text,
         import_sys_environment=import_sys_environment,
         codes_run_mode=codes_run_mode,
-        codes_info=codes_info
+        codes_info=codes_info,
+        job_array=job_array
     )
 
     out_string = sche.get_submit_script(job_tml)
@@ -210,4 +213,63 @@ def submit_script(filename, line, **kwargs):
                        code_uuid=kwargs.pop("code_uuid", None))]
     submit_command = set_scheduler(
         codes_info=codes_info, job_environment=job_environment, **script_params, **job_resource)
-    os.system(submit_command)
+    submit_job(script_params["scheduler"], submit_command)
+
+
+def get_scheduler(scheduler):
+    """Return scheduler object
+
+    :params scheduler: string of scheduler name, one of `SCHEDULERS`
+    """
+
+    return _scheduler_plugin(scheduler)[0]()
+
+
+def read_job_record(record=JOB_RECORD):
+    """Return dict of submitted jobs, key is job id, empty if `record` not exists
+
+    :params record: path of job record file. Default: 'jobs.json'
+    """
+
+    if not os.path.exists(record):
+        return {}
+    with open(record, 'r') as file:
+        return json.load(file)
+
+
+def record_job(job_id, scheduler, folder=None, record=JOB_RECORD, **kwargs):
+    """Add a submitted job to job record file
+
+    :params job_id: string of job id
+    :params scheduler: string of scheduler name
+    :params folder: directory where the job was submitted. Default: None, current directory
+    :params record: path of job record file. Default: 'jobs.json'
+    :params kwargs: other information of job, e.g. `array` for number of array tasks
+    """
+
+    with _record_lock:
+        jobs = read_job_record(record)
+        jobs[str(job_id)] = {"scheduler": scheduler, "folder": os.path.abspath(folder or os.getcwd()),
+                             "submit_time": time.time(), **kwargs}
+        tmp = f"{record}.tmp"
+        with open(tmp, 'w') as file:
+            json.dump(jobs, file, indent=4)
+        os.replace(tmp, record)
+
+
+def submit_job(scheduler, submit_command, cwd=None, record=JOB_RECORD, **kwargs):
+    """Submit job, record its id in `record` of `cwd` and return it
+
+    :params scheduler: string of scheduler name
+    :params submit_command: string returned by `set_scheduler`
+    :params cwd: directory to submit job. Default: None, current directory
+    :params record: name of job record file in `cwd`, None not to record. Default: 'jobs.json'
+    :params kwargs: other information of job to record
+    """
+
+    job_id = get_scheduler(scheduler).submit(submit_command, cwd)
+    if record:
+        folder = cwd or os.getcwd()
+        record_job(job_id, scheduler, folder, os.path.join(
+            folder, record), **kwargs)
+    return job_id
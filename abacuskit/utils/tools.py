@@ -6,8 +6,10 @@ Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
 '''
 
 import re
+import shutil
 import string
 import sys
+from pathlib import Path
 from typing import List, Union
 
 from abacuskit.utils.typings import *
@@ -28,13 +30,16 @@ def add_path(path: str_PathLike):
         sys.path.append(path)
 
 
+_NOTES = re.compile(r"#.*|//.*")
+
+
 def skip_notes(line: str) -> str:
     """Delete comments lines with '#' or '//'
 
     :params line: line will be handled 
     """
-    line = re.compile(r"#.*").sub("", line)
-    line = re.compile(r"//.*").sub("", line)
+    if '#' in line or '//' in line:
+        line = _NOTES.sub("", line)
     line = line.strip()
     return line
 
@@ -108,6 +113,19 @@ def folder_name(T1: str, T2: str, i_dis: Union[int, float, str]) -> str:
     return f"{T1}-{T2}_{i_dis}"
 
 
+def new_folder(folder: str_PathLike) -> Path:
+    """Create empty directory `folder`, files left by an earlier calculation in it are removed
+
+    :params folder: path of directory
+    """
+
+    folder = Path(folder)
+    if folder.exists():
+        shutil.rmtree(folder)
+    folder.mkdir(parents=True)
+    return folder
+
+
 def delete_key(input_dict):
     key_list = ["ocp", "ocp_set", "nelec", "out_charge"]
     for i in key_list:
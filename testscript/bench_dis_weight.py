@@ -0,0 +1,65 @@
+'''
+Date: 2026-10-18 13:07:13
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:59:10
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from abacuskit.calculations.plugins.exx import SetDimers
+
+# shared helpers of benchmarks are next to this script, which may run from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from benchtools import bench
+
+
+def legacy_dis_weight(dis_opt, dis_all):
+    """`SetDimers.cal_dis_weight` before vectorization"""
+
+    def weight_func(x, D):
+        return (2/D**3)*x**3 + (-3/D**2)*x**2 + 1
+    dis_weight = defaultdict(dict)
+    for T1, T2 in dis_opt:
+        dis_opt_TT = sorted(dis_opt[T1, T2])
+        for index, i_dis_opt in enumerate(dis_opt_TT):
+            i_weight = 0
+            i_dis_low = dis_opt_TT[index-1] if index > 0 else -np.inf
+            i_dis_up = dis_opt_TT[index +
+                                  1] if index < len(dis_opt_TT)-1 else np.inf
+            for i_dis, num in dis_all[T1, T2].items():
+                if i_dis_low < i_dis < i_dis_opt:
+                    i_weight += weight_func(i_dis_opt -
+                                            i_dis, i_dis_opt-i_dis_low) * num
+                elif i_dis == i_dis_opt:
+                    i_weight += num
+                elif i_dis_opt < i_dis < i_dis_up:
+                    i_weight += weight_func(i_dis_opt -
+                                            i_dis, i_dis_opt-i_dis_up) * num
+            dis_weight[T1, T2][i_dis_opt] = i_weight
+
+    return dis_weight
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    # `cal_dis_weight` does not use any attribute of `SetDimers`
+    obj = SetDimers.__new__(SetDimers)
+    print(f"{'n_all'.ljust(10)}{'n_opt'.ljust(10)}{'legacy(s)'.ljust(14)}{'vectorized(s)'.ljust(16)}{'speedup'.ljust(10)}max_rel_diff")
+    for n_all, n_opt in [(100, 5), (1000, 20), (10000, 20), (50000, 50)]:
+        dis = np.round(np.sort(rng.uniform(0.1, 20, n_all)), 6)
+        dis_all = {("A", "B"): {float(i): int(rng.integers(1, 50)) for i in dis}}
+        # some optimal distances coincide with existing distances
+        dis_opt = {("A", "B"): list(rng.choice(dis, n_opt//2, replace=False)) +
+                   list(rng.uniform(0.1, 20, n_opt-n_opt//2))+[0.0]}
+        repeat = 1 if n_all*n_opt > 1e6 else 3
+        old, t_old = bench(legacy_dis_weight, repeat, dis_opt, dis_all)
+        new, t_new = bench(obj.cal_dis_weight, 5, dis_opt, dis_all)
+        # NumPy and libm `pow` may differ in the last bit, so weights are compared with relative difference
+        assert all(list(old[key]) == list(new[key]) for key in old)
+        diff = max(abs(old[key][i]-new[key][i])/max(abs(old[key][i]), 1)
+                   for key in old for i in old[key])
+        print(f"{str(n_all).ljust(10)}{str(n_opt).ljust(10)}{t_old:<14.4f}{t_new:<16.4f}{t_old/t_new:<10.1f}{diff:.1e}")
@@ -0,0 +1,19 @@
+'''
+Date: 2026-10-18 13:59:10
+LastEditors: jiyuyang
+LastEditTime: 2026-10-18 13:59:10
+Mail: jiyuyang@mail.ustc.edu.cn, 1041176461@qq.com
+'''
+
+import time
+
+
+def bench(func, repeat, *args):
+    """Return result of `func(*args)` and its minimum wall time in seconds over `repeat` runs"""
+
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        res = func(*args)
+        times.append(time.perf_counter()-start)
+    return res, min(times)